@@ -0,0 +1,175 @@
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from p import Peer
+from kb.sim import SimNetwork, SimTransport
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+class SimClient:
+    # 열린 부하 클라이언트: 받아들여지는 동안은 도착하는 대로 주 노드에 보냄
+    # 거절되면 retry_after (+ 지터) 뒤에 resend_from 부터 window 개만 다시 보내고, 나머지는 자기 트랜잭션이 커밋될 때마다 하나씩 보냄
+    def __init__(self, sim, name, port, target, window):
+        self.sim = sim
+        self.id = name
+        self.port = port
+        self.target = target
+        self.window = window
+        self.peers = {}
+        self.nonce = 0
+        self.next_send = 0  # 이보다 앞 nonce 는 보냈음, 뒤는 클라이언트에 쌓여 있음
+        self.retrying = False
+        self.txs = {}
+        self.arrived = {}  # nonce -> 처음 도착한 시각, 커밋되면 지움
+        self.attempted = {}  # nonce -> 마지막으로 보낸 시각 (받아들여진 요청의 지연은 여기서부터 잼)
+        self.network = SimTransport(sim, self)
+        self.network.start()
+
+    def log(self, message):
+        pass
+
+    def arrive(self):
+        nonce = self.nonce
+        self.nonce += 1
+        self.txs[nonce] = {'client': self.id, 'nonce': nonce, 'fee': 1, 'op': ('put', nonce % 100, nonce)}
+        self.arrived[nonce] = self.sim.clock.now
+        if not self.retrying and self.next_send == nonce:
+            self.send_next()
+
+    def send_next(self):
+        while self.next_send < self.nonce and self.next_send not in self.arrived:
+            self.next_send += 1  # 다시 보내려던 사이에 커밋됨
+        if self.next_send < self.nonce:
+            self.attempted[self.next_send] = self.sim.clock.now
+            self.network.send_message(self.target, {'type': 'transaction', 'tx': self.txs[self.next_send], 'reply_to': self.port})
+            self.next_send += 1
+
+    def handle_message(self, message, client_socket=None):
+        if message['type'] != 'reject':
+            return
+        self.next_send = min(self.next_send, message['resend_from'])
+        if not self.retrying:
+            self.retrying = True
+            retry = message['retry_after'] * self.sim.random.uniform(1.0, 1.5)  # 같은 시각에 몰려 다시 보내지 않게
+            self.sim.schedule(retry, self.resend)
+
+    def resend(self):
+        self.retrying = False
+        for _ in range(self.window):
+            self.send_next()
+
+    def committed(self, nonce):
+        self.arrived.pop(nonce, None)
+        if not self.retrying:
+            self.send_next()
+
+def run(args, rate, admission):
+    sim = SimNetwork(seed=args.seed, latency=args.latency, jitter=args.jitter)
+    peers = sim.build_cluster(Peer, args.replicas)
+    for peer in peers:
+        peer.verbose = False
+        peer.enable_adaptive_batching(max_latency=args.max_latency, max_batch=args.block_txs)
+        if admission:
+            peer.enable_admission_control(args.client_rate, args.client_burst, args.max_inflight)
+    primary = peers[0]
+    clients = [SimClient(sim, f'c{i}', 9000 + i, primary.port, args.client_window) for i in range(args.clients)]
+    greedy = clients[0]  # --greedy-share 만큼의 부하를 혼자 보내는 클라이언트
+
+    latencies = {'admitted': [], 'end_to_end': [], 'greedy': [], 'others': [], 'late': []}
+
+    def on_commit(peer, block):
+        now = sim.clock.now
+        for tx in peer.block_transactions(block):
+            client = clients[int(tx['client'][1:])]
+            arrived = client.arrived.get(tx['nonce'])
+            if arrived is None:
+                continue
+            client.committed(tx['nonce'])
+            latency = now - client.attempted[tx['nonce']]
+            latencies['admitted'].append(latency)
+            latencies['end_to_end'].append(now - arrived)
+            latencies['greedy' if client is greedy else 'others'].append(latency)
+            if now >= args.duration - 1.0:
+                latencies['late'].append(latency)  # 마지막 1초에 커밋된 요청, 복제본 큐가 계속 자라면 여기가 가장 느림
+
+    primary.commit_listeners.append(on_commit)
+
+    def schedule_arrivals(client, client_rate):
+        when = sim.random.expovariate(client_rate)
+        while when < args.duration:
+            sim.schedule(when, client.arrive)
+            when += sim.random.expovariate(client_rate)
+
+    others = len(clients) - 1
+    schedule_arrivals(greedy, rate * args.greedy_share if args.greedy_share > 0 else rate / len(clients))
+    for client in clients[1:]:
+        schedule_arrivals(client, rate * (1 - args.greedy_share) / others if args.greedy_share > 0 else rate / len(clients))
+    sim.run(until=args.duration)
+
+    committed = len(latencies['admitted'])
+    metrics = primary.metrics.snapshot()
+    return {
+        'offered_tx_per_second': rate,
+        'admission': admission,
+        'submitted': sum(client.nonce for client in clients),
+        'committed': committed,
+        'throughput_tx_per_second': committed / args.duration,
+        'admitted_latency_p50': percentile(latencies['admitted'], 0.5),
+        'admitted_latency_p99': percentile(latencies['admitted'], 0.99),
+        'admitted_latency_max': max(latencies['admitted'], default=None),
+        'late_latency_p99': percentile(latencies['late'], 0.99),
+        'end_to_end_latency_p99': percentile(latencies['end_to_end'], 0.99),
+        'greedy_latency_p99': percentile(latencies['greedy'], 0.99),
+        'others_latency_p99': percentile(latencies['others'], 0.99),
+        'greedy_committed': len(latencies['greedy']),
+        'rejected_overloaded': metrics.get('rejected_overloaded', 0),
+        'rejected_rate_limited': metrics.get('rejected_rate_limited', 0),
+        'rejected_out_of_order': metrics.get('rejected_out_of_order', 0),
+        'mempool_at_end': len(primary.mempool),
+        'max_inflight': primary.admission.max_inflight if admission else None,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="포화 처리량의 몇 배로 부하를 걸었을 때 입장 제어(클라이언트별 token bucket + 전체 in-flight 상한)가 받아들인 요청의 지연을 묶어 두는지 측정")
+    parser.add_argument('--replicas', type=int, default=4)
+    parser.add_argument('--clients', type=int, default=64)
+    parser.add_argument('--loads', default='0.5,1,2', help="포화 처리량에 곱할 부하 배수들")
+    parser.add_argument('--saturation', type=float, default=None, help="포화 처리량 (tx/s), 없으면 먼저 입장 제어를 켜고 과부하로 재서 씀")
+    parser.add_argument('--block-txs', type=int, default=100, help="블록당 최대 트랜잭션 수, 포화 처리량을 정함")
+    parser.add_argument('--max-latency', type=float, default=0.05)
+    parser.add_argument('--max-inflight', type=int, default=None, help="전체 in-flight 상한, 없으면 (파이프라인 창 + 2) * 블록 크기")
+    parser.add_argument('--client-rate', type=float, default=None, help="클라이언트별 초당 허용 트랜잭션 수")
+    parser.add_argument('--client-burst', type=float, default=None)
+    parser.add_argument('--client-window', type=int, default=8, help="거절된 뒤 다시 보낼 때 한 번에 보내는 트랜잭션 수")
+    parser.add_argument('--greedy-share', type=float, default=0.0, help="클라이언트 하나가 혼자 보내는 부하 비율")
+    parser.add_argument('--duration', type=float, default=3.0)
+    parser.add_argument('--latency', type=float, default=0.005)
+    parser.add_argument('--jitter', type=float, default=0.002)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    saturation = args.saturation
+    if saturation is None:
+        # 받아들인 만큼만 처리하므로 과부하에서의 커밋 처리량이 곧 포화 처리량
+        # (블록 하나가 커밋되려면 적어도 세 번 건너야 하므로 block_txs / latency 는 포화 처리량의 세 배 이상)
+        probe = run(args, args.block_txs / args.latency, True)
+        saturation = probe['throughput_tx_per_second']
+    results = []
+    for load in args.loads.split(','):
+        for admission in (False, True):
+            result = run(args, saturation * float(load), admission)
+            result['load'] = float(load)
+            result['saturation_tx_per_second'] = saturation
+            results.append(result)
+    print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
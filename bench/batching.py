@@ -0,0 +1,89 @@
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from p import Peer
+from kb.sim import SimNetwork
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+def run(args, rate, fixed):
+    sim = SimNetwork(seed=args.seed, latency=args.latency, jitter=args.jitter)
+    peers = sim.build_cluster(Peer, args.replicas)
+    for peer in peers:
+        peer.verbose = False
+    primary = peers[0]
+    batcher = primary.enable_adaptive_batching(max_latency=args.max_latency, min_throughput=args.min_throughput,
+                                               max_inflight=args.max_inflight)
+    if fixed:
+        # 비교 기준: 크기와 대기 시간을 고정하고 조정하지 않음
+        batcher.tune_interval = float('inf')
+        batcher.batch_size = args.fixed_size
+        batcher.timeout = args.fixed_timeout
+
+    arrived = {}
+    latencies = []
+
+    def on_commit(peer, block):
+        for tx in peer.block_transactions(block):
+            latencies.append(sim.clock.time() - arrived.pop(tx['nonce']))
+
+    primary.commit_listeners.append(on_commit)
+
+    def arrive(nonce):
+        arrived[nonce] = sim.clock.time()
+        primary.submit_transaction({'client': 'bench', 'nonce': nonce, 'fee': 1, 'op': ('put', nonce % 100, nonce)})
+
+    # 열린 루프: 포아송 도착
+    when = 0.0
+    nonce = 0
+    while when < args.duration:
+        sim.schedule(when, arrive, nonce)
+        nonce += 1
+        when += sim.random.expovariate(rate)
+    sim.run(until=args.duration + 1.0)
+    committed = len(latencies)
+    metrics = primary.metrics.snapshot()
+    return {
+        'offered_tx_per_second': rate,
+        'committed_tx': committed,
+        'throughput_tx_per_second': committed / args.duration,
+        'latency_p50': percentile(latencies, 0.5),
+        'latency_p99': percentile(latencies, 0.99),
+        'blocks': len(primary.blockchain.chain) - 1,
+        'final_batch_size': batcher.batch_size,
+        'final_batch_timeout': batcher.timeout,
+        'batches_by_size': metrics.get('batches_by_size', 0),
+        'batches_by_timeout': metrics.get('batches_by_timeout', 0),
+        'tuning_decisions': metrics.get('batch_tuning_decisions', 0),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="고정 배치와 적응형 배치(AdaptiveBatcher)의 지연/처리량 비교")
+    parser.add_argument('--replicas', type=int, default=4)
+    parser.add_argument('--rates', default='50,500,5000,20000')
+    parser.add_argument('--duration', type=float, default=2.0)
+    parser.add_argument('--latency', type=float, default=0.005)
+    parser.add_argument('--jitter', type=float, default=0.001)
+    parser.add_argument('--max-latency', type=float, default=0.05)
+    parser.add_argument('--min-throughput', type=float, default=0.0)
+    parser.add_argument('--max-inflight', type=int, default=1)
+    parser.add_argument('--fixed-size', type=int, default=100)
+    parser.add_argument('--fixed-timeout', type=float, default=0.02)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    results = []
+    for rate in [float(rate) for rate in args.rates.split(',')]:
+        results.append({'fixed': run(args, rate, True), 'adaptive': run(args, rate, False)})
+    print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
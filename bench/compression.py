@@ -0,0 +1,61 @@
+import argparse
+import json
+import os
+import pickle
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from p import Block
+from kb.codec import Codec
+
+def records(count, rng):
+    # not_use/blockchain.py 의 {"amount": ...} 형태와 비슷한 반복적인 레코드
+    return [{'from': f"user{rng.randrange(1000)}", 'to': f"user{rng.randrange(1000)}",
+             'amount': rng.randrange(1, 10000), 'memo': 'transfer'} for _ in range(count)]
+
+def make_block(size, rng):
+    data = []
+    while len(pickle.dumps(data)) < size:
+        data.extend(records(max(1, size // 400), rng))
+    return Block(1, time.time(), data)
+
+def measure(codec, accepts, block, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        encoded = codec.encode(block, accepts)
+    encode_seconds = (time.perf_counter() - started) / repeat
+    started = time.perf_counter()
+    for _ in range(repeat):
+        codec.decode(encoded)
+    decode_seconds = (time.perf_counter() - started) / repeat
+    return len(encoded), encode_seconds, decode_seconds
+
+def main():
+    parser = argparse.ArgumentParser(description="블록 크기별 압축 방식의 CPU 비용과 절약된 바이트 비교")
+    parser.add_argument('--sizes', default='1024,16384,262144,1048576')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    training = [pickle.dumps(make_block(4096, rng)) for _ in range(50)]
+    results = []
+    for size in [int(s) for s in args.sizes.split(',')]:
+        block = make_block(size, rng)
+        raw = len(pickle.dumps(block))
+        for name, level in (('none', 0), ('zlib', 1), ('zlib', 6), ('zlib', 9), ('lzma', 6), ('zlib-dict', 6)):
+            codec = Codec(name, threshold=0, level=level)
+            if name == 'zlib-dict':
+                codec.train(training)
+            encoded, encode_seconds, decode_seconds = measure(codec, codec.supported(), block, args.repeat)
+            results.append({'block_bytes': raw, 'method': name, 'level': level, 'encoded_bytes': encoded,
+                            'saved_ratio': 1 - encoded / raw, 'encode_ms': encode_seconds * 1000,
+                            'decode_ms': decode_seconds * 1000,
+                            'encode_mb_per_s': raw / encode_seconds / 1e6 if encode_seconds else None})
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
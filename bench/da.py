@@ -0,0 +1,73 @@
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from p import Peer, Block
+from kb.netem import NetEm, Link
+from kb.sim import SimNetwork
+
+def main():
+    parser = argparse.ArgumentParser(description="주 노드가 본문을 싣는 방식과 배치 가용성 계층 방식을 비교")
+    parser.add_argument('--mode', choices=('direct', 'da'), default='da')
+    parser.add_argument('--replicas', type=int, default=7)
+    parser.add_argument('--rate', type=float, default=2000.0, help="복제본 하나당 초당 트랜잭션 수")
+    parser.add_argument('--tx-size', type=int, default=256)
+    parser.add_argument('--interval', type=float, default=0.05, help="배치/제안 주기 (초)")
+    parser.add_argument('--duration', type=float, default=2.0)
+    parser.add_argument('--bandwidth', type=float, default=None, help="링크(보내는 쪽-받는 쪽 한 방향)마다의 대역폭 (bytes/s)")
+    parser.add_argument('--uplink', type=float, default=10e6, help="노드마다 모든 링크가 나눠 쓰는 업링크 대역폭 (bytes/s), 주 노드의 전체 업로드가 병목이 될 수 있음")
+    parser.add_argument('--delay', type=float, default=0.01)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    netem = NetEm(seed=args.seed, default=Link(delay=args.delay, bandwidth=args.bandwidth), uplink=args.uplink)
+    sim = SimNetwork(seed=args.seed, netem=netem)
+    peers = sim.build_cluster(Peer, args.replicas)
+    for peer in peers:
+        peer.verbose = False
+    primary = peers[0]
+    per_tick = max(1, int(args.rate * args.interval))
+    committed = []
+
+    def on_commit(peer, block):
+        if sim.clock.time() > args.duration:
+            return
+        if isinstance(block.data, dict):
+            committed.append(len(peer.batches.transactions(block.data['batches'])))
+        else:
+            committed.append(len(block.data))
+    primary.commit_listeners.append(on_commit)
+
+    def tick(n):
+        # 압축되지 않는 본문: 협상된 코덱이 반복 문자열을 줄여 업로드량이 왜곡되지 않게
+        txs_per_replica = [[f"{peer.id}-{n}-{i}-" + format(sim.random.getrandbits(args.tx_size * 4), 'x').zfill(args.tx_size)
+                            for i in range(per_tick)] for peer in peers]
+        if args.mode == 'da':
+            for peer, txs in zip(peers, txs_per_replica):
+                peer.submit_batch(txs)
+            primary.propose_batches()
+        else:
+            # 모든 클라이언트 요청이 주 노드로 모이고 주 노드가 블록 본문에 실어 보냄
+            txs = [tx for batch in txs_per_replica for tx in batch]
+            primary.propose_block(Block(len(primary.blockchain.chain), sim.clock.time(), txs))
+
+    ticks = int(args.duration / args.interval)
+    for n in range(ticks):
+        sim.schedule(n * args.interval, tick, n)
+    sim.run(until=args.duration)
+
+    report = {
+        'mode': args.mode,
+        'replicas': args.replicas,
+        'offered_tx_per_second': args.rate * args.replicas,
+        'committed_tx_per_second': sum(committed) / args.duration,
+        'primary_upload_bytes': sim.bytes_by_src.get(primary.port, 0),
+        'max_replica_upload_bytes': max(sim.bytes_by_src.values()),
+    }
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from p import Peer
+from kb.sim import SimNetwork
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+def run(args, mode, crash):
+    sim = SimNetwork(seed=args.seed, latency=args.latency, jitter=args.jitter)
+    peers = sim.build_cluster(Peer, args.replicas)
+    for peer in peers:
+        peer.verbose = False
+        if mode == 'fixed':
+            peer.enable_adaptive_batching()
+        else:
+            peer.enable_rotation(mode, slot_timeout=args.slot_timeout)
+        if args.detector:
+            peer.enable_failure_detection(args.interval, args.threshold, args.view_change_timeout)
+    observer = peers[-1]  # 커밋 시각을 재는 복제본 (멈추는 복제본이 아닌 쪽)
+
+    arrived = {}
+    latencies = []
+    commits = []
+    events = {}
+    sent_to = {}  # 돌아가며 제안할 때 (클라이언트, nonce) -> 보낸 복제본
+    pending = {}
+
+    def on_commit(peer, block):
+        now = sim.clock.time()
+        commits.append(now)
+        for tx in peer.block_transactions(block):
+            key = (tx['client'], tx['nonce'])
+            if key in arrived:
+                latencies.append(now - arrived.pop(key))
+
+    observer.commit_listeners.append(on_commit)
+
+    def arrive(nonce):
+        client = f'c{nonce % 64}'
+        arrived[(client, nonce // 64)] = sim.clock.time()
+        tx = {'client': client, 'nonce': nonce // 64, 'fee': 1, 'op': ('put', nonce % 100, nonce)}
+        alive = [peer for peer in peers if peer.network.running]
+        if mode == 'fixed':
+            # PBFT 클라이언트처럼 모든 복제본에 보냄: 주 노드가 바뀌면 새 주 노드가 자기 mempool 에서 이어서 제안함
+            for peer in alive:
+                peer.submit_transaction(dict(tx))
+        else:
+            target = alive[nonce % 64 % len(alive)]
+            sent_to[(client, nonce // 64)] = target.id
+            pending[(client, nonce // 64)] = tx
+            target.submit_transaction(tx)
+
+    def stop_replica():
+        peers[crash].network.stop()
+        events['crashed'] = sim.clock.time()
+        sim.schedule(args.client_timeout, resubmit)
+
+    def resubmit():
+        # 멈춘 복제본에 보냈던 클라이언트는 응답이 없으면 커밋되지 않은 요청을 nonce 순서대로 다른 복제본에 다시 보냄
+        alive = [peer for peer in peers if peer.network.running]
+        for key in sorted(arrived, key=lambda key: key[1]):
+            if key in sent_to and sent_to[key] == crash:
+                tx = pending[key]
+                alive[int(key[0][1:]) % len(alive)].submit_transaction(tx)
+                events['resubmitted'] = events.get('resubmitted', 0) + 1
+
+    def probe():
+        # 처음 의심한 시각과 새 view 가 설치된 시각을 기록
+        live = [peer for peer in peers if peer.network.running]
+        if 'crashed' in events and 'first_suspicion' not in events and any(peer.metrics.get('suspicions') for peer in live):
+            events['first_suspicion'] = sim.clock.time()
+        if 'view_installed' not in events and observer.view > 0:
+            events['view_installed'] = sim.clock.time()
+        if sim.clock.time() < args.duration:
+            sim.schedule(0.001, probe)
+
+    when = 0.0
+    nonce = 0
+    while when < args.duration:
+        sim.schedule(when, arrive, nonce)
+        nonce += 1
+        when += sim.random.expovariate(args.rate)
+    if crash is not None:
+        sim.schedule(args.crash_at, stop_replica)
+    sim.schedule(0.0, probe)
+    sim.run(until=args.duration + 2.0)
+
+    alive = [peer for peer in peers if peer.network.running]
+    after = [t for t in commits if t >= args.crash_at]
+    gaps = [b - a for a, b in zip(commits, commits[1:])]
+    rtts = [stats['rtt'] for stats in observer.failure_metrics().values() if stats['rtt'] is not None]
+    return {
+        'mode': mode,
+        'crash': crash,
+        'submitted': nonce,
+        'committed': len(latencies),
+        'throughput_tx_per_second': len(latencies) / args.duration,
+        'latency_p50': percentile(latencies, 0.5),
+        'latency_p99': percentile(latencies, 0.99),
+        'max_commit_gap': max(gaps) if gaps else 0.0,
+        'first_commit_after_crash': after[0] - args.crash_at if crash is not None and after else None,
+        'detection_delay': events['first_suspicion'] - events['crashed'] if 'first_suspicion' in events else None,
+        'view_installed_after': events['view_installed'] - events['crashed'] if 'view_installed' in events and 'crashed' in events else None,
+        'view': observer.view,
+        'resubmitted': events.get('resubmitted', 0),
+        # 멈춘 복제본이 없는데 의심했다면 오탐
+        'suspicions': sum(peer.metrics.get('suspicions') for peer in alive),
+        'suspicions_cleared': sum(peer.metrics.get('suspicions_cleared') for peer in alive),
+        'slot_round_changes': sum(peer.metrics.get('slot_round_changes') for peer in alive),
+        'heartbeats_sent': sum(peer.metrics.get('heartbeats_sent') for peer in peers),
+        'heartbeats_piggybacked': sum(peer.metrics.get('heartbeats_piggybacked') for peer in peers),
+        'observer_rtt_mean': sum(rtts) / len(rtts) if rtts else None,
+        'chains_agree': len({peer.blockchain.chain[-1].hash for peer in alive}) == 1,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="주 노드(또는 제안자)를 멈춘 뒤 장애 감지, view change/슬롯 라운드 변경, 커밋 재개까지 걸리는 시간과 멈춤 없는 부하에서의 오탐 측정")
+    parser.add_argument('--replicas', type=int, default=4)
+    parser.add_argument('--modes', default='fixed,block')
+    parser.add_argument('--rate', type=float, default=2000.0)
+    parser.add_argument('--duration', type=float, default=3.0)
+    parser.add_argument('--latency', type=float, default=0.005)
+    parser.add_argument('--jitter', type=float, default=0.002)
+    parser.add_argument('--crash', type=int, default=0, help="이 id 의 복제본을 --crash-at 에 멈춤 (주 노드 고정이면 0 이 주 노드)")
+    parser.add_argument('--crash-at', type=float, default=1.0)
+    parser.add_argument('--interval', type=float, default=0.05, help="heartbeat 주기")
+    parser.add_argument('--threshold', type=float, default=8.0, help="이 phi 이상이면 의심")
+    parser.add_argument('--view-change-timeout', type=float, default=0.5)
+    parser.add_argument('--slot-timeout', type=float, default=0.2)
+    parser.add_argument('--client-timeout', type=float, default=0.3, help="멈춘 복제본에 보낸 요청을 클라이언트가 다시 보내기까지 기다리는 시간")
+    parser.add_argument('--no-detector', dest='detector', action='store_false', help="장애 감지 없이 비교")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    results = []
+    for mode in args.modes.split(','):
+        results.append(run(args, mode, None))
+        results.append(run(args, mode, args.crash))
+    print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,268 @@
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from p import Peer, Block
+from kb.netem import Link, NetEm
+from kb.sim import SimNetwork
+
+# 장애 상황마다 가상 네트워크에서 클러스터를 돌려 보고 기대한 결과가 나오는지 확인함
+# 실패한 시나리오가 있으면 종료 코드 1
+
+def build(args, replicas, partitions=False):
+    # partitions 면 netem 으로 보내서 파티션을 걸 수 있게 함 (지연은 같은 uniform 분포)
+    netem = NetEm(args.seed, Link(args.latency + args.jitter / 2, args.jitter / 2, 'uniform')) if partitions else None
+    sim = SimNetwork(seed=args.seed, latency=args.latency, jitter=args.jitter, netem=netem)
+    peers = sim.build_cluster(Peer, replicas)
+    for peer in peers:
+        peer.verbose = False
+    return sim, peers
+
+def propose_blocks(sim, primary, count, interval):
+    def propose(i):
+        primary.propose_block(Block(len(primary.blockchain.chain), sim.clock.time(), f"block {i}"))
+    for i in range(count):
+        sim.schedule(i * interval, propose, i)
+
+def heights(peers):
+    return {peer.id: len(peer.blockchain.chain) - 1 for peer in peers}
+
+def tree_faulty_relay(args):
+    # 릴레이 트리의 안쪽 노드가 비잔틴이라 본문을 넘기지 않아도 하위 트리가 투표를 보고 본문을 받아와 커밋해야 함
+    sim, peers = build(args, 13)
+    for peer in peers:
+        peer.dissemination = 'tree'
+        peer.tree_fanout = 2
+    peers[1].is_byzantine = True  # 루트의 첫 자식: 3, 4 와 그 아래 7~10 이 이 노드에게서 본문을 받음
+    propose_blocks(sim, peers[0], 5, 0.05)
+    sim.run(until=5.0)
+    honest = [peer for peer in peers if not peer.is_byzantine]
+    committed = heights(honest)
+    return {
+        'committed': committed,
+        'body_requests': sum(peer.metrics.get('body_requests') for peer in honest),
+        'passed': all(height == 5 for height in committed.values())
+                  and len({peer.blockchain.chain[-1].hash for peer in honest}) == 1,
+    }
+
+def view_change_inflight(args):
+    # 주 노드의 제안이 파티션으로 사라진 채 view change 가 일어남
+    # 제안된 트랜잭션은 옛 주 노드에만 있으므로 mempool 로 되돌려야 다시 주 노드가 됐을 때 제안됨
+    sim, peers = build(args, 4, partitions=True)
+    primary = peers[0]
+    txs = [{'client': 'c0', 'nonce': nonce, 'fee': 1, 'op': ('put', nonce, nonce)} for nonce in range(20)]
+    for tx in txs:
+        primary.submit_transaction(tx)
+    sim.netem.partition([primary.port], [peer.port for peer in peers[1:]])
+    sim.schedule(0.0, primary.propose_from_mempool, 10)
+    sim.schedule(0.05, sim.netem.heal)
+
+    def change_view(view):
+        for peer in peers:
+            peer.start_view_change(view)
+    sim.schedule(0.1, change_view, 1)  # 주 노드 1: 트랜잭션을 모름
+    sim.schedule(0.5, change_view, 4)  # 다시 주 노드 0
+    sim.schedule(0.9, primary.propose_from_mempool, 100)
+    sim.run(until=2.0)
+    committed = heights(peers)
+    executed = sum(len(primary.block_transactions(block)) for block in primary.blockchain.chain)
+    return {
+        'committed': committed,
+        'views': {peer.id: peer.view for peer in peers},
+        'requeued_txs': primary.metrics.get('requeued_txs'),
+        'committed_txs': executed,
+        'inflight_left': len(primary.mempool.inflight),
+        'passed': executed == len(txs) and not primary.mempool.inflight
+                  and len({peer.blockchain.chain[-1].hash for peer in peers}) == 1,
+    }
+
+def batcher_view_change(args):
+    # 적응형 배치를 켠 채 주 노드의 제안이 사라지고 view 가 두 번 바뀌어 다시 주 노드 0 이 됨
+    # 사라진 제안이 batcher.inflight 에 남으면 파이프라인이 찬 것으로 보여 더 이상 제안하지 못함
+    sim, peers = build(args, 4, partitions=True)
+    for peer in peers:
+        peer.enable_adaptive_batching()
+    primary = peers[0]
+    sent = []
+    committed = set()
+    # 체인은 체크포인트에서 가지치기되므로 커밋될 때 셈
+    peers[-1].commit_listeners.append(lambda peer, block: committed.update(tx['nonce'] for tx in peer.block_transactions(block)))
+
+    def arrive(nonce):
+        # PBFT 클라이언트처럼 모든 복제본에 보냄
+        tx = {'client': 'c0', 'nonce': nonce, 'fee': 1, 'op': ('put', nonce % 10, nonce)}
+        sent.append(nonce)
+        for peer in peers:
+            peer.submit_transaction(dict(tx))
+    for nonce in range(200):
+        sim.schedule(nonce * 0.01, arrive, nonce)
+
+    def change_view(view):
+        for peer in peers:
+            peer.start_view_change(view)
+    sim.schedule(0.2, sim.netem.partition, [primary.port], [peer.port for peer in peers[1:]])
+    sim.schedule(0.25, sim.netem.heal)
+    sim.schedule(0.3, change_view, 1)
+    sim.schedule(0.8, change_view, 4)  # 다시 주 노드 0
+    sim.run(until=3.0)
+    return {
+        'committed': heights(peers),
+        'views': {peer.id: peer.view for peer in peers},
+        'sent_txs': len(sent),
+        'committed_txs': len(committed),
+        'pipeline_full': primary.metrics.get('batch_pipeline_full'),
+        'passed': len(committed) == len(sent) and len({peer.blockchain.chain[-1].hash for peer in peers}) == 1,
+    }
+
+def lagging_primary(args):
+    # 주 노드가 1초 동안 파티션되어 그 사이 나머지가 view 1 로 넘어감
+    # 돌아온 옛 주 노드는 view_change 를 못 받았으므로 new_view 증거를 받고 따라와야 함
+    sim, peers = build(args, 4, partitions=True)
+    for peer in peers:
+        peer.enable_adaptive_batching()
+        peer.enable_failure_detection()
+    primary = peers[0]
+    sent = []
+    committed = set()
+    peers[-1].commit_listeners.append(lambda peer, block: committed.update(tx['nonce'] for tx in peer.block_transactions(block)))
+
+    def arrive(nonce):
+        tx = {'client': 'c0', 'nonce': nonce, 'fee': 1, 'op': ('put', nonce % 10, nonce)}
+        sent.append(nonce)
+        for peer in peers:
+            peer.submit_transaction(dict(tx))
+    for nonce in range(150):
+        sim.schedule(nonce * 0.02, arrive, nonce)
+    sim.schedule(0.5, sim.netem.partition, [primary.port], [peer.port for peer in peers[1:]])
+    sim.schedule(1.5, sim.netem.heal)
+    sim.run(until=5.0)
+    views = {peer.id: peer.view for peer in peers}
+    return {
+        'committed': heights(peers),
+        'views': views,
+        'new_views_adopted': primary.metrics.get('new_views_adopted'),
+        'sent_txs': len(sent),
+        'committed_txs': len(committed),
+        'passed': len(set(views.values())) == 1 and views[0] > 0 and len(committed) == len(sent)
+                  and len({peer.blockchain.chain[-1].hash for peer in peers}) == 1,
+    }
+
+def prepared_certificate(args):
+    # view change 에서 같은 높이에 서로 다른 블록이 보고됨: A 는 view 0 에서, B 는 view 1 에서 2f+1 인증서로 준비됐고
+    # C 는 두 복제본이 보고했지만 인증서가 모자람, 새 주 노드는 가장 높은 view 에서 준비된 B 를 다시 제안해야 함
+    sim, peers = build(args, 4)
+    quorum = peers[0].quorum
+    full = quorum.bit(0) | quorum.bit(1) | quorum.bit(2)
+    short = quorum.bit(0) | quorum.bit(1)
+    a, b, c = (Block(1, 0.001 * i, name) for i, name in enumerate('ABC', 1))
+    reports = {0: [(a, 0, full)], 1: [(b, 1, full), (c, 1, short)], 3: [(c, 1, short)]}
+    for peer in peers:
+        for peer_id, prepared in reports.items():
+            peer.handle_view_change(2, peer_id, prepared)
+    sim.run(until=1.0)
+    chain = peers[1].blockchain.chain
+    return {
+        'committed': heights(peers),
+        'views': {peer.id: peer.view for peer in peers},
+        'block_1': chain[1].data if len(chain) > 1 else None,
+        'passed': all(peer.view == 2 for peer in peers) and len(chain) > 1 and chain[1].data == 'B'
+                  and len({peer.blockchain.chain[-1].hash for peer in peers}) == 1,
+    }
+
+def malformed_ops(args):
+    # 인자 수나 타입이 틀린 연산이 블록에 들어가도 모든 복제본이 같은 결과로 건너뛰고 계속 실행해야 함
+    sim, peers = build(args, 4)
+    primary = peers[0]
+    ops = [('put', 'k'), ('put', 'a', 5), ('transfer', 'a', 'b', 'x'), ('put', ['unhashable'], 1),
+           ('transfer', 'a', 'b', 2), ('delete',), ('put', 'c', float('inf')), ('get', 'a')]
+    for nonce, op in enumerate(ops):
+        primary.submit_transaction({'client': 'c0', 'nonce': nonce, 'fee': 1, 'op': op})
+    sim.schedule(0.0, primary.propose_from_mempool, 3)
+    sim.schedule(0.1, primary.propose_from_mempool, 100)
+    sim.run(until=1.0)
+    return {
+        'committed': heights(peers),
+        'executed': {peer.id: peer.executed_height for peer in peers},
+        'invalid_ops': {peer.id: peer.state.invalid for peer in peers},
+        'passed': all(peer.executed_height == 2 for peer in peers)
+                  and len({peer.state.state_hash() for peer in peers}) == 1
+                  and primary.state.data == {'a': 3, 'b': 2},
+    }
+
+def late_body(args):
+    # 주 노드의 본문이 한 복제본에게만 가지 않음, 나머지가 커밋해서 preprepare_msgs 에서 지운 뒤에 본문을 요청하므로
+    # 체인에 붙은 블록에서 제안된 해시의 본문을 되살려 보내야 함
+    sim, peers = build(args, 4)
+    primary, late = peers[0], peers[3]
+    multicast = primary.network.multicast_message
+
+    def skip_late(peer_ports, message):
+        if message['type'] == 'preprepare':
+            peer_ports = [port for port in peer_ports if port != late.port]
+        multicast(peer_ports, message)
+    primary.network.multicast_message = skip_late
+    propose_blocks(sim, primary, 3, 0.02)
+    sim.run(until=2.0)
+    return {
+        'committed': heights(peers),
+        'bodies_fetched': late.metrics.get('bodies_fetched'),
+        'passed': all(height == 3 for height in heights(peers).values())
+                  and len({peer.blockchain.chain[-1].hash for peer in peers}) == 1,
+    }
+
+def slow_leader(args):
+    # 돌아가며 제안할 때 한 제안자의 preprepare 가 두 복제본에게 0.5초 늦게 감: 슬롯의 투표가 갈려도
+    # 슬롯 라운드를 바꿔 다음 제안자가 그 블록을 다시 제안하고 체인이 계속 자라야 함
+    sim, peers = build(args, 4, partitions=True)
+    slow = peers[1]
+    for peer in peers[2:]:
+        sim.netem.set_link(slow.port, peer.port, Link(0.5), symmetric=False)
+    for peer in peers:
+        peer.enable_rotation('block', slot_timeout=0.05)
+    committed = []
+    peers[0].commit_listeners.append(lambda peer, block: committed.extend(
+        (tx['client'], tx['nonce']) for tx in peer.block_transactions(block)))
+
+    def arrive(n):
+        peers[n % 4].submit_transaction({'client': f'c{n % 4}', 'nonce': n // 4, 'fee': 1, 'op': ('put', n % 10, n)})
+    for n in range(800):
+        sim.schedule(n * 0.005, arrive, n)
+    sim.run(until=10.0)
+    return {
+        'committed': heights(peers),
+        'committed_txs': len(committed),
+        'slot_round_changes': {peer.id: peer.metrics.get('slot_round_changes') for peer in peers},
+        'passed': len(committed) == 800 and len(set(committed)) == 800
+                  and len({peer.blockchain.chain[-1].hash for peer in peers}) == 1,
+    }
+
+SCENARIOS = {
+    'tree_faulty_relay': tree_faulty_relay,
+    'view_change_inflight': view_change_inflight,
+    'batcher_view_change': batcher_view_change,
+    'lagging_primary': lagging_primary,
+    'prepared_certificate': prepared_certificate,
+    'malformed_ops': malformed_ops,
+    'late_body': late_body,
+    'slow_leader': slow_leader,
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="장애 시나리오별로 클러스터가 계속 커밋하고 복제본들이 같은 상태에 이르는지 확인")
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--latency', type=float, default=0.005)
+    parser.add_argument('--jitter', type=float, default=0.002)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    results = {}
+    for name in args.scenarios.split(','):
+        results[name] = SCENARIOS[name](args)
+    print(json.dumps(results, indent=2))
+    sys.exit(0 if all(result['passed'] for result in results.values()) else 1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from p import Peer
+from kb.membership import Membership
+from kb.network import Network
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+def replica_main(id, base_port, replicas, byzantine, max_latency, membership, listening, connected, stop):
+    # 복제본 하나를 별도 프로세스로 띄움
+    # 멤버십이 있으면 바로 구성이 끝나고, 없으면 README 의 수동 연결 순서를 자동으로 밟음
+    if membership is not None:
+        peer = Peer.from_membership(Membership.from_dict(membership), id)
+    else:
+        peer = Peer(id, base_port + id)
+    peer.verbose = False
+    peer.is_byzantine = id in byzantine
+    listening.wait()
+    if membership is None:
+        for other in range(id + 1, replicas):
+            peer.connect_peer(other, base_port + other)
+    connected.wait()
+    if id == peer.primary_id:
+        peer.enable_adaptive_batching(max_latency=max_latency)
+    stop.wait()
+    peer.stop_server()
+
+class LoadClient:
+    # 주 노드에 트랜잭션을 보내고, 헤더 구독으로 커밋 시각을 받아 트랜잭션별 지연을 잼
+    def __init__(self, port, primary_port, payload, name='load'):
+        self.id = name
+        self.port = port
+        self.primary_port = primary_port
+        self.payload = payload
+        self.lock = threading.Lock()
+        self.sent = {}
+        self.latencies = []
+        self.first_sent = None
+        self.last_commit = None
+        self.nonce = 0
+        self.blocks = 0
+        self.on_committed = None
+        self.network = Network(self)
+        self.network.start()
+
+    def handle_message(self, message, client_socket=None):
+        if message['type'] == 'header':
+            self.on_header(message['header'], time.time())
+
+    def subscribe(self):
+        self.network.send_message(self.primary_port, {'type': 'subscribe_headers', 'peer_port': self.port})
+
+    def submit(self):
+        with self.lock:
+            nonce = self.nonce
+            self.nonce += 1
+            now = time.time()
+            self.sent[nonce] = now
+            if self.first_sent is None:
+                self.first_sent = now
+        tx = {'client': self.id, 'nonce': nonce, 'fee': 1, 'op': ('put', nonce, self.payload)}
+        self.network.send_message(self.primary_port, {'type': 'transaction', 'tx': tx})
+
+    def on_header(self, header, received):
+        response = self.network.request(self.primary_port, {'type': 'query', 'method': 'get_block', 'args': (header['height'],)})
+        block = response['result'] if response else None
+        if block is None or not isinstance(block.data, list):
+            return
+        done = 0
+        with self.lock:
+            self.blocks += 1
+            for tx in block.data:
+                if isinstance(tx, dict) and tx.get('client') == self.id and tx['nonce'] in self.sent:
+                    self.latencies.append(received - self.sent.pop(tx['nonce']))
+                    done += 1
+            if done:
+                self.last_commit = received
+        if self.on_committed is not None:
+            for _ in range(done):
+                self.on_committed()
+
+    def stop(self):
+        self.network.stop()
+
+def open_loop(client, rate, duration):
+    # 응답과 상관없이 정해진 속도로 보냄
+    started = time.time()
+    count = 0
+    while True:
+        at = started + count / rate
+        if at - started >= duration:
+            break
+        time.sleep(max(0.0, at - time.time()))
+        client.submit()
+        count += 1
+
+def closed_loop(client, concurrency, duration):
+    # 항상 concurrency 개가 처리 중이도록 커밋될 때마다 하나씩 보냄
+    deadline = time.time() + duration
+
+    def refill():
+        if time.time() < deadline:
+            client.submit()
+
+    client.on_committed = refill
+    for _ in range(concurrency):
+        client.submit()
+    time.sleep(duration)
+    client.on_committed = None
+
+def main():
+    parser = argparse.ArgumentParser(description="복제본 N 개를 로컬 포트에 띄우고 부하를 걸어 처리량과 커밋 지연 백분위를 JSON 으로 출력")
+    parser.add_argument('--replicas', type=int, default=4)
+    parser.add_argument('--byzantine', type=int, default=0, help="is_byzantine 으로 설정할 복제본 수 (주 노드 제외, 뒤쪽 id 부터)")
+    parser.add_argument('--mode', choices=('open', 'closed'), default='open')
+    parser.add_argument('--rate', type=float, default=200.0, help="open: 초당 트랜잭션 수")
+    parser.add_argument('--concurrency', type=int, default=16, help="closed: 동시에 처리 중인 트랜잭션 수")
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--drain', type=float, default=2.0, help="부하를 멈춘 뒤 남은 커밋을 기다리는 시간")
+    parser.add_argument('--payload', type=int, default=128, help="트랜잭션 값 크기 (bytes)")
+    parser.add_argument('--max-latency', type=float, default=0.05, help="주 노드 AdaptiveBatcher 의 지연 목표")
+    parser.add_argument('--base-port', type=int, default=6000)
+    parser.add_argument('--handshake', action='store_true', help="멤버십 파일 대신 connect_peer 로 n² 번 연결")
+    args = parser.parse_args()
+
+    byzantine = set(range(args.replicas - args.byzantine, args.replicas)) - {0}
+    membership = None if args.handshake else Membership.local(args.replicas, args.base_port).to_dict()
+    listening = multiprocessing.Event()
+    connected = multiprocessing.Event()
+    stop = multiprocessing.Event()
+    processes = [multiprocessing.Process(target=replica_main, daemon=True,
+                                         args=(i, args.base_port, args.replicas, byzantine, args.max_latency,
+                                               membership, listening, connected, stop))
+                 for i in range(args.replicas)]
+    for process in processes:
+        process.start()
+    time.sleep(0.5)
+    listening.set()
+    if args.handshake:
+        time.sleep(0.5 + 0.1 * args.replicas)
+    connected.set()
+    time.sleep(0.2)
+
+    client = LoadClient(args.base_port + args.replicas, args.base_port, 'x' * args.payload)
+    client.subscribe()
+    time.sleep(0.2)
+    try:
+        if args.mode == 'open':
+            open_loop(client, args.rate, args.duration)
+        else:
+            closed_loop(client, args.concurrency, args.duration)
+        time.sleep(args.drain)
+    finally:
+        stop.set()
+        client.stop()
+        for process in processes:
+            process.join(timeout=5.0)
+
+    latencies = client.latencies
+    elapsed = (client.last_commit - client.first_sent) if client.last_commit and client.first_sent else 0.0
+    report = {
+        'mode': args.mode,
+        'replicas': args.replicas,
+        'byzantine': sorted(byzantine),
+        'bootstrap': 'handshake' if args.handshake else 'membership',
+        'payload_bytes': args.payload,
+        'offered_rate': args.rate if args.mode == 'open' else None,
+        'concurrency': args.concurrency if args.mode == 'closed' else None,
+        'submitted': client.nonce,
+        'committed': len(latencies),
+        'blocks': client.blocks,
+        'throughput_tx_per_second': len(latencies) / elapsed if elapsed > 0 else 0.0,
+        'latency_p50': percentile(latencies, 0.50),
+        'latency_p99': percentile(latencies, 0.99),
+        'latency_p999': percentile(latencies, 0.999),
+    }
+    print(json.dumps(report, indent=2))
+
+if __name__ == '__main__':
+    main()
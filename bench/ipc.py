@@ -0,0 +1,112 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from kb.ipc import unix_path
+from kb.network import Network
+
+class Sink:
+    # 받은 메시지 수만 세는 수신 측, 여러 프로세스의 수신 측이 같은 카운터를 올림
+    def __init__(self, port, received, delay=0.0):
+        self.id = 'sink'
+        self.port = port
+        self.received = received
+        self.delay = delay  # 메시지 처리 시간 (actor inbox 가 밀려 handle_message 가 늦게 끝나는 상황)
+
+    def handle_message(self, message, client_socket=None):
+        if self.delay:
+            time.sleep(self.delay)
+        with self.received.get_lock():
+            self.received.value += 1
+
+class Source:
+    def __init__(self, port):
+        self.id = 'source'
+        self.port = port
+        self.peers = {}
+
+def receiver_main(port, path, received, ready, stop, delay):
+    sink = Sink(port, received, delay)
+    network = Network(sink, unix_path=path)
+    network.start()
+    ready.set()
+    stop.wait()
+    network.stop()
+
+def run(args, mode, size, count, port):
+    # 수신 측은 각각 별도 프로세스라서 공유 메모리도 실제로 프로세스 경계를 넘음
+    directory = tempfile.mkdtemp()
+    received = multiprocessing.Value('i', 0)
+    stop = multiprocessing.Event()
+    ports = [port + i for i in range(args.fanout)]
+    paths = [unix_path(directory, p) for p in ports]
+    processes = []
+    for p, path in zip(ports, paths):
+        ready = multiprocessing.Event()
+        process = multiprocessing.Process(target=receiver_main, args=(p, path, received, ready, stop, args.handler_delay), daemon=True)
+        process.start()
+        ready.wait()
+        processes.append(process)
+    time.sleep(0.3)
+
+    source = Source(port + args.fanout)
+    network = Network(source, shm_threshold=args.shm_threshold if mode == 'shm' else None, shm_size=args.shm_size)
+    addresses = ports if mode == 'tcp' else paths
+    message = {'type': 'bench', 'payload': os.urandom(size)}
+    expected = count * len(addresses)
+    started = time.perf_counter()
+    for sent in range(count):
+        # 받는 쪽보다 window 개 넘게 앞서지 않게 함 (accept 대기열이 넘쳐 SYN 재전송을 재는 일이 없도록)
+        while sent * len(addresses) - received.value > args.window:
+            time.sleep(0.0001)
+        network.multicast_message(addresses, message)
+    deadline = time.time() + 60.0
+    while received.value < expected and time.time() < deadline:
+        time.sleep(0.0005)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    for process in processes:
+        process.join(timeout=5.0)
+    if network.ring is not None:
+        network.ring.close()
+    return {
+        'transport': mode,
+        'message_bytes': size,
+        'messages': count,
+        'receivers': len(addresses),
+        'delivered': received.value,
+        'messages_per_second': received.value / elapsed,
+        'megabytes_per_second': received.value * size / elapsed / 1e6,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="같은 호스트에서 TCP 루프백, Unix 도메인 소켓, Unix 소켓 + 공유 메모리 링의 메시지 처리율과 대용량 전송 속도 비교")
+    parser.add_argument('--transports', default='tcp,unix,shm')
+    parser.add_argument('--small', type=int, default=256, help="처리율 측정용 메시지 크기 (bytes)")
+    parser.add_argument('--small-count', type=int, default=5000)
+    parser.add_argument('--bulk', type=int, default=8 * 1024 * 1024, help="대용량 전송 메시지 크기 (bytes)")
+    parser.add_argument('--bulk-count', type=int, default=40)
+    parser.add_argument('--fanout', type=int, default=3, help="같은 메시지를 받는 수신 프로세스 수 (multicast)")
+    parser.add_argument('--window', type=int, default=64, help="받는 쪽보다 앞서 보낼 수 있는 메시지 수")
+    parser.add_argument('--handler-delay', type=float, default=0.0, help="받는 쪽이 메시지 하나를 처리하는 데 걸리는 시간 (초)")
+    parser.add_argument('--shm-threshold', type=int, default=1024 * 1024)
+    parser.add_argument('--shm-size', type=int, default=64 * 1024 * 1024)
+    parser.add_argument('--base-port', type=int, default=6500)
+    args = parser.parse_args()
+
+    results = []
+    port = args.base_port
+    for mode in args.transports.split(','):
+        for size, count in ((args.small, args.small_count), (args.bulk, args.bulk_count)):
+            results.append(run(args, mode, size, count, port))
+            port += args.fanout + 1
+    print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from p import Block, Peer
+from kb.multi import MultiInstancePeer
+
+# 복제본마다 K 개의 PBFT 인스턴스를 돌릴 때 전역 로그에 합쳐지는 처리율을 K 별로 잼
+# 모든 복제본이 자기가 주 노드인 인스턴스들에 돌아가며 제안하고, 복제본 0 의 전역 로그로 셈
+
+def run(args, instances, base_port):
+    replicas = [MultiInstancePeer(Peer, Block, id, base_port + id, instances=instances, port_stride=args.replicas,
+                                  pad_interval=args.pad_interval)
+                for id in range(args.replicas)]
+    merged = []
+    done = threading.Event()
+
+    def on_merged(instance, block):
+        merged.append((instance, time.perf_counter()))
+        if len(merged) >= args.blocks:
+            done.set()
+    replicas[0].commit_listeners.append(on_merged)
+    time.sleep(args.startup)
+    for i, replica in enumerate(replicas):
+        for j in range(i + 1, args.replicas):
+            replica.connect_peer(j, base_port + j)
+    deadline = time.time() + args.startup * 4
+    while time.time() < deadline and any(replica.total_peers < args.replicas for replica in replicas):
+        time.sleep(0.05)
+    time.sleep(args.startup)
+
+    payload = ['x' * args.tx_size] * args.block_txs
+    started = time.perf_counter()
+    proposed = 0
+    # 인스턴스마다 window 개보다 많이 앞서 제안하지 않음 (커밋 속도를 넘는 제안으로 큐만 쌓이지 않게)
+    while not done.is_set() and time.perf_counter() - started < args.duration:
+        if proposed - len(merged) >= args.window * instances:
+            time.sleep(0.001)
+            continue
+        for replica in replicas:
+            if replica.propose(payload) is not None:
+                proposed += 1
+    done.wait(timeout=max(0.0, args.duration - (time.perf_counter() - started)))
+    elapsed = (merged[-1][1] if merged else time.perf_counter()) - started
+    per_instance = {}
+    for instance, _ in merged:
+        per_instance[instance] = per_instance.get(instance, 0) + 1
+    result = {
+        'instances': instances,
+        'replicas': args.replicas,
+        'blocks_merged': len(merged),
+        'blocks_per_instance': per_instance,
+        'rejected': sum(replica.rejected for replica in replicas),
+        'seconds': elapsed,
+        'blocks_per_second': len(merged) / elapsed if elapsed > 0 else None,
+        'tx_per_second': len(merged) * args.block_txs / elapsed if elapsed > 0 else None,
+    }
+    for replica in replicas:
+        replica.stop()
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="병렬 PBFT 인스턴스 수(K)에 따른 전역 로그 처리율 비교")
+    parser.add_argument('--instances', default='1,2,4', help="비교할 K 목록")
+    parser.add_argument('--replicas', type=int, default=4)
+    parser.add_argument('--blocks', type=int, default=200, help="전역 로그에 이만큼 합쳐지면 멈춤")
+    parser.add_argument('--block-txs', type=int, default=100)
+    parser.add_argument('--tx-size', type=int, default=64, help="트랜잭션 하나의 크기 (bytes)")
+    parser.add_argument('--window', type=int, default=4, help="인스턴스마다 커밋을 기다리지 않고 제안할 수 있는 블록 수")
+    parser.add_argument('--pad-interval', type=float, default=0.05)
+    parser.add_argument('--duration', type=float, default=30.0)
+    parser.add_argument('--startup', type=float, default=0.5)
+    parser.add_argument('--base-port', type=int, default=7100)
+    args = parser.parse_args()
+
+    results = []
+    for i, instances in enumerate([int(k) for k in args.instances.split(',')]):
+        # K 마다 포트 대역을 바꿔 앞 실행의 TIME_WAIT 소켓과 겹치지 않게 함
+        results.append(run(args, instances, args.base_port + i * args.replicas * 16))
+    baseline = results[0]['tx_per_second']
+    for result in results:
+        result['speedup'] = result['tx_per_second'] / baseline if baseline and result['tx_per_second'] else None
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
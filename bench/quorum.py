@@ -0,0 +1,102 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from p import Peer, Block, BlockChain, BlockRef
+from kb.codec import Codec
+
+class CountingTransport:
+    # 아무것도 보내지 않고 보낸 메시지 수만 세는 전송 계층, 한 복제본의 투표 처리 비용만 잼
+    threaded = False
+
+    def __init__(self, peer):
+        self.peer = peer
+        self.codec = Codec()
+        self.accepts = {}
+        self.sent = 0
+
+    def now(self):
+        return time.time()
+
+    def call_later(self, delay, fn, *args):
+        pass
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def send_message(self, peer_port, message):
+        self.sent += 1
+        return True
+
+    def broadcast_message(self, message):
+        self.sent += len(self.peer.peers)
+
+    def multicast_message(self, peer_ports, message):
+        self.sent += len(peer_ports)
+
+    def request(self, peer_port, message):
+        return None
+
+    def reply(self, client_socket, message):
+        pass
+
+def vote_sizes(peer):
+    sizes = [sys.getsizeof(votes) for votes in list(peer.prepare_msgs.values()) + list(peer.commit_msgs.values())]
+    return max(sizes, default=0)
+
+def run(n, blocks, rng):
+    # 복제본 1 이 블록마다 preprepare 하나와 나머지 복제본들의 prepare/commit 을 모두 받음
+    peer = Peer(1, 1, transport=CountingTransport)
+    peer.verbose = False
+    peer.peers = {i: i for i in range(n) if i != 1}
+    peer.total_peers = n
+    peer.update_primary()
+    peer.blockchain = BlockChain()
+    others = [i for i in range(n) if i != 1]
+    votes = 0
+    largest = 0
+    elapsed = 0.0
+    for b in range(blocks):
+        block = Block(b + 1, float(b + 1), f"block {b}")
+        ref = BlockRef(block)
+        order = [('prepare', i) for i in others if i != 0] + [('commit', i) for i in others]
+        rng.shuffle(order)
+        peer.handle_preprepare(block, 0)
+        started = time.perf_counter()
+        for kind, sender in order:
+            if kind == 'prepare':
+                peer.handle_prepare(ref, 0, sender)
+            else:
+                peer.handle_commit(ref, 0, sender)
+            if b == 0 and len(peer.blockchain.chain) == 1:
+                largest = max(largest, vote_sizes(peer))
+        elapsed += time.perf_counter() - started
+        votes += len(order)
+    return {
+        'replicas': n,
+        'us_per_vote': elapsed / votes * 1e6,
+        'messages_sent_per_block': peer.network.sent / blocks,
+        'vote_bytes_per_instance': largest,
+        'committed': len(peer.blockchain.chain) - 1,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="복제본 수별로 한 복제본의 prepare/commit 투표 처리 비용, 보낸 메시지 수, 투표 저장 크기")
+    parser.add_argument('--sizes', default='4,16,100,200,400')
+    parser.add_argument('--blocks', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(json.dumps([run(int(n), args.blocks, rng) for n in args.sizes.split(',')], indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from p import Peer
+from kb.sim import SimNetwork
+
+def main():
+    parser = argparse.ArgumentParser(description="부하를 거는 동안 복제본을 추가하고 제거해서 구간별 커밋 처리량과 새 복제본의 따라잡기 시간을 측정")
+    parser.add_argument('--replicas', type=int, default=4)
+    parser.add_argument('--rate', type=float, default=2000.0, help="초당 트랜잭션 수 (포아송 도착)")
+    parser.add_argument('--duration', type=float, default=3.0)
+    parser.add_argument('--add-at', type=float, default=1.0, help="새 복제본을 추가하는 시각")
+    parser.add_argument('--remove-at', type=float, default=2.0, help="마지막 기존 복제본을 빼는 시각 (음수면 빼지 않음)")
+    parser.add_argument('--epoch-length', type=int, default=10)
+    parser.add_argument('--window', type=float, default=0.25, help="처리량을 재는 구간 길이")
+    parser.add_argument('--latency', type=float, default=0.005)
+    parser.add_argument('--jitter', type=float, default=0.001)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--base-port', type=int, default=5000)
+    args = parser.parse_args()
+
+    sim = SimNetwork(seed=args.seed, latency=args.latency, jitter=args.jitter)
+    peers = sim.build_cluster(Peer, args.replicas, args.base_port)
+    for peer in peers:
+        peer.verbose = False
+        peer.epoch_length = args.epoch_length
+    primary = peers[0]
+    primary.enable_adaptive_batching()
+
+    windows = [0] * int(args.duration / args.window + 1)
+    events = {}
+
+    def on_commit(peer, block):
+        windows[min(len(windows) - 1, int(sim.clock.time() / args.window))] += len(peer.block_transactions(block))
+
+    primary.commit_listeners.append(on_commit)
+
+    def arrive(nonce):
+        primary.submit_transaction({'client': 'bench', 'nonce': nonce, 'fee': 1, 'op': ('put', nonce % 100, nonce)})
+
+    def add_replica():
+        # 새 복제본은 자신이 들어간 다음 에포크 구성으로 시작해서 백그라운드로 따라잡음
+        id = args.replicas
+        replica = {'id': id, 'port': args.base_port + id, 'codecs': primary.network.codec.supported()}
+        joiner = Peer(id, replica['port'], transport=sim.transport)
+        joiner.verbose = False
+        joiner.epoch_length = args.epoch_length
+        joiner.join_membership(primary.current_membership().changed(add=[replica]))
+        joiner.commit_listeners.append(lambda peer, block: events.setdefault('joiner_first_consensus_commit', sim.clock.time()))
+        joiner.start_catch_up(0.05)
+        peers.append(joiner)
+        events['add_proposed'] = sim.clock.time()
+        primary.propose_config(add=[replica])
+
+    def remove_replica():
+        events['remove_proposed'] = sim.clock.time()
+        primary.propose_config(remove=[args.replicas - 1])
+
+    def on_switch(peer, block):
+        if primary.membership is not None and primary.membership.epoch > 0:
+            events.setdefault(f"epoch_{primary.membership.epoch}_at", sim.clock.time())
+
+    primary.commit_listeners.append(on_switch)
+
+    when = 0.0
+    nonce = 0
+    while when < args.duration:
+        sim.schedule(when, arrive, nonce)
+        nonce += 1
+        when += sim.random.expovariate(args.rate)
+    sim.schedule(args.add_at, add_replica)
+    if args.remove_at >= 0:
+        sim.schedule(args.remove_at, remove_replica)
+    sim.run(until=args.duration + 1.0)
+
+    active = [peer for peer in peers if not peer.retired]
+    heights = [len(peer.blockchain.chain) - 1 for peer in active]
+    report = {
+        'replicas_before': args.replicas,
+        'replicas_after': primary.total_peers,
+        'epoch': primary.membership.epoch if primary.membership else 0,
+        'submitted': nonce,
+        'committed': sum(windows),
+        'tx_per_second_by_window': [count / args.window for count in windows],
+        'events': events,
+        'active_heights': heights,
+        'state_hashes_agree': len({peer.state.state_hash() for peer in active if len(peer.blockchain.chain) - 1 == max(heights)}) == 1,
+        'retired': [peer.id for peer in peers if peer.retired],
+    }
+    print(json.dumps(report, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+import argparse
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from p import Block
+from kb.codec import Codec
+from kb.dedup import HEADER
+from kb.network import FRAME, FrameReader, pack_message
+
+def copy_recv_exact(sock, size):
+    # 이전 수신 경로: recv 마다 새 bytes, 마지막에 join 으로 한 번 더 복사
+    chunks = []
+    while size > 0:
+        chunk = sock.recv(min(size, 65536))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+def copy_read(sock):
+    head = copy_recv_exact(sock, FRAME.size)
+    (size,) = FRAME.unpack(head)
+    data = copy_recv_exact(sock, size)
+    return data[HEADER.size:]
+
+def zero_copy_reader():
+    reader = FrameReader()
+    return lambda sock: reader.read(sock)[HEADER.size:]
+
+def run(read, frame, count, codec, decode, warmup):
+    left, right = socket.socketpair()
+    right.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+
+    def writer():
+        for _ in range(warmup + count):
+            left.sendall(frame)
+
+    thread = threading.Thread(target=writer, daemon=True)
+    thread.start()
+    # 처음 몇 개는 버퍼가 커지는 비용이라 빼고 정상 상태만 잼
+    for _ in range(warmup):
+        read(right)
+    tracemalloc.start()
+    peak = 0
+    started = time.perf_counter()
+    for _ in range(count):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        body = read(right)
+        if decode:
+            codec.decode(body)
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - base)
+        del body
+    elapsed = time.perf_counter() - started
+    tracemalloc.stop()
+    thread.join()
+    left.close()
+    right.close()
+    return {'us_per_message': elapsed / count * 1e6, 'peak_alloc_bytes_per_message': peak}
+
+def main():
+    parser = argparse.ArgumentParser(description="수신 경로의 메시지당 메모리 할당과 시간 비교 (recv+join 복사 vs recv_into 재사용 버퍼)")
+    parser.add_argument('--sizes', default='1024,65536,1048576')
+    parser.add_argument('--count', type=int, default=200)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--decode', action='store_true', help="받은 뒤 역직렬화까지 포함해서 잼")
+    args = parser.parse_args()
+
+    codec = Codec(compression='none')
+    results = []
+    for size in [int(size) for size in args.sizes.split(',')]:
+        frame = pack_message({'type': 'preprepare', 'view': 0, 'block': Block(1, time.time(), 'x' * size)}, codec)
+        row = {'size': size, 'frame_bytes': len(frame)}
+        row['copy'] = run(copy_read, frame, args.count, codec, args.decode, args.warmup)
+        row['zero_copy'] = run(zero_copy_reader(), frame, args.count, codec, args.decode, args.warmup)
+        results.append(row)
+    print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from p import Peer
+from kb.sim import SimNetwork
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+def run(args, mode):
+    sim = SimNetwork(seed=args.seed, latency=args.latency, jitter=args.jitter)
+    peers = sim.build_cluster(Peer, args.replicas)
+    for peer in peers:
+        peer.verbose = False
+        peer.epoch_length = args.epoch_length
+        if mode != 'fixed':
+            peer.enable_rotation(mode, max_pipeline=args.max_pipeline, slot_timeout=args.slot_timeout)
+    if mode == 'fixed':
+        peers[0].enable_adaptive_batching()
+    observer = peers[1]  # 커밋 시각을 재는 복제본 (주 노드나 중단시킬 복제본이 아닌 쪽)
+
+    arrived = {}
+    latencies = []
+
+    def on_commit(peer, block):
+        for tx in peer.block_transactions(block):
+            key = (tx['client'], tx['nonce'])
+            if key in arrived:
+                latencies.append(sim.clock.time() - arrived.pop(key))
+
+    observer.commit_listeners.append(on_commit)
+
+    def arrive(nonce):
+        arrived[(f'c{nonce % 64}', nonce // 64)] = sim.clock.time()
+        # 주 노드 고정이면 주 노드에, 돌아가며 제안하면 클라이언트가 정한 (살아 있는) 복제본에 보냄
+        # 클라이언트마다 한 복제본에 보내야 nonce 순서가 지켜짐
+        if mode == 'fixed':
+            target = peers[0]
+        else:
+            alive = [peer for peer in peers if peer.network.running]
+            target = alive[nonce % 64 % len(alive)]
+        target.submit_transaction({'client': f'c{nonce % 64}', 'nonce': nonce // 64, 'fee': 1,
+                                   'op': ('put', nonce % 100, sim.random.randbytes(args.payload))})
+
+    def crash():
+        peers[args.crash].network.stop()
+
+    when = 0.0
+    nonce = 0
+    while when < args.duration:
+        sim.schedule(when, arrive, nonce)
+        nonce += 1
+        when += sim.random.expovariate(args.rate)
+    if args.crash is not None:
+        sim.schedule(args.crash_at, crash)
+    sim.run(until=args.duration + 2.0)
+
+    alive = [peer for peer in peers if peer.network.running]
+    return {
+        'mode': mode,
+        'submitted': nonce,
+        'committed': len(latencies),
+        'throughput_tx_per_second': len(latencies) / args.duration,
+        'latency_p50': percentile(latencies, 0.5),
+        'latency_p99': percentile(latencies, 0.99),
+        'blocks': len(observer.blockchain.chain) - 1,
+        'proposals_by_replica': [peer.metrics.get('proposed_blocks') for peer in peers],
+        'upload_bytes_by_replica': [sim.bytes_by_src.get(peer.port, 0) for peer in peers],
+        'slot_timeouts': sum(peer.metrics.get('slot_timeouts') for peer in peers),
+        'slot_round_changes': sum(peer.metrics.get('slot_round_changes') for peer in peers),
+        'chains_agree': len({peer.blockchain.chain[-1].hash for peer in alive}) == 1,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="주 노드 고정과 돌아가며 제안(블록/에포크마다)의 처리량, 지연, 복제본별 제안 수와 송신량 비교")
+    parser.add_argument('--replicas', type=int, default=4)
+    parser.add_argument('--modes', default='fixed,block,epoch')
+    parser.add_argument('--rate', type=float, default=2000.0)
+    parser.add_argument('--duration', type=float, default=2.0)
+    parser.add_argument('--payload', type=int, default=256, help="트랜잭션 값 크기 (bytes, 압축되지 않는 임의 바이트)")
+    parser.add_argument('--latency', type=float, default=0.005)
+    parser.add_argument('--jitter', type=float, default=0.001)
+    parser.add_argument('--epoch-length', type=int, default=10)
+    parser.add_argument('--max-pipeline', type=int, default=4)
+    parser.add_argument('--slot-timeout', type=float, default=0.05)
+    parser.add_argument('--crash', type=int, help="이 id 의 복제본을 --crash-at 에 멈춤")
+    parser.add_argument('--crash-at', type=float, default=1.0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print(json.dumps([run(args, mode) for mode in args.modes.split(',')], indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from p import Peer, Block
+from kb.sim import SimNetwork
+from kb.trace import merge
+
+def main():
+    parser = argparse.ArgumentParser(description="가상 네트워크에서 PBFT 처리량 측정")
+    parser.add_argument('--replicas', type=int, default=16)
+    parser.add_argument('--blocks', type=int, default=20)
+    parser.add_argument('--interval', type=float, default=0.01)
+    parser.add_argument('--latency', type=float, default=0.001)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--size', type=int, default=0, help="블록 데이터 크기 (bytes)")
+    parser.add_argument('--dissemination', choices=('broadcast', 'tree'), default='broadcast')
+    parser.add_argument('--fanout', type=int, default=2)
+    parser.add_argument('--trace-out', help="모든 노드의 span 을 합친 타임라인을 이 JSON 파일로 저장")
+    args = parser.parse_args()
+
+    sim = SimNetwork(seed=args.seed, latency=args.latency, jitter=args.jitter)
+    peers = sim.build_cluster(Peer, args.replicas)
+    for peer in peers:
+        peer.verbose = False
+        peer.dissemination = args.dissemination
+        peer.tree_fanout = args.fanout
+    primary = peers[0]
+
+    def propose(i):
+        block = Block(len(primary.blockchain.chain), sim.clock.time(), f"block {i} " + 'x' * args.size)
+        primary.propose_block(block)
+
+    for i in range(args.blocks):
+        sim.schedule(i * args.interval, propose, i)
+
+    started = time.perf_counter()
+    sim.run()
+    elapsed = time.perf_counter() - started
+
+    stats = sim.stats()
+    heights = [len(peer.blockchain.chain) - 1 for peer in peers]
+    stats.update({
+        'replicas': args.replicas,
+        'committed_min': min(heights),
+        'committed_max': max(heights),
+        'wall_seconds': elapsed,
+        'messages_per_second': stats['delivered'] / elapsed if elapsed else 0.0,
+        'blocks_per_virtual_second': min(heights) / stats['time'] if stats['time'] else 0.0,
+        'primary_upload_bytes_per_block': sim.bytes_by_src.get(primary.port, 0) / args.blocks if args.blocks else 0,
+        'dropped_duplicate': sum(peer.metrics.get('dropped_duplicate') for peer in peers),
+        'dropped_stale': sum(peer.metrics.get('dropped_stale') for peer in peers),
+    })
+    print(json.dumps(stats, indent=2))
+    if args.trace_out:
+        with open(args.trace_out, 'w') as f:
+            json.dump(merge(*[peer.export_spans() for peer in peers]), f)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from p import Block, BlockChain
+from kb.verify import ChainVerifier
+
+def build_chain(length, size):
+    chain = BlockChain()
+    payload = 'x' * size
+    for i in range(1, length):
+        chain.addBlock(Block(i, float(i), payload))
+    return chain
+
+def timed(fn):
+    started = time.perf_counter()
+    ok = fn()
+    return ok, time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description="체인 검증 시간을 코어 수별로 비교 (메모리의 체인과 저장된 체인 파일)")
+    parser.add_argument('--blocks', type=int, default=20000)
+    parser.add_argument('--size', type=int, default=4096, help="블록 데이터 크기 (bytes)")
+    parser.add_argument('--workers', default='1,2,4,8')
+    parser.add_argument('--mode', choices=('process', 'thread'), default='process')
+    args = parser.parse_args()
+
+    chain = build_chain(args.blocks, args.size)
+    path = os.path.join(tempfile.mkdtemp(), 'chain.bin')
+    chain.save(path)
+    # 기준: 한 코어에서 검증 (파일은 읽어서 디코딩하는 시간까지 포함)
+    ok, baseline = timed(chain.isValid)
+    file_ok, file_baseline = timed(lambda: BlockChain.load(path).isValid())
+    report = {'blocks': args.blocks, 'size': args.size, 'mode': args.mode, 'cpus': os.cpu_count(),
+              'serial': {'valid': ok, 'seconds': baseline},
+              'serial_file': {'valid': file_ok, 'seconds': file_baseline}, 'parallel': []}
+    for workers in [int(w) for w in args.workers.split(',')]:
+        verifier = ChainVerifier(workers, args.mode)
+        verifier.verify(chain.chain[:workers * 8])  # 풀 기동 비용은 측정에서 뺌
+        ok, seconds = timed(lambda: chain.isValid(verifier))
+        file_ok, file_seconds = timed(lambda: verifier.verify_file(path))
+        verifier.close()
+        # 메모리의 체인은 블록을 worker 로 피클링해 보내고, 파일은 worker 가 자기 구간을 직접 읽음
+        report['parallel'].append({'workers': workers, 'valid': ok and file_ok,
+                                   'seconds': seconds, 'speedup': baseline / seconds if seconds else None,
+                                   'file_seconds': file_seconds,
+                                   'file_speedup': file_baseline / file_seconds if file_seconds else None})
+    os.remove(path)
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
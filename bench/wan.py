@@ -0,0 +1,113 @@
+import argparse
+import functools
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from p import Peer, Block
+from kb.netem import NetEm
+from kb.network import Network
+from kb.sim import SimNetwork
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+def build_tcp_cluster(n, base_port, netem):
+    transport = functools.partial(Network, netem=netem)
+    peers = [Peer(i, base_port + i, transport=transport) for i in range(n)]
+    time.sleep(0.2)
+    # README 의 순서대로 0번 노드부터 연결
+    for i in range(n):
+        for j in range(i + 1, n):
+            peers[i].connect_peer(j, base_port + j)
+    time.sleep(0.5)
+    return peers
+
+def main():
+    parser = argparse.ArgumentParser(description="WAN 조건에서 커밋 지연과 처리량 측정")
+    parser.add_argument('--config', help="NetEm.from_dict 형식의 JSON 파일")
+    parser.add_argument('--replicas', type=int, default=4)
+    parser.add_argument('--blocks', type=int, default=20)
+    parser.add_argument('--interval', type=float, default=0.05)
+    parser.add_argument('--size', type=int, default=1024, help="블록 데이터 크기 (bytes)")
+    parser.add_argument('--base-port', type=int, default=5000)
+    parser.add_argument('--tcp', action='store_true', help="가상 네트워크 대신 실제 소켓 사용")
+    parser.add_argument('--partition-at', type=float, help="이 시각에 노드 절반을 분리")
+    parser.add_argument('--heal-at', type=float, help="이 시각에 파티션 해제")
+    args = parser.parse_args()
+
+    netem = NetEm.load(args.config) if args.config else NetEm()
+    if args.tcp:
+        peers = build_tcp_cluster(args.replicas, args.base_port, netem)
+        now = time.time
+    else:
+        sim = SimNetwork(netem=netem)
+        peers = sim.build_cluster(Peer, args.replicas, base_port=args.base_port)
+        now = sim.clock.time
+
+    f = (args.replicas - 1) // 3
+    proposed = {}
+    committed = {}
+    def on_commit(peer, block):
+        committed.setdefault(block.timestamp, []).append(now())
+    for peer in peers:
+        peer.verbose = False
+        peer.commit_listeners.append(on_commit)
+    primary = peers[0]
+    ports = [peer.port for peer in peers]
+    payload = 'x' * args.size
+
+    def propose(i):
+        block = Block(len(primary.blockchain.chain), now() + i * 1e-9, payload)
+        proposed[block.timestamp] = now()
+        primary.propose_block(block)
+
+    actions = [(i * args.interval, propose, (i,)) for i in range(args.blocks)]
+    if args.partition_at is not None:
+        actions.append((args.partition_at, netem.partition, (ports[:len(ports) // 2], ports[len(ports) // 2:])))
+    if args.heal_at is not None:
+        actions.append((args.heal_at, netem.heal, ()))
+
+    started = now()
+    if args.tcp:
+        for at, fn, fn_args in sorted(actions, key=lambda a: a[0]):
+            time.sleep(max(0.0, started + at - now()))
+            fn(*fn_args)
+        time.sleep(2.0)
+    else:
+        for at, fn, fn_args in actions:
+            sim.schedule(at, fn, *fn_args)
+        sim.run()
+    finished = max([t for times in committed.values() for t in times], default=now())
+
+    # n - f 개 노드에 커밋된 시점을 그 블록의 커밋 시각으로 봄
+    latencies = []
+    for timestamp, times in committed.items():
+        if len(times) >= args.replicas - f:
+            latencies.append(sorted(times)[args.replicas - f - 1] - proposed[timestamp])
+    elapsed = finished - started
+    report = {
+        'mode': 'tcp' if args.tcp else 'sim',
+        'replicas': args.replicas,
+        'proposed': len(proposed),
+        'committed': len(latencies),
+        'throughput_blocks_per_second': len(latencies) / elapsed if elapsed > 0 else 0.0,
+        'latency_mean': statistics.mean(latencies) if latencies else None,
+        'latency_p50': percentile(latencies, 0.50),
+        'latency_p99': percentile(latencies, 0.99),
+        'netem': netem.stats(),
+    }
+    print(json.dumps(report, indent=2))
+    if args.tcp:
+        for peer in peers:
+            peer.stop_server()
+
+if __name__ == "__main__":
+    main()
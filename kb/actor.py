@@ -0,0 +1,76 @@
+import queue
+import threading
+import time
+
+class Actor:
+    # 합의 상태를 혼자 소유하는 스레드, 다른 스레드는 inbox 를 통해서만 일을 넘김
+    # inbox 가 가득 차면 submit 이 기다리므로 연결 처리 스레드가 멈추고, 그만큼 보낸 쪽으로 역압이 걸림
+    # put_timeout 이 지나면 버리되 종류(label)별로 세고 남김, essential 종류는 버리지 않고 계속 기다림
+    def __init__(self, handler, maxsize=1024, metrics=None, put_timeout=10.0, name='inbox', label=None, essential=()):
+        self.handler = handler
+        self.inbox = queue.Queue(maxsize)
+        self.metrics = metrics
+        self.put_timeout = put_timeout
+        self.name = name
+        self.label = label  # label(*item) -> 메트릭/로그에 쓸 종류 이름
+        self.essential = set(essential)
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+
+    def depth(self):
+        return self.inbox.qsize()
+
+    def submit(self, *item):
+        try:
+            self.inbox.put_nowait(item)
+        except queue.Full:
+            started = time.perf_counter()
+            self.count('blocked')
+            kind = self.label(*item) if self.label is not None else None
+            try:
+                while True:
+                    try:
+                        self.inbox.put(item, timeout=self.put_timeout)
+                        break
+                    except queue.Full:
+                        if kind not in self.essential:
+                            self.count('dropped')
+                            self.count(f'dropped_{kind}')
+                            print(f"{self.name} full for {self.put_timeout}s, dropped {kind}")
+                            return False
+                        # 합의 메시지는 버리지 않음: 보낸 연결을 계속 붙잡아 역압을 걸음
+                        self.count('stalled')
+                        self.count(f'stalled_{kind}')
+                        print(f"{self.name} full for {self.put_timeout}s, still waiting to enqueue {kind}")
+            finally:
+                self.count('blocked_seconds', time.perf_counter() - started)
+        self.count('enqueued')
+        if self.metrics is not None:
+            self.metrics.max(f'{self.name}_depth_max', self.inbox.qsize())
+        return True
+
+    def run(self):
+        while self.running:
+            try:
+                item = self.inbox.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                self.handler(*item)
+            except Exception as e:
+                print(f"Exception: {e}")
+            self.count('processed')
+
+    def count(self, name, value=1):
+        if self.metrics is not None:
+            self.metrics.inc(f'{self.name}_{name}', value)
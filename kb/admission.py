@@ -0,0 +1,112 @@
+import collections
+import threading
+
+class TokenBucket:
+    # 초당 rate 개씩 차고 burst 개까지 모이는 토큰, 모자라면 다음 토큰까지 기다릴 시간을 돌려줌
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, now, count=1):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= count:
+            self.tokens -= count
+            return 0.0
+        return (count - self.tokens) / self.rate
+
+class AdmissionControl:
+    # 요청 입구에서 트랜잭션을 받을지 정함, 거절하면 (이유, retry_after 초, 다시 보내기 시작할 nonce) 를 돌려줌
+    # - 전체 in-flight 상한: 받았지만 아직 커밋되지 않은 트랜잭션 수, 넘으면 커밋 속도로 자리가 날 때까지의 시간을 알려줌
+    # - 클라이언트마다 token bucket: 한 클라이언트가 상한을 혼자 채우지 못함 (client_rate 가 None 이면 끔)
+    # 받은 요청은 지연이 상한/처리량 안쪽으로 묶이고, 넘치는 요청은 큐에 쌓이는 대신 바로 돌려보냄
+    def __init__(self, max_inflight, client_rate=None, client_burst=None, max_clients=10000,
+                 min_retry=0.001, max_retry=1.0, default_retry=0.05, alpha=0.3):
+        self.max_inflight = max_inflight
+        self.client_rate = client_rate
+        self.client_burst = client_burst if client_burst is not None else (client_rate or 0)
+        self.max_clients = max_clients
+        self.min_retry = min_retry
+        self.max_retry = max_retry
+        self.default_retry = default_retry  # 아직 커밋 속도를 모를 때
+        self.alpha = alpha
+        self.buckets = {}  # 클라이언트 -> TokenBucket, 오래된 것부터 잊음
+        self.holes = collections.OrderedDict()  # 클라이언트 -> 거절해서 아직 다시 받지 못한 가장 낮은 nonce
+        self.queued = 0  # 받았지만 아직 mempool 에 들어가지 않은 요청 (actor inbox 에 있음)
+        self.commit_rate = 0.0  # 커밋되는 트랜잭션 수 / 초 (EWMA), retry_after 계산에 씀
+        self.committed = 0
+        self.rate_since = None
+        self.lock = threading.Lock()
+
+    def check(self, client, nonce, now, outstanding, cursor, blocking=False):
+        # outstanding: mempool 과 제안된 블록에 있는 트랜잭션 수, cursor: mempool 이 기다리는 이 클라이언트의 다음 nonce
+        # blocking: 이 nonce 를 기다리는 다음 nonce 가 이미 mempool 에 있음
+        with self.lock:
+            hole = self.holes.get(client)
+            if hole is not None and hole < cursor:
+                del self.holes[client]  # 다른 경로로 이미 블록에 들어감
+                hole = None
+            if hole is not None and nonce > hole:
+                # 앞 nonce 를 거절했음: 받아도 그것을 기다리며 상한만 차지하므로 hole 부터 다시 보내게 함
+                return 'out_of_order', self.min_retry, hole
+            rejected = self.limit(client, now, outstanding + self.queued, blocking)
+            if rejected is not None:
+                self.remember_hole(client, nonce)
+                return rejected + (nonce,)
+            if nonce == hole:
+                del self.holes[client]
+            self.queued += 1
+            return None
+
+    def limit(self, client, now, backlog, blocking):
+        if backlog >= self.max_inflight and not blocking:
+            # 상한을 넘었어도 뒤 nonce 들을 풀어주는 것은 받음, 상한이 풀리지 못하는 트랜잭션으로만 차는 일이 없게
+            # 지금 쌓인 것이 다 빠질 때쯤 다시 오라고 함, 거절된 요청들이 곧바로 다시 몰려들지 않게
+            return 'overloaded', self.retry_after(backlog / self.commit_rate if self.commit_rate else self.default_retry)
+        if self.client_rate is not None:
+            bucket = self.buckets.get(client)
+            if bucket is None:
+                bucket = self.buckets[client] = TokenBucket(self.client_rate, self.client_burst, now)
+                if len(self.buckets) > self.max_clients:
+                    self.buckets.pop(next(iter(self.buckets)))
+            wait = bucket.take(now)
+            if wait > 0:
+                return 'rate_limited', self.retry_after(wait)
+        return None
+
+    def retry_after(self, seconds):
+        return min(max(seconds, self.min_retry), self.max_retry)
+
+    def arrived(self):
+        # 받은 요청이 actor 에서 mempool 에 들어감
+        with self.lock:
+            self.queued = max(self.queued - 1, 0)
+
+    def dropped(self, client, nonce):
+        # 받았지만 actor inbox 가 가득 차서 버려짐: queued 를 되돌리고 거절한 것처럼 이 nonce 부터 다시 보내게 함
+        with self.lock:
+            self.queued = max(self.queued - 1, 0)
+            self.remember_hole(client, nonce)
+            wait = self.max_inflight / self.commit_rate if self.commit_rate else self.default_retry
+            return 'overloaded', self.retry_after(wait), self.holes[client]
+
+    def remember_hole(self, client, nonce):
+        hole = self.holes.get(client)
+        self.holes[client] = nonce if hole is None else min(hole, nonce)
+        self.holes.move_to_end(client)
+        if len(self.holes) > self.max_clients:
+            self.holes.popitem(last=False)
+
+    def on_commit(self, count, now, interval=0.05):
+        with self.lock:
+            if self.rate_since is None:
+                self.rate_since = now
+            self.committed += count
+            elapsed = now - self.rate_since
+            if elapsed >= interval:
+                rate = self.committed / elapsed
+                self.commit_rate = rate if self.commit_rate == 0.0 else (1 - self.alpha) * self.commit_rate + self.alpha * rate
+                self.committed = 0
+                self.rate_since = now
@@ -0,0 +1,96 @@
+import collections
+import hashlib
+
+def batch_digest(txs):
+    return hashlib.sha256(str(txs).encode()).hexdigest()
+
+class BatchStore:
+    # 복제본들이 미리 퍼뜨린 트랜잭션 배치 저장소
+    # f+1 개의 ack 를 받은 배치는 적어도 하나의 정상 노드가 갖고 있으므로 '가용' 으로 보고 순서만 합의함
+    def __init__(self):
+        self.batches = {}
+        self.origins = {}
+        self.acks = {}
+        self.available = {}
+        self.certified = set()
+        self.ordered = set()
+        self.executed = collections.deque()  # (블록 높이, 그 블록에서 실행된 배치 해시들), 높이 순
+        self.retired = [set(), set()]  # 최근 두 번 지운 배치 해시, 늦게 온 batch/ack 로 다시 가용 배치가 되지 않게
+
+    def __len__(self):
+        return len(self.batches)
+
+    def is_retired(self, digest):
+        return digest in self.retired[0] or digest in self.retired[1]
+
+    def add(self, digest, txs, origin):
+        if digest in self.batches or self.is_retired(digest):
+            return False
+        self.batches[digest] = txs
+        self.origins[digest] = origin
+        return True
+
+    def get(self, digest):
+        return self.batches.get(digest)
+
+    def ack(self, digest, peer_id, quorum):
+        # 가용 인증서가 새로 만들어지면 ack 한 노드 목록을 돌려줌
+        if self.is_retired(digest):
+            return None
+        acks = self.acks.setdefault(digest, set())
+        acks.add(peer_id)
+        if len(acks) >= quorum and digest not in self.certified:
+            self.certify(digest, self.origins.get(digest))
+            return sorted(acks)
+        return None
+
+    def certify(self, digest, origin):
+        if self.is_retired(digest):
+            return
+        self.origins.setdefault(digest, origin)
+        self.certified.add(digest)
+        if digest not in self.ordered and digest not in self.available:
+            self.available[digest] = origin
+
+    def take_available(self, limit):
+        # 아직 블록에 들어가지 않은 가용 배치를 도착 순서대로 꺼냄
+        digests = []
+        for digest in self.available:
+            if len(digests) >= limit:
+                break
+            digests.append(digest)
+        for digest in digests:
+            del self.available[digest]
+            self.ordered.add(digest)
+        return digests
+
+    def mark_ordered(self, digests):
+        for digest in digests:
+            self.ordered.add(digest)
+            self.available.pop(digest, None)
+
+    def missing(self, digests):
+        return [digest for digest in digests if digest not in self.batches]
+
+    def transactions(self, digests):
+        txs = []
+        for digest in digests:
+            txs.extend(self.batches.get(digest, ()))
+        return txs
+
+    def mark_executed(self, digests, height):
+        self.executed.append((height, list(digests)))
+
+    def prune(self, horizon):
+        # horizon 보다 낮은 높이에서 실행된 배치를 지움 (체인 본문을 지우는 워터마크와 같음), 지운 수를 돌려줌
+        retired = set()
+        while self.executed and self.executed[0][0] < horizon:
+            retired.update(self.executed.popleft()[1])
+        for digest in retired:
+            self.batches.pop(digest, None)
+            self.origins.pop(digest, None)
+            self.acks.pop(digest, None)
+            self.certified.discard(digest)
+            self.ordered.discard(digest)
+        self.retired = [self.retired[1], retired]
+        return len(retired)
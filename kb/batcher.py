@@ -0,0 +1,163 @@
+class AdaptiveBatcher:
+    # 주 노드의 제안 경로에서 배치 크기와 배치 대기 시간을 부하에 맞춰 스스로 조정함
+    # - 도착률: mempool 에 들어온 트랜잭션 수 / 시간 (EWMA)
+    # - 커밋 지연: 제안부터 커밋까지 걸린 시간 (EWMA)
+    # - 파이프라인 점유율: 커밋을 기다리는 제안 수 / max_inflight
+    # 목표: 트랜잭션이 제안되기까지 기다리는 시간 + 커밋 지연 <= max_latency, 커밋 처리량 >= min_throughput
+    def __init__(self, peer, max_latency=0.05, min_throughput=0.0, max_inflight=1,
+                 min_batch=1, max_batch=10000, min_timeout=0.0005, tune_interval=0.01, alpha=0.3, inflight_timeout=1.0):
+        self.peer = peer
+        self.max_latency = max_latency
+        self.min_throughput = min_throughput
+        # 블록 번호/prev_hash 가 커밋 순서로 정해지므로 여러 블록을 동시에 돌리면 복제본마다 순서가 달라질 수 있음
+        # 그래서 기본값은 1 (한 번에 블록 하나)
+        self.max_inflight = max_inflight
+        self.min_batch = min_batch
+        self.max_batch = max_batch
+        self.min_timeout = min_timeout
+        self.tune_interval = tune_interval
+        self.alpha = alpha
+        # 이 시간 안에 커밋되지 않은 제안은 버려진 것으로 보고 파이프라인 자리를 돌려받음 (view change 로 사라진 제안 등)
+        self.inflight_timeout = inflight_timeout
+
+        self.batch_size = min_batch
+        self.timeout = min_timeout
+        self.arrival_rate = 0.0
+        self.commit_latency = 0.0
+        self.throughput = 0.0
+        self.inflight = {}  # 블록 timestamp -> (제안 시각, 트랜잭션 수)
+        self.arrived = 0
+        self.committed = 0
+        self.first_waiting = None  # 아직 제안되지 않은 트랜잭션 중 가장 먼저 도착한 시각
+        self.timer_armed = False
+        self.last_tune = peer.network.now()
+        peer.commit_listeners.append(self.on_commit)
+
+    def occupancy(self):
+        return len(self.inflight) / self.max_inflight
+
+    def ewma(self, old, new):
+        return new if old == 0.0 else (1 - self.alpha) * old + self.alpha * new
+
+    def on_arrival(self, count=1):
+        now = self.peer.network.now()
+        self.arrived += count
+        if self.first_waiting is None:
+            self.first_waiting = now
+        self.maybe_tune(now)
+        self.poll()
+
+    def on_commit(self, peer, block):
+        entry = self.inflight.pop(block.timestamp, None)
+        if entry is None:
+            return
+        now = self.peer.network.now()
+        proposed_at, size = entry
+        self.commit_latency = self.ewma(self.commit_latency, now - proposed_at)
+        self.committed += size
+        self.maybe_tune(now)
+        self.poll()  # 파이프라인에 자리가 났으므로 쌓인 트랜잭션을 바로 제안
+
+    def clear_inflight(self):
+        # view 가 바뀌면 옛 view 의 제안은 커밋되지 않음
+        self.inflight.clear()
+
+    def expire_inflight(self, now):
+        expired = [timestamp for timestamp, (proposed_at, _) in self.inflight.items()
+                   if now - proposed_at >= self.inflight_timeout]
+        for timestamp in expired:
+            del self.inflight[timestamp]
+        self.peer.metrics.inc('batch_inflight_expired', len(expired))
+
+    def on_timer(self):
+        self.timer_armed = False
+        self.poll()
+
+    def poll(self):
+        peer = self.peer
+        if peer.proposal_slot() is None:
+            return
+        waiting = len(peer.mempool)
+        if waiting == 0:
+            self.first_waiting = None
+            return
+        now = peer.network.now()
+        # 돌아가며 제안할 때는 슬롯 창(peer.max_pipeline)이 파이프라인 깊이를 정함
+        if peer.rotation is None and len(self.inflight) >= self.max_inflight:
+            self.expire_inflight(now)
+        if peer.rotation is None and len(self.inflight) >= self.max_inflight:
+            peer.metrics.inc('batch_pipeline_full')
+            # 커밋이 끝나면 on_commit 에서 다시 시도, 끝내 커밋되지 않으면 가장 오래된 제안이 만료될 때 다시 봄
+            oldest = min(proposed_at for proposed_at, _ in self.inflight.values())
+            self.arm_timer(oldest + self.inflight_timeout - now)
+            return
+        waited = now - self.first_waiting if self.first_waiting is not None else 0.0
+        if waiting >= self.batch_size:
+            reason = 'size'
+        elif waited >= self.timeout:
+            reason = 'timeout'
+        else:
+            self.arm_timer(self.timeout - waited)
+            return
+        # batch_size 는 제안을 시작하는 기준, 파이프라인이 막혀 쌓인 것까지 max_batch 안에서 한 번에 비움
+        block = peer.propose_from_mempool(min(waiting, self.max_batch))
+        if block is None:
+            return
+        self.inflight[block.timestamp] = (now, len(block.data))
+        self.first_waiting = now if len(peer.mempool) else None
+        peer.metrics.inc(f'batches_by_{reason}')
+        peer.metrics.inc('batched_txs', len(block.data))
+
+    def arm_timer(self, delay):
+        if self.timer_armed:
+            return
+        self.timer_armed = True
+        self.peer.network.call_later(max(delay, self.min_timeout), self.peer.submit_local, {'type': 'batch_timeout'})
+
+    def maybe_tune(self, now):
+        elapsed = now - self.last_tune
+        if elapsed < self.tune_interval:
+            return
+        self.arrival_rate = self.ewma(self.arrival_rate, self.arrived / elapsed)
+        self.throughput = self.ewma(self.throughput, self.committed / elapsed)
+        self.arrived = 0
+        self.committed = 0
+        self.last_tune = now
+        self.tune()
+
+    def tune(self):
+        rate = self.arrival_rate
+        latency = self.commit_latency
+        # 커밋 한 번 걸리는 동안 도착하는 양을 파이프라인 깊이로 나누면 파이프라인을 계속 채울 수 있음
+        size = rate * latency / self.max_inflight if latency else self.min_batch
+        # 파이프라인에 자리가 있으면 기다려도 지연만 늘어나므로 바로 제안함
+        timeout = self.min_timeout
+        decision = 'fill_pipeline'
+        if latency > self.max_latency:
+            # 지연 목표를 넘음: 배치를 줄여 커밋을 빠르게 함
+            size = min(size, self.batch_size / 2)
+            decision = 'shrink_latency'
+        elif self.occupancy() >= 1.0:
+            # 파이프라인이 꽉 참: 제안 수를 늘릴 수 없으니 배치를 키워 처리량을 확보
+            size = max(size, self.batch_size * 2)
+            decision = 'grow_pipeline_full'
+        elif self.throughput < self.min_throughput and rate > self.throughput:
+            # 처리량 목표 미달: 남은 지연 예산 안에서 배치가 찰 때까지 기다려 블록당 비용을 나눔
+            size = max(size, self.batch_size * 1.5)
+            timeout = min(size / rate, max(self.max_latency - latency, self.min_timeout))
+            decision = 'grow_throughput'
+        self.batch_size = int(min(max(size, self.min_batch), self.max_batch))
+        self.timeout = max(timeout, self.min_timeout)
+        self.report(decision)
+
+    def report(self, decision):
+        metrics = self.peer.metrics
+        metrics.inc('batch_tuning_decisions')
+        metrics.inc(f'batch_decision_{decision}')
+        metrics.set('batch_last_decision', decision)
+        metrics.set('batch_size', self.batch_size)
+        metrics.set('batch_timeout', self.timeout)
+        metrics.set('batch_arrival_rate', self.arrival_rate)
+        metrics.set('batch_commit_latency', self.commit_latency)
+        metrics.set('batch_throughput', self.throughput)
+        metrics.set('batch_pipeline_occupancy', self.occupancy())
@@ -0,0 +1,144 @@
+import collections
+import hashlib
+import lzma
+import pickle
+import struct
+import zlib
+
+RAW = 0
+ZLIB = 1
+LZMA = 2
+ZLIB_DICT = 3
+
+NAMES = {'none': RAW, 'zlib': ZLIB, 'lzma': LZMA, 'zlib-dict': ZLIB_DICT}
+DICT_ID = struct.Struct('!I')
+
+def dictionary_id(zdict):
+    return DICT_ID.unpack(hashlib.sha256(zdict).digest()[:4])[0]
+
+def train_dictionary(samples, size=32768, gram=12, sample_limit=8192):
+    # 샘플들에 자주 나오는 gram 길이 조각을 모아 zlib 미리 정의된 사전(zdict)을 만듦
+    # zlib 은 사전 끝쪽에 있는 내용을 더 싸게 참조하므로 자주 나오는 조각을 뒤에 둠
+    counts = collections.Counter()
+    for sample in samples:
+        sample = sample[:sample_limit]
+        seen = set()
+        for i in range(0, max(len(sample) - gram, 0) + 1, gram // 2 or 1):
+            piece = sample[i:i + gram]
+            if piece not in seen:
+                seen.add(piece)
+                counts[piece] += 1
+    pieces = [piece for piece, count in counts.most_common() if count > 1]
+    out = []
+    total = 0
+    for piece in pieces:
+        if total + len(piece) > size:
+            break
+        out.append(piece)
+        total += len(piece)
+    return b''.join(reversed(out))
+
+class Codec:
+    # 메시지 한 개를 [1바이트 방식][본문] 으로 인코딩, threshold 보다 작은 메시지는 압축하지 않음
+    # (prepare/commit 같은 작은 합의 메시지는 압축해도 거의 줄지 않고 지연만 늘어남)
+    # 받는 쪽이 지원한다고 알린 방식(accepts)만 씀
+    # 풀었을 때 max_size 를 넘는 프레임은 끝까지 풀지 않고 거절함 (압축 폭탄)
+    def __init__(self, compression='zlib', threshold=1024, level=6, max_size=256 * 1024 * 1024):
+        if compression not in NAMES:
+            raise ValueError(f"unknown compression: {compression}")
+        self.compression = compression
+        self.threshold = threshold
+        self.level = level
+        self.max_size = max_size
+        self.dictionaries = {}
+        self.dictionary = None
+
+    def supported(self):
+        return {'methods': [name for name in NAMES if name != 'zlib-dict' or self.dictionaries],
+                'dictionaries': list(self.dictionaries)}
+
+    def add_dictionary(self, zdict, use=False):
+        key = dictionary_id(zdict)
+        self.dictionaries[key] = zdict
+        if use:
+            self.dictionary = key
+        return key
+
+    def train(self, samples, size=32768):
+        return self.add_dictionary(train_dictionary(samples, size), use=True)
+
+    def choose(self, accepts=None):
+        # accepts 가 None 이면 상대가 아직 협상하지 않은 것이므로 압축하지 않음
+        if accepts is None or self.compression == 'none':
+            return RAW, None
+        methods = accepts.get('methods', ())
+        if self.dictionary is not None and 'zlib-dict' in methods and self.dictionary in accepts.get('dictionaries', ()):
+            return ZLIB_DICT, self.dictionary
+        name = 'zlib' if self.compression == 'zlib-dict' else self.compression
+        if name in methods:
+            return NAMES[name], None
+        return RAW, None
+
+    def encode(self, message, accepts=None):
+        return self.encode_bytes(pickle.dumps(message), accepts)
+
+    def encode_bytes(self, raw, accepts=None):
+        method, key = self.choose(accepts)
+        if method == RAW or len(raw) < self.threshold:
+            return bytes([RAW]) + raw
+        if method == ZLIB:
+            body = zlib.compress(raw, self.level)
+        elif method == LZMA:
+            body = lzma.compress(raw, preset=min(self.level, 9))
+        else:
+            compressor = zlib.compressobj(self.level, zdict=self.dictionaries[key])
+            body = DICT_ID.pack(key) + compressor.compress(raw) + compressor.flush()
+        if len(body) >= len(raw):
+            return bytes([RAW]) + raw  # 압축 효과가 없으면 원본을 보냄
+        return bytes([method]) + body
+
+    def decode(self, data):
+        return pickle.loads(self.decode_bytes(data))
+
+    def decode_bytes(self, data):
+        method = data[0]
+        body = data[1:]
+        if method == RAW:
+            return body
+        if method == ZLIB:
+            return self.inflate(zlib.decompressobj(), body)
+        if method == LZMA:
+            return self.inflate(lzma.LZMADecompressor(), body)
+        if method == ZLIB_DICT:
+            (key,) = DICT_ID.unpack(body[:DICT_ID.size])
+            return self.inflate(zlib.decompressobj(zdict=self.dictionaries[key]), body[DICT_ID.size:])
+        raise ValueError(f"unknown codec method: {method}")
+
+    def inflate(self, decompressor, body):
+        # max_size + 1 바이트까지만 풀어 보고 넘치면 나머지는 풀지 않음
+        raw = decompressor.decompress(body, self.max_size + 1)
+        if len(raw) > self.max_size:
+            raise ValueError(f"decompressed frame exceeds {self.max_size} bytes")
+        if not decompressor.eof:
+            raise ValueError("truncated compressed frame")
+        return raw
+
+def write_blocks(path, blocks, codec):
+    # 블록마다 [4바이트 길이][코덱 프레임] 으로 파일에 씀
+    with open(path, 'wb') as f:
+        accepts = codec.supported()
+        for block in blocks:
+            data = codec.encode(block, accepts)
+            f.write(struct.pack('!I', len(data)))
+            f.write(data)
+
+def read_blocks(path, codec):
+    blocks = []
+    with open(path, 'rb') as f:
+        while True:
+            head = f.read(4)
+            if len(head) < 4:
+                break
+            (size,) = struct.unpack('!I', head)
+            blocks.append(codec.decode(f.read(size)))
+    return blocks
@@ -0,0 +1,58 @@
+import collections
+import hashlib
+import struct
+import threading
+
+# 코덱 프레임 앞에 붙는 고정 길이 헤더: 종류, view, 순번(블록 timestamp 또는 체크포인트 높이), 보낸 피어
+# 받는 쪽은 본문을 역직렬화하기 전에 이것만 보고 중복/지난 메시지를 버릴 수 있음
+HEADER = struct.Struct('!BIdi')
+
+OTHER = 0
+PREPREPARE = 1
+PREPARE = 2
+COMMIT = 3
+CHECKPOINT = 4
+RELAYED = 0x80  # 릴레이 계획이 붙은 preprepare, 이미 커밋했어도 하위 트리로 넘겨야 하므로 지난 메시지로 보지 않음
+HEARTBEAT = 0x40  # heartbeat 가 실린 합의 메시지, 지난 메시지라도 heartbeat 는 읽어야 하므로 버리지 않음
+
+KINDS = {'preprepare': PREPREPARE, 'prepare': PREPARE, 'commit': COMMIT, 'checkpoint': CHECKPOINT}
+
+def pack_header(message):
+    kind = KINDS.get(message.get('type'), OTHER)
+    flags = HEARTBEAT if 'hb' in message else 0
+    if kind == PREPREPARE:
+        flags |= RELAYED if message.get('relay') is not None else 0
+        return HEADER.pack(kind | flags, message['view'], message['block'].timestamp, message.get('peer_id', -1))
+    if kind in (PREPARE, COMMIT):
+        return HEADER.pack(kind | flags, message['view'], message['ref'].timestamp, message['peer_id'])
+    if kind == CHECKPOINT:
+        return HEADER.pack(kind, 0, message['height'], message['peer_id'])
+    return HEADER.pack(OTHER, 0, 0.0, -1)
+
+def unpack_header(data):
+    kind, view, seq, sender = HEADER.unpack_from(data)
+    return kind & ~(RELAYED | HEARTBEAT), bool(kind & RELAYED), bool(kind & HEARTBEAT), view, seq, sender
+
+def frame_digest(data):
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+class SeenCache:
+    # 최근에 받은 메시지 다이제스트를 capacity 개까지 기억하는 LRU
+    def __init__(self, capacity=65536):
+        self.capacity = capacity
+        self.items = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.items)
+
+    def check(self, key):
+        # 이미 본 키면 True, 처음 보는 키면 기억해 두고 False
+        with self.lock:
+            if key in self.items:
+                self.items.move_to_end(key)
+                return True
+            self.items[key] = None
+            if len(self.items) > self.capacity:
+                self.items.popitem(last=False)
+            return False
@@ -0,0 +1,18 @@
+def relay_order(primary_id, peer_ids):
+    # 릴레이 트리의 노드 순서: 주 노드가 루트, 나머지는 id 순
+    return [primary_id] + sorted(i for i in peer_ids if i != primary_id)
+
+def relay_children(order, node_id, fanout):
+    # order 를 힙 배열로 보고 node_id 의 자식들을 돌려줌
+    if node_id not in order:
+        return []
+    first = order.index(node_id) * fanout + 1
+    return order[first:first + fanout]
+
+def relay_depth(count, fanout):
+    depth = 0
+    reach = 1
+    while reach < count:
+        depth += 1
+        reach += fanout ** depth
+    return depth
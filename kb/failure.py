@@ -0,0 +1,170 @@
+import collections
+import math
+import sys
+import threading
+
+def phi_of(elapsed, mean, std):
+    # 정규분포 꼬리 확률의 로지스틱 근사 (Akka 의 phi accrual 과 같은 식)
+    y = max((elapsed - mean) / std, -10.0)  # 아래쪽은 phi 가 이미 0 에 가까움, exp 넘침 방지
+    e = math.exp(-y * (1.5976 + 0.070566 * y * y))
+    if elapsed > mean:
+        return -math.log10(max(e / (1.0 + e), sys.float_info.min))
+    return abs(math.log10(1.0 - 1.0 / (1.0 + e)))
+
+class PhiAccrual:
+    # 한 피어의 heartbeat 도착 간격 분포로 "아직도 소식이 없다"를 phi 로 나타냄 (Hayashibara et al.)
+    # phi = -log10(지금까지 소식이 없을 확률), phi 8 이면 살아 있는데 의심할 확률이 1e-8
+    def __init__(self, now, interval, window=100):
+        self.intervals = collections.deque()
+        self.window = window
+        self.total = 0.0
+        self.squares = 0.0
+        self.last_beat = None  # 마지막 heartbeat 도착 시각, 간격 분포는 heartbeat 사이로만 잼
+        self.last_heard = now  # heartbeat 든 합의 메시지든 마지막으로 무엇이라도 받은 시각
+        self.add(interval)  # 처음에는 보내는 주기로 가정함
+
+    def add(self, interval):
+        self.intervals.append(interval)
+        self.total += interval
+        self.squares += interval * interval
+        if len(self.intervals) > self.window:
+            old = self.intervals.popleft()
+            self.total -= old
+            self.squares -= old * old
+
+    def beat(self, now):
+        if self.last_beat is not None:
+            self.add(now - self.last_beat)
+        self.last_beat = now
+        self.heard(now)
+
+    def heard(self, now):
+        self.last_heard = max(self.last_heard, now)
+
+    def mean(self):
+        return self.total / len(self.intervals)
+
+    def std(self):
+        mean = self.mean()
+        return math.sqrt(max(self.squares / len(self.intervals) - mean * mean, 0.0))
+
+    def phi(self, now, min_std):
+        return phi_of(now - self.last_heard, self.mean(), max(self.std(), min_std))
+
+class FailureDetector:
+    # 복제본끼리의 heartbeat 와 phi accrual 의심 판정
+    # - 합의 메시지를 보낼 때 heartbeat 가 필요하면 거기에 실어 보내고(stamp), 그동안 아무것도 안 보냈을 때만 따로 보냄
+    # - heartbeat 에는 보낸 시각과, 다른 피어들의 최근 heartbeat 시각 + 받은 뒤 지난 시간을 되돌려 실어 RTT 를 잼
+    # - 의심 문턱: 간격 분포의 표준편차가 RTT 흔들림(rttvar)보다 작다고 보지 않음, 부하로 지연이 흔들리면 그만큼 늦게 의심함
+    def __init__(self, now, interval=0.1, threshold=8.0, window=100, min_std=0.01, rtt_alpha=0.125):
+        self.interval = interval
+        self.threshold = threshold
+        self.window = window
+        self.min_std = min_std
+        self.rtt_alpha = rtt_alpha
+        self.started = now
+        self.detectors = {}  # 피어 id -> PhiAccrual
+        self.rtt = {}  # 피어 id -> (srtt, rttvar), TCP 의 RTT 추정과 같은 EWMA
+        self.echo = {}  # 피어 id -> (그 피어가 heartbeat 를 보낸 시각, 내가 받은 시각)
+        self.suspected = set()
+        self.last_sent = now
+        self.lock = threading.Lock()  # 연결 처리 스레드, 타이머, actor 가 함께 씀
+
+    def detector(self, peer_id, now):
+        detector = self.detectors.get(peer_id)
+        if detector is None:
+            detector = self.detectors[peer_id] = PhiAccrual(now, self.interval, self.window)
+        return detector
+
+    def retain(self, peer_ids, now):
+        # 구성이 바뀌면 빠진 피어는 잊고 새 피어는 지금부터 잼
+        with self.lock:
+            for peer_id in [peer_id for peer_id in self.detectors if peer_id not in peer_ids]:
+                del self.detectors[peer_id]
+                self.rtt.pop(peer_id, None)
+                self.echo.pop(peer_id, None)
+                self.suspected.discard(peer_id)
+            for peer_id in peer_ids:
+                self.detector(peer_id, now)
+
+    def due(self, now, piggyback=False):
+        # 나가는 메시지에는 주기의 3/4 가 지나면 미리 실음, 따로 보내는 heartbeat 는 그동안 실을 메시지가 없었을 때만 나감
+        # (0.999: 타이머 시각의 부동소수점 오차로 한 틱 늦어지지 않게)
+        return now - self.last_sent >= self.interval * (0.75 if piggyback else 0.999)
+
+    def stamp(self, now, piggyback=False):
+        # 보낼 heartbeat, 주기가 안 됐으면 None
+        with self.lock:
+            if not self.due(now, piggyback):
+                return None
+            self.last_sent = now
+            return {'sent': now, 'echo': {peer_id: (sent, now - received) for peer_id, (sent, received) in self.echo.items()}}
+
+    def heard(self, peer_id, now, hb=None, own_id=None):
+        # peer_id 에게서 메시지를 받음, hb 가 있으면 heartbeat 로 셈
+        with self.lock:
+            detector = self.detector(peer_id, now)
+            if hb is None:
+                detector.heard(now)
+                return
+            detector.beat(now)
+            self.echo[peer_id] = (hb['sent'], now)
+            echoed = hb['echo'].get(own_id)
+            if echoed is not None:
+                sent, held = echoed
+                self.add_rtt(peer_id, now - sent - held)
+
+    def add_rtt(self, peer_id, sample):
+        if sample < 0:
+            return
+        if peer_id not in self.rtt:
+            self.rtt[peer_id] = (sample, sample / 2)
+            return
+        srtt, rttvar = self.rtt[peer_id]
+        rttvar = (1 - self.rtt_alpha / 2) * rttvar + self.rtt_alpha / 2 * abs(srtt - sample)
+        srtt = (1 - self.rtt_alpha) * srtt + self.rtt_alpha * sample
+        self.rtt[peer_id] = (srtt, rttvar)
+
+    def phi(self, peer_id, now):
+        with self.lock:
+            return self.phi_locked(peer_id, now)
+
+    def phi_locked(self, peer_id, now):
+        detector = self.detectors.get(peer_id)
+        if detector is None:
+            return 0.0
+        rttvar = self.rtt.get(peer_id, (0.0, 0.0))[1]
+        return detector.phi(now, max(self.min_std, rttvar))
+
+    def check(self, now):
+        # 새로 의심하게 된 피어와 다시 소식이 온 피어를 돌려줌
+        with self.lock:
+            suspected = {peer_id for peer_id in self.detectors if self.phi_locked(peer_id, now) >= self.threshold}
+            new = suspected - self.suspected
+            cleared = self.suspected - suspected
+            self.suspected = suspected
+            return sorted(new), sorted(cleared)
+
+    def is_suspected(self, peer_id):
+        return peer_id in self.suspected
+
+    def forgive(self, peer_id, now):
+        # 새 주 노드처럼 지금부터 다시 기회를 주는 피어, 지금 소식을 들은 것으로 침
+        with self.lock:
+            self.detector(peer_id, now).heard(now)
+            self.suspected.discard(peer_id)
+
+    def stats(self, now):
+        with self.lock:
+            report = {}
+            for peer_id, detector in self.detectors.items():
+                srtt, rttvar = self.rtt.get(peer_id, (None, None))
+                report[peer_id] = {
+                    'rtt': srtt,
+                    'rttvar': rttvar,
+                    'phi': self.phi_locked(peer_id, now),
+                    'silent_for': now - detector.last_heard,
+                    'mean_interval': detector.mean(),
+                    'suspected': peer_id in self.suspected,
+                }
+            return report
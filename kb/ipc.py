@@ -0,0 +1,109 @@
+import os
+import struct
+import threading
+from multiprocessing import resource_tracker, shared_memory
+
+SHM = 0x80000000  # 길이 필드의 최상위 비트: 프레임 대신 공유 메모리 위치가 옴
+DESCRIPTOR = struct.Struct('!QIQ')  # 링 안의 offset, 프레임 크기, 자리 번호 (뒤에 세그먼트 이름)
+SLOT = struct.Struct('!Q')  # 링의 각 자리 앞에 쓰는 자리 번호, 받는 쪽이 위치와 함께 받은 번호와 비교함
+ACK = b'\x06'
+OWNED = {}  # 이 프로세스가 만든 세그먼트, 같은 프로세스 안의 피어끼리는 그대로 씀
+
+def attach(name):
+    # 보내는 쪽이 만든 세그먼트에 붙음, 받는 쪽이 종료할 때 세그먼트를 지우지 않도록 추적을 끔
+    if name in OWNED:
+        return OWNED[name]
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        segment = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(segment._name, 'shared_memory')
+        return segment
+
+class ShmRing:
+    # 보내는 쪽 공유 메모리 링: 큰 프레임을 한 번 써 두고 같은 호스트의 복제본들에게는 위치만 보냄
+    # 받은 쪽이 디코딩을 마치고 ACK 를 보내거나 연결이 끊긴 뒤에만 그 자리를 다시 씀
+    # 자리가 없으면 None 을 돌려주고 호출한 쪽은 소켓으로 보냄
+    # 자리마다 번호를 앞에 써 두므로 받는 쪽은 늦게 읽은 위치가 다른 프레임으로 덮였는지 알 수 있음
+    def __init__(self, size=64 * 1024 * 1024):
+        self.segment = shared_memory.SharedMemory(create=True, size=size)
+        OWNED[self.segment.name] = self.segment
+        self.name = self.segment.name.encode()
+        self.size = size
+        self.head = 0
+        self.seq = 0
+        self.used = {}  # offset -> (끝, 아직 ACK 하지 않은 수)
+        self.lock = threading.Lock()
+
+    def overlaps(self, start, end):
+        return any(start < used_end and used_start < end for used_start, (used_end, _) in self.used.items())
+
+    def put(self, data, readers=1):
+        # (offset, 자리 번호) 를 돌려줌
+        size = SLOT.size + len(data)
+        with self.lock:
+            for start in (self.head, 0):
+                end = start + size
+                if end <= self.size and not self.overlaps(start, end):
+                    break
+            else:
+                return None
+            self.used[start] = (end, readers)
+            self.head = end
+            self.seq += 1
+            seq = self.seq
+        SLOT.pack_into(self.segment.buf, start, seq)
+        self.segment.buf[start + SLOT.size:end] = data
+        return start, seq
+
+    def release(self, offset):
+        with self.lock:
+            end, readers = self.used[offset]
+            if readers > 1:
+                self.used[offset] = (end, readers - 1)
+            else:
+                del self.used[offset]
+
+    def descriptor(self, offset, size, seq):
+        body = DESCRIPTOR.pack(offset, size, seq) + self.name
+        return struct.pack('!I', SHM | len(body)) + body
+
+    def close(self):
+        OWNED.pop(self.segment.name, None)
+        try:
+            self.segment.close()
+        except BufferError:
+            pass  # 같은 프로세스의 받는 쪽이 아직 view 를 들고 있음
+        self.segment.unlink()
+
+class ShmViews:
+    # 받는 쪽: 세그먼트 이름마다 한 번만 붙고, 위치를 받으면 프레임의 memoryview 를 돌려줌
+    def __init__(self):
+        self.segments = {}
+        self.lock = threading.Lock()
+
+    def view(self, body):
+        offset, size, seq = DESCRIPTOR.unpack_from(body)
+        name = bytes(body[DESCRIPTOR.size:]).decode()
+        with self.lock:
+            segment = self.segments.get(name)
+            if segment is None:
+                segment = self.segments[name] = attach(name)
+        (written,) = SLOT.unpack_from(segment.buf, offset)
+        if written != seq:
+            raise ValueError(f"shared memory slot {offset} holds frame {written}, expected {seq}")
+        return segment.buf[offset + SLOT.size:offset + SLOT.size + size]
+
+    def close(self):
+        with self.lock:
+            for name, segment in self.segments.items():
+                if name in OWNED:
+                    continue  # 만든 쪽(ShmRing)이 닫음
+                try:
+                    segment.close()
+                except BufferError:
+                    pass  # 아직 참조 중인 view 가 있음, 프로세스가 끝날 때 풀림
+            self.segments = {}
+
+def unix_path(directory, port):
+    return os.path.join(directory, f"peer-{port}.sock")
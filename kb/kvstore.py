@@ -0,0 +1,116 @@
+import hashlib
+import math
+
+MOD = 1 << 256
+MISSING = object()
+ARITY = {'put': 3, 'get': 2, 'delete': 2, 'transfer': 4}
+
+def encode(value):
+    # 타입 태그 + 길이 + 내용으로 된 정규 인코딩, repr 와 달리 객체 주소나 dict 순서에 따라 바뀌지 않음
+    # 같다고 비교되는 값(1, 1.0, True)은 dict 에서 같은 키이므로 같은 바이트가 되게 정수로 맞춤
+    if value is None:
+        tag, body = b'n', b''
+    elif isinstance(value, float) and not math.isfinite(value):
+        raise ValueError(f"cannot encode {value!r}")
+    elif isinstance(value, (bool, int)) or (isinstance(value, float) and value.is_integer()):
+        tag, body = b'i', str(int(value)).encode()
+    elif isinstance(value, float):
+        tag, body = b'd', repr(value).encode()
+    elif isinstance(value, str):
+        tag, body = b's', value.encode()
+    elif isinstance(value, bytes):
+        tag, body = b'b', value
+    elif isinstance(value, (tuple, list)):
+        tag, body = (b't' if isinstance(value, tuple) else b'l'), b''.join(encode(item) for item in value)
+    elif isinstance(value, dict):
+        tag, body = b'm', b''.join(key + item for key, item in sorted((encode(k), encode(v)) for k, v in value.items()))
+    else:
+        raise TypeError(f"cannot encode {type(value).__name__}")
+    return tag + len(body).to_bytes(8, 'big') + body
+
+def entry_hash(key, value):
+    return int.from_bytes(hashlib.sha256(encode((key, value))).digest(), 'big')
+
+class KVStore:
+    # 블록의 연산 ('put', k, v) / ('get', k) / ('delete', k) / ('transfer', from, to, amount) 를
+    # 순서대로 적용하는 결정적 상태 기계
+    # 상태 루트는 모든 (키, 값) 해시의 합 mod 2^256 이라서 바뀐 키만 빼고 더하면 됨 (전체 재해시 없음)
+    def __init__(self):
+        self.data = {}
+        self.root = 0
+        self.applied = 0
+        self.results = []
+        self.invalid = 0  # 인자가 맞지 않아 건너뛴 연산 수
+
+    def __len__(self):
+        return len(self.data)
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+    def set(self, key, value):
+        old = self.data.get(key, MISSING)
+        if old is not MISSING:
+            self.root -= entry_hash(key, old)
+        self.data[key] = value
+        self.root = (self.root + entry_hash(key, value)) % MOD
+
+    def remove(self, key):
+        old = self.data.pop(key, MISSING)
+        if old is MISSING:
+            return False
+        self.root = (self.root - entry_hash(key, old)) % MOD
+        return True
+
+    def valid(self, op):
+        # 인자 수가 맞고 키가 해시 가능하며 키와 값을 정규 인코딩할 수 있고 이체 금액이 정수인 연산만 적용함
+        if not isinstance(op, tuple) or not op or not isinstance(op[0], str) or ARITY.get(op[0]) != len(op):
+            return False
+        keys = op[1:3] if op[0] == 'transfer' else op[1:2]
+        try:
+            for key in keys:
+                hash(key)
+                encode(key)
+            if op[0] == 'put':
+                encode(op[2])
+        except (TypeError, ValueError):
+            return False
+        return op[0] != 'transfer' or (isinstance(op[3], int) and not isinstance(op[3], bool))
+
+    def execute(self, op):
+        if not self.valid(op):
+            self.invalid += 1
+            return None  # 잘못된 연산은 모든 복제본에서 똑같이 아무 일도 하지 않음
+        kind = op[0]
+        if kind == 'put':
+            self.set(op[1], op[2])
+            return True
+        if kind == 'get':
+            return self.data.get(op[1])
+        if kind == 'delete':
+            return self.remove(op[1])
+        if kind == 'transfer':
+            source, target, amount = op[1], op[2], op[3]
+            balance = self.data.get(source, 0)
+            received = self.data.get(target, 0)
+            if not isinstance(balance, int) or not isinstance(received, int) or amount <= 0 or balance < amount:
+                return False  # 잔액 부족이나 숫자가 아닌 잔액은 모든 복제본에서 똑같이 실패함
+            self.set(source, balance - amount)
+            self.set(target, self.data.get(target, 0) + amount)
+            return True
+
+    def apply(self, block, ops=()):
+        self.results = [self.execute(op) for op in ops]
+        self.applied += 1
+        return self.results
+
+    def state_hash(self):
+        return format(self.root, '064x')
+
+    def dump(self):
+        return {'data': dict(self.data), 'root': self.root, 'applied': self.applied}
+
+    def restore(self, data):
+        self.data = dict(data['data'])
+        self.root = sum(entry_hash(key, value) for key, value in self.data.items()) % MOD
+        self.applied = data['applied']
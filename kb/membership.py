@@ -0,0 +1,83 @@
+import argparse
+import json
+import time
+from kb.codec import Codec
+from kb.ipc import unix_path
+from kb.verify import calc_hash
+
+class Membership:
+    # 정적 멤버십: 복제본마다 id, 주소(host, port), 공개 키, 지원 코덱 + 제네시스 블록과 그 해시
+    # 모든 복제본이 같은 파일로 시작하면 connect_peer 핸드셰이크 없이 같은 구성과 정족수를 가짐
+    # epoch 는 합의로 적용된 구성 변경 횟수
+    def __init__(self, replicas, genesis, genesis_hash, epoch=0):
+        self.replicas = {replica['id']: dict(replica) for replica in replicas}
+        self.genesis = dict(genesis)  # Block 필드: index, timestamp, data, prev_hash
+        self.genesis_hash = genesis_hash
+        self.epoch = epoch
+
+    def ids(self):
+        return sorted(self.replicas)
+
+    def address(self, id, local_host):
+        # 같은 호스트면 지금처럼 포트 번호만 (Unix 소켓 경로가 있으면 경로), 다른 호스트면 (host, port)
+        replica = self.replicas[id]
+        host = replica.get('host', local_host)
+        if host != local_host:
+            return (host, replica['port'])
+        return replica.get('unix') or replica['port']
+
+    def changed(self, add=(), remove=()):
+        # 복제본을 빼고 더한 다음 에포크의 구성
+        removed = set(remove)
+        replicas = [replica for id, replica in self.replicas.items() if id not in removed]
+        replicas += [replica for replica in add if replica['id'] not in self.replicas or replica['id'] in removed]
+        return Membership(replicas, self.genesis, self.genesis_hash, self.epoch + 1)
+
+    def check_genesis(self):
+        genesis = self.genesis
+        return calc_hash(genesis['index'], genesis['data'], genesis['timestamp'], genesis['prev_hash']) == self.genesis_hash
+
+    def to_dict(self):
+        return {'epoch': self.epoch, 'genesis': self.genesis, 'genesis_hash': self.genesis_hash,
+                'replicas': [self.replicas[id] for id in self.ids()]}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['replicas'], data['genesis'], data['genesis_hash'], data.get('epoch', 0))
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    @classmethod
+    def local(cls, n, base_port=5000, host='127.0.0.1', keys=None, timestamp=None, unix_dir=None):
+        # 한 호스트에 n 개의 복제본을 base_port + id 로 띄우는 구성, 제네시스 블록도 여기서 정함
+        # unix_dir 가 있으면 복제본끼리는 그 디렉터리의 Unix 도메인 소켓으로 주고받음
+        genesis = {'index': 0, 'timestamp': time.time() if timestamp is None else timestamp,
+                   'data': 'Genesis', 'prev_hash': '0'}
+        genesis_hash = calc_hash(genesis['index'], genesis['data'], genesis['timestamp'], genesis['prev_hash'])
+        codecs = Codec().supported()
+        replicas = [{'id': i, 'host': host, 'port': base_port + i, 'key': keys[i] if keys else None, 'codecs': codecs}
+                    for i in range(n)]
+        if unix_dir is not None:
+            for replica in replicas:
+                replica['unix'] = unix_path(unix_dir, replica['port'])
+        return cls(replicas, genesis, genesis_hash)
+
+def main():
+    parser = argparse.ArgumentParser(description="로컬 클러스터용 멤버십 파일 생성")
+    parser.add_argument('output')
+    parser.add_argument('--replicas', type=int, default=4)
+    parser.add_argument('--base-port', type=int, default=5000)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--unix-dir', help="같은 호스트의 복제본끼리 이 디렉터리의 Unix 도메인 소켓을 씀")
+    args = parser.parse_args()
+    Membership.local(args.replicas, args.base_port, args.host, unix_dir=args.unix_dir).save(args.output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+import hashlib
+import heapq
+import itertools
+
+def tx_digest(tx):
+    return hashlib.sha256(str(sorted(tx.items())).encode()).hexdigest()
+
+def valid_tx(tx):
+    # client 는 해시 가능, nonce 는 0 이상의 정수, fee 는 숫자여야 함 (bool 은 제외)
+    if not isinstance(tx, dict) or not all(isinstance(key, str) for key in tx):
+        return False
+    client, nonce, fee = tx.get('client'), tx.get('nonce'), tx.get('fee', 0)
+    try:
+        hash(client)
+    except TypeError:
+        return False
+    if not isinstance(nonce, int) or isinstance(nonce, bool) or nonce < 0:
+        return False
+    return isinstance(fee, (int, float)) and not isinstance(fee, bool) and fee == fee
+
+class Mempool:
+    # 대기 중인 트랜잭션 {'client', 'nonce', 'fee', ...} 저장소
+    # - 해시로 O(1) 중복 검사
+    # - 클라이언트마다 nonce 순서를 지키고, 그 중 다음 차례인 것만 수수료 우선순위 힙에 올림
+    # - 가득 차면 수수료가 가장 낮은 클라이언트의 nonce 사슬 끝부터 내보냄
+    def __init__(self, max_size=100000):
+        self.max_size = max_size
+        self.txs = {}
+        self.pending = {}
+        self.cursor = {}
+        self.inflight = {}
+        self.ready = []
+        self.evictable = []
+        self.seq = itertools.count()
+        self.evicted = 0
+        self.malformed = 0
+
+    def __len__(self):
+        return len(self.txs)
+
+    def __contains__(self, digest):
+        return digest in self.txs or digest in self.inflight
+
+    def add(self, tx):
+        if not valid_tx(tx):
+            self.malformed += 1
+            return False
+        digest = tx_digest(tx)
+        if digest in self:
+            return False
+        client, nonce, fee = tx['client'], tx['nonce'], tx.get('fee', 0)
+        if nonce < self.cursor.get(client, 0):
+            return False  # 이미 블록에 들어갔거나 들어갈 nonce
+        slots = self.pending.setdefault(client, {})
+        old = slots.get(nonce)
+        if old is not None:
+            if fee <= self.txs[old].get('fee', 0):
+                return False
+            self.drop(old)  # 같은 nonce 는 수수료가 더 높을 때만 교체
+        if len(self.txs) >= self.max_size and not self.evict(fee):
+            return False
+        self.txs[digest] = tx
+        slots[nonce] = digest
+        heapq.heappush(self.evictable, (fee, next(self.seq), digest))
+        if nonce == self.cursor.get(client, 0):
+            heapq.heappush(self.ready, (-fee, next(self.seq), digest))
+        return digest
+
+    def drop(self, digest):
+        tx = self.txs.pop(digest, None)
+        if tx is None:
+            return None
+        slots = self.pending.get(tx['client'])
+        if slots is not None and slots.get(tx['nonce']) == digest:
+            del slots[tx['nonce']]
+            if not slots:
+                del self.pending[tx['client']]
+        return tx
+
+    def evict(self, fee):
+        # fee 보다 수수료가 낮은 트랜잭션을 하나 내보내고 성공 여부를 돌려줌
+        # 클라이언트의 nonce 사슬 가운데를 빼면 뒤 nonce 들이 영영 차례가 오지 않으므로 사슬 끝만 내보냄
+        skipped = []
+        try:
+            while self.evictable:
+                lowest, _, digest = self.evictable[0]
+                if digest not in self.txs:
+                    heapq.heappop(self.evictable)
+                    continue
+                if lowest >= fee:
+                    return False
+                entry = heapq.heappop(self.evictable)
+                tx = self.txs[digest]
+                if tx['nonce'] != max(self.pending[tx['client']]):
+                    skipped.append(entry)  # 뒤 nonce 가 먼저 빠진 다음에 다시 후보가 됨
+                    continue
+                self.drop(digest)
+                self.evicted += 1
+                return True
+            return False
+        finally:
+            for entry in skipped:
+                heapq.heappush(self.evictable, entry)
+
+    def promote(self, client):
+        digest = self.pending.get(client, {}).get(self.cursor.get(client, 0))
+        if digest is not None:
+            heapq.heappush(self.ready, (-self.txs[digest].get('fee', 0), next(self.seq), digest))
+
+    def has_ready(self):
+        # 지금 블록에 넣을 수 있는 트랜잭션이 있는지, 앞 nonce 를 기다리는 것만 남았으면 False
+        while self.ready:
+            _, _, digest = self.ready[0]
+            tx = self.txs.get(digest)
+            if tx is not None and tx['nonce'] == self.cursor.get(tx['client'], 0):
+                return True
+            heapq.heappop(self.ready)  # build_batch 가 건너뛸 항목
+        return False
+
+    def build_batch(self, limit):
+        # 수수료 순으로 최대 limit 개를 꺼냄, O(batch log n)
+        batch = []
+        while self.ready and len(batch) < limit:
+            _, _, digest = heapq.heappop(self.ready)
+            tx = self.txs.get(digest)
+            if tx is None or tx['nonce'] != self.cursor.get(tx['client'], 0):
+                continue  # 교체되었거나 이미 꺼낸 항목
+            self.drop(digest)
+            self.inflight[digest] = tx
+            self.cursor[tx['client']] = tx['nonce'] + 1
+            batch.append(tx)
+            self.promote(tx['client'])
+        return batch
+
+    def requeue(self, txs):
+        # 제안했지만 커밋되지 못한 배치를 다시 대기열로 돌려놓음
+        for tx in txs:
+            self.inflight.pop(tx_digest(tx), None)
+            client = tx['client']
+            self.cursor[client] = min(self.cursor.get(client, 0), tx['nonce'])
+        for tx in txs:
+            self.add(tx)
+        for client in {tx['client'] for tx in txs}:
+            self.promote(client)
+
+    def remove_committed(self, txs):
+        for tx in txs:
+            if not valid_tx(tx):
+                continue  # 다른 제안자가 넣은 잘못된 트랜잭션, 실행에서도 건너뜀
+            digest = tx_digest(tx)
+            self.inflight.pop(digest, None)
+            self.drop(digest)
+            client = tx['client']
+            if tx['nonce'] + 1 > self.cursor.get(client, 0):
+                self.cursor[client] = tx['nonce'] + 1
+                slots = self.pending.get(client, {})
+                for nonce in [n for n in slots if n < tx['nonce'] + 1]:
+                    self.drop(slots[nonce])
+                self.promote(client)
@@ -0,0 +1,28 @@
+import threading
+
+class Metrics:
+    # 카운터와 게이지를 이름으로 모아두는 간단한 저장소, 여러 스레드에서 써도 됨
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def inc(self, name, value=1):
+        with self.lock:
+            self.values[name] = self.values.get(name, 0) + value
+
+    def set(self, name, value):
+        with self.lock:
+            self.values[name] = value
+
+    def max(self, name, value):
+        with self.lock:
+            if value > self.values.get(name, value - 1):
+                self.values[name] = value
+
+    def get(self, name, default=0):
+        with self.lock:
+            return self.values.get(name, default)
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.values)
@@ -0,0 +1,190 @@
+import multiprocessing
+import queue
+import threading
+import time
+
+def instance_main(peer_cls, block_cls, instance, id, port, commands, events):
+    # 워커 프로세스 하나가 PBFT 인스턴스 하나를 맡음, 인스턴스마다 포트와 시퀀스 공간이 따로 있음
+    peer = peer_cls(id, port, instance=instance)
+    peer.verbose = False
+
+    def on_commit(peer, block):
+        height = len(peer.blockchain.chain) - 1
+        events.put(('commit', instance, height, block))
+    peer.commit_listeners.append(on_commit)
+
+    members = list(peer.quorum.members)
+    events.put(('members', instance, members))
+    while True:
+        try:
+            command = commands.get(timeout=0.5)
+        except queue.Empty:
+            command = None
+        if command is not None:
+            if command[0] == 'connect':
+                peer.connect_peer(command[1], command[2])
+            elif command[0] == 'propose':
+                if peer.blockchain is not None and peer.id == peer.primary_id:
+                    peer.propose_block(block_cls(len(peer.blockchain.chain), time.time(), command[1]))
+                else:
+                    events.put(('rejected', instance, command[1]))
+            elif command[0] == 'byzantine':
+                peer.is_byzantine = command[1]
+            elif command[0] == 'stop':
+                peer.stop_server()
+                break
+        if peer.quorum.members != members:
+            # connect_back 으로 들어온 복제본도 있으므로 인스턴스마다 아는 복제본 목록을 알려 줌
+            members = list(peer.quorum.members)
+            events.put(('members', instance, members))
+
+class LogMerger:
+    # 인스턴스 k 의 높이 h 블록을 전역 로그의 (h, k) 자리에 놓음
+    # 모든 복제본이 같은 규칙을 쓰므로 커밋 순서와 상관없이 같은 전역 로그가 만들어짐
+    def __init__(self, instances):
+        self.instances = instances
+        self.pending = {}
+        self.next_slot = (1, 0)
+        self.log = []
+
+    def add(self, instance, height, block):
+        self.pending[(height, instance)] = block
+        merged = []  # (인스턴스, 블록)
+        while self.next_slot in self.pending:
+            height, instance = self.next_slot
+            merged.append((instance, self.pending.pop(self.next_slot)))
+            if instance + 1 == self.instances:
+                self.next_slot = (height + 1, 0)
+            else:
+                self.next_slot = (height, instance + 1)
+        self.log.extend(block for _, block in merged)
+        return merged
+
+    def lagging(self):
+        # 전역 로그를 막고 있는 인스턴스, 이 인스턴스의 주 노드는 빈 블록이라도 제안해야 함
+        return self.next_slot[1]
+
+class MultiInstancePeer:
+    # 복제본 하나가 K 개의 독립 PBFT 인스턴스를 K 개의 프로세스에서 돌림
+    # 인스턴스 k 의 주 노드는 정렬된 복제본 id 목록의 (view + k) 번째라서 복제본마다 주 노드 역할이 나뉨
+    # 전역 로그가 다른 복제본이 맡은 인스턴스 때문이 아니라 이 복제본의 인스턴스 때문에 막히면 pad_interval 마다 빈 블록을 제안함
+    def __init__(self, peer_cls, block_cls, id, port, instances=2, port_stride=1000, pad_interval=0.05):
+        self.id = id
+        self.port = port
+        self.instances = instances
+        self.port_stride = port_stride
+        self.pad_interval = pad_interval
+        self.peers = {}
+        self.known = {}  # 인스턴스 -> 그 인스턴스가 아는 복제본 id 목록
+        self.progressed = time.time()  # 전역 로그가 마지막으로 늘어나거나 빈 블록을 제안한 시각
+        self.merger = LogMerger(instances)
+        self.commit_listeners = []  # 전역 로그에 블록이 붙을 때 listener(instance, block) 호출
+        self.rejected = 0
+        self.next_instance = 0
+        self.lock = threading.Lock()
+        self.events = multiprocessing.Queue()
+        self.commands = []
+        self.workers = []
+        for instance in range(instances):
+            commands = multiprocessing.Queue()
+            worker = multiprocessing.Process(
+                target=instance_main,
+                args=(peer_cls, block_cls, instance, id, self.instance_port(port, instance), commands, self.events),
+                daemon=True)
+            worker.start()
+            self.commands.append(commands)
+            self.workers.append(worker)
+        self.running = True
+        self.collector = threading.Thread(target=self.collect, daemon=True)
+        self.collector.start()
+
+    def instance_port(self, port, instance):
+        return port + instance * self.port_stride
+
+    def collect(self):
+        while self.running:
+            try:
+                event = self.events.get(timeout=self.pad_interval)
+            except queue.Empty:
+                event = (None,)
+            if event[0] == 'commit':
+                _, instance, height, block = event
+                with self.lock:
+                    merged = self.merger.add(instance, height, block)
+                if merged:
+                    self.progressed = time.time()
+                for instance, block in merged:
+                    for listener in self.commit_listeners:
+                        listener(instance, block)
+            elif event[0] == 'members':
+                with self.lock:
+                    self.known[event[1]] = event[2]
+            elif event[0] == 'rejected':
+                self.rejected += 1
+            self.maybe_pad()
+
+    def maybe_pad(self):
+        # 다른 인스턴스는 앞서 커밋했는데 전역 로그가 pad_interval 동안 멈춰 있으면 막고 있는 인스턴스를 채움
+        now = time.time()
+        if not self.merger.pending or now - self.progressed < self.pad_interval:
+            return
+        if self.pad() is not None:
+            self.progressed = now
+
+    def connect_peer(self, peer_id, peer_port):
+        for instance, commands in enumerate(self.commands):
+            commands.put(('connect', peer_id, self.instance_port(peer_port, instance)))
+        self.peers[peer_id] = peer_port
+
+    def members(self):
+        # 모든 인스턴스가 같은 주 노드 규칙을 쓰도록 인스턴스들이 아는 복제본을 합친 하나의 목록을 씀
+        with self.lock:
+            known = set(self.peers) | {self.id}
+            for members in self.known.values():
+                known.update(members)
+        return sorted(known)
+
+    @property
+    def total_peers(self):
+        return len(self.members())
+
+    def primary_of(self, instance, view=0):
+        members = self.members()
+        return members[(view + instance) % len(members)]
+
+    def led_instances(self):
+        return [k for k in range(self.instances) if self.primary_of(k) == self.id]
+
+    def propose(self, data):
+        # 이 복제본이 주 노드인 인스턴스들에 돌아가며 제안함
+        led = self.led_instances()
+        if not led:
+            return None
+        instance = led[self.next_instance % len(led)]
+        self.next_instance += 1
+        self.commands[instance].put(('propose', data))
+        return instance
+
+    def pad(self):
+        # 전역 로그가 이 복제본이 맡은 인스턴스 때문에 막혀 있으면 빈 블록을 제안함
+        instance = self.merger.lagging()
+        if self.primary_of(instance) == self.id:
+            self.commands[instance].put(('propose', None))
+            return instance
+        return None
+
+    @property
+    def log(self):
+        return self.merger.log
+
+    def set_byzantine(self, byzantine):
+        for commands in self.commands:
+            commands.put(('byzantine', byzantine))
+
+    def stop(self):
+        for commands in self.commands:
+            commands.put(('stop',))
+        for worker in self.workers:
+            worker.join(timeout=5)
+        self.running = False
+        self.collector.join()
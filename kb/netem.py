@@ -0,0 +1,166 @@
+import heapq
+import json
+import random
+import threading
+import time
+
+class Link:
+    # 한 방향 링크의 지연 분포, 대역폭(bytes/s), 손실률, 순서 뒤바뀜 비율
+    def __init__(self, delay=0.0, jitter=0.0, distribution='constant', bandwidth=None,
+                 loss=0.0, reorder=0.0, reorder_delay=None):
+        if distribution not in ('constant', 'uniform', 'normal', 'exponential'):
+            raise ValueError(f"unknown delay distribution: {distribution}")
+        self.delay = delay
+        self.jitter = jitter
+        self.distribution = distribution
+        self.bandwidth = bandwidth
+        self.loss = loss
+        self.reorder = reorder
+        self.reorder_delay = reorder_delay if reorder_delay is not None else max(delay, 0.001)
+
+    def sample_delay(self, rng):
+        if self.distribution == 'uniform':
+            value = self.delay + rng.uniform(-self.jitter, self.jitter)
+        elif self.distribution == 'normal':
+            value = rng.gauss(self.delay, self.jitter)
+        elif self.distribution == 'exponential':
+            value = self.delay + (rng.expovariate(1.0 / self.jitter) if self.jitter else 0.0)
+        else:
+            value = self.delay
+        return max(value, 0.0)
+
+class NetEm:
+    # 주소(포트) 쌍마다 링크 특성을 두고, 메시지마다 도착 시각을 계산함
+    # TCP 전송 계층과 시뮬레이션 전송 계층이 같은 모델을 공유함
+    # uplink(bytes/s) 를 주면 보내는 노드의 모든 링크가 한 업링크를 나눠 씀 (링크 대역폭은 그 뒤에 따로 적용)
+    def __init__(self, seed=0, default=None, uplink=None):
+        self.random = random.Random(seed)
+        self.default = default or Link()
+        self.links = {}
+        self.busy_until = {}
+        self.default_uplink = uplink
+        self.uplinks = {}
+        self.uplink_busy = {}
+        self.last_arrival = {}
+        self.groups = None
+        self.lock = threading.Lock()
+        self.passed = 0
+        self.dropped = 0
+        self.reordered = 0
+        self.partitioned = 0
+
+    def set_link(self, src, dst, link=None, symmetric=True, **kwargs):
+        link = link or Link(**kwargs)
+        self.links[(src, dst)] = link
+        if symmetric:
+            self.links[(dst, src)] = link
+        return link
+
+    def link(self, src, dst):
+        return self.links.get((src, dst), self.default)
+
+    def set_uplink(self, src, bandwidth):
+        self.uplinks[src] = bandwidth
+
+    def partition(self, *groups):
+        # 서로 다른 그룹에 속한 주소끼리는 통신할 수 없음, 어느 그룹에도 없는 주소는 모두와 통신함
+        self.groups = {}
+        for index, group in enumerate(groups):
+            for address in group:
+                self.groups[address] = index
+
+    def heal(self):
+        self.groups = None
+
+    def connected(self, src, dst):
+        if not self.groups or src not in self.groups or dst not in self.groups:
+            return True
+        return self.groups[src] == self.groups[dst]
+
+    def plan(self, src, dst, size, now):
+        # 도착 시각을 돌려주고, 메시지가 버려지면 None
+        with self.lock:
+            if not self.connected(src, dst):
+                self.partitioned += 1
+                return None
+            link = self.link(src, dst)
+            if link.loss and self.random.random() < link.loss:
+                self.dropped += 1
+                return None
+            key = (src, dst)
+            start = now
+            uplink = self.uplinks.get(src, self.default_uplink)
+            if uplink:
+                start = max(start, self.uplink_busy.get(src, start)) + size / uplink
+                self.uplink_busy[src] = start
+            start = max(start, self.busy_until.get(key, start))
+            if link.bandwidth:
+                start += size / link.bandwidth
+                self.busy_until[key] = start
+            arrival = start + link.sample_delay(self.random)
+            if link.reorder and self.random.random() < link.reorder:
+                # 뒤로 밀린 메시지는 FIFO 기준을 갱신하지 않아 뒤 메시지가 먼저 도착함
+                self.reordered += 1
+                arrival += link.reorder_delay
+            else:
+                arrival = max(arrival, self.last_arrival.get(key, arrival))
+                self.last_arrival[key] = arrival
+            self.passed += 1
+            return arrival
+
+    def stats(self):
+        return {
+            'passed': self.passed,
+            'dropped': self.dropped,
+            'reordered': self.reordered,
+            'partitioned': self.partitioned,
+        }
+
+    @classmethod
+    def from_dict(cls, config):
+        # {"seed": 1, "default": {...}, "uplink": 1e7, "uplinks": {"5000": 2e6},
+        #  "links": [{"src": 5000, "dst": 5001, ...}], "partitions": [[...], [...]]}
+        netem = cls(seed=config.get('seed', 0), default=Link(**config.get('default', {})), uplink=config.get('uplink'))
+        for src, bandwidth in config.get('uplinks', {}).items():
+            netem.set_uplink(int(src), bandwidth)
+        for spec in config.get('links', []):
+            spec = dict(spec)
+            src = spec.pop('src')
+            dst = spec.pop('dst')
+            symmetric = spec.pop('symmetric', True)
+            netem.set_link(src, dst, symmetric=symmetric, **spec)
+        if config.get('partitions'):
+            netem.partition(*config['partitions'])
+        return netem
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+class Delayer:
+    # 계산된 도착 시각에 실제 소켓 전송을 실행하는 스레드
+    def __init__(self):
+        self.queue = []
+        self.seq = 0
+        self.cond = threading.Condition()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def schedule(self, when, fn, *args):
+        with self.cond:
+            self.seq += 1
+            heapq.heappush(self.queue, (when, self.seq, fn, args))
+            self.cond.notify()
+
+    def run(self):
+        while True:
+            with self.cond:
+                while not self.queue:
+                    self.cond.wait()
+                wait = self.queue[0][0] - time.time()
+                if wait > 0:
+                    self.cond.wait(wait)
+                    continue
+                _, _, fn, args = heapq.heappop(self.queue)
+            fn(*args)
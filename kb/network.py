@@ -1,43 +1,355 @@
+import os
 import socket
+import struct
 import threading
-import pickle
+import time
+from kb.codec import Codec
+from kb.dedup import HEADER, pack_header
+from kb.ipc import ACK, SHM, ShmRing, ShmViews
+from kb.netem import Delayer
+
+FRAME = struct.Struct('!I')
+
+def pack_message(message, codec=None, accepts=None):
+    # [4바이트 길이][헤더][코덱 프레임]
+    data = pack_header(message) + (codec or Codec()).encode(message, accepts)
+    return FRAME.pack(len(data)) + data
+
+def recv_into(sock, view):
+    # view 를 가득 채울 때까지 받고 받은 바이트 수를 돌려줌 (중간에 닫히면 그보다 작음)
+    total = 0
+    size = len(view)
+    while total < size:
+        received = sock.recv_into(view[total:])
+        if not received:
+            break
+        total += received
+    return total
+
+class FrameReader:
+    # 프레임을 재사용하는 bytearray 에 recv_into 로 바로 받고 memoryview 로 돌려줌
+    # 돌려준 view 는 다음 read 전까지만 유효함 (디코딩된 객체는 버퍼를 참조하지 않음)
+    def __init__(self, size=65536, max_keep=4 * 1024 * 1024):
+        self.head = bytearray(FRAME.size)
+        self.buffer = bytearray(size)
+        self.max_keep = max_keep  # 이보다 큰 프레임은 한 번만 쓰는 버퍼에 받아 메모리를 붙잡아 두지 않음
+        self.shared = False  # 마지막 프레임을 공유 메모리에서 읽었으면 다 쓴 뒤 ACK 를 보내야 함
+
+    def read(self, sock, shm_views=None):
+        received = recv_into(sock, memoryview(self.head))
+        if received == 0:
+            return None
+        if received < FRAME.size:
+            raise EOFError("connection closed in the middle of a frame header")
+        (size,) = FRAME.unpack(self.head)
+        if size & SHM and shm_views is not None:
+            # 같은 호스트의 복제본이 보낸 큰 프레임: 소켓으로는 공유 메모리 위치만 옴
+            body = bytearray(size & ~SHM)
+            if recv_into(sock, memoryview(body)) < len(body):
+                raise EOFError("connection closed in the middle of a shared memory descriptor")
+            self.shared = True
+            return shm_views.view(body)
+        if size <= len(self.buffer):
+            buffer = self.buffer
+        elif size <= self.max_keep:
+            buffer = self.buffer = bytearray(max(size, 2 * len(self.buffer)))
+        else:
+            buffer = bytearray(size)
+        view = memoryview(buffer)[:size]
+        if recv_into(sock, view) < size:
+            raise EOFError("connection closed in the middle of a frame")
+        return view
+
+def read_frame(sock):
+    return FrameReader(0).read(sock)
+
+def read_message(sock, codec=None):
+    data = read_frame(sock)
+    if data is None:
+        return None
+    return (codec or Codec()).decode(data[HEADER.size:])
 
 class Network:
-    def __init__(self, peer):
+    # 실제 TCP 소켓을 쓰는 기본 전송 계층
+    threaded = True
+
+    def __init__(self, peer, host='127.0.0.1', netem=None, max_handlers=64, timeout=10.0, codec=None,
+                 unix_path=None, shm_threshold=None, shm_size=64 * 1024 * 1024):
         self.peer = peer
-    
+        # 피어가 admit_frame(data) 를 제공하면 디코딩 전에 헤더만 보고 버릴 메시지를 거름
+        self.admit = getattr(peer, 'admit_frame', None)
+        # 피어가 trace_received(message, received) 를 제공하면 수신/디코딩 시각을 알려줌
+        self.on_received = getattr(peer, 'trace_received', None)
+        self.profiler = None  # kb.sampler.SamplingProfiler, 켜면 메시지 처리 중인 스레드를 샘플링함
+        # 피어(포트)마다 협상된 압축 방식, 협상 전에는 압축하지 않음
+        self.codec = codec or Codec()
+        self.accepts = {}
+        self.host = host
+        self.running = False
+        self.server_thread = None
+        self.timeout = timeout
+        # 동시에 메시지를 읽고 디코딩하는 연결 수 제한, 다 차면 accept 를 멈춰 보낸 쪽 connect 가 기다리게 됨
+        self.handler_slots = threading.BoundedSemaphore(max_handlers)
+        # 연결 처리 스레드가 빌려 쓰는 수신 버퍼, 동시 처리 수(max_handlers)보다 많이 생기지 않음
+        self.readers = []
+        self.active_handlers = 0
+        self.lock = threading.Lock()
+        # netem 이 있으면 보내는 메시지마다 지연/대역폭/손실/파티션을 적용함
+        self.netem = netem
+        self.delayer = Delayer() if netem is not None else None
+        # unix_path 가 있으면 TCP 와 함께 Unix 도메인 소켓으로도 받음, 주소가 경로(str)인 피어에는 Unix 소켓으로 보냄
+        self.unix_path = unix_path
+        self.unix_thread = None
+        # shm_threshold 이상인 프레임은 Unix 소켓 피어에게 공유 메모리 링으로 보냄 (None 이면 끔)
+        self.shm_threshold = shm_threshold
+        self.shm_size = shm_size
+        self.ring = None
+        self.shm_views = ShmViews()
+
+    def now(self):
+        return time.time()
+
+    def call_later(self, delay, fn, *args):
+        timer = threading.Timer(delay, fn, args)
+        timer.daemon = True
+        timer.start()
+        return timer
+
+    def start(self):
+        self.running = True
+        self.server_thread = threading.Thread(target=self.run_server)
+        self.server_thread.daemon = True
+        self.server_thread.start()
+        if self.unix_path is not None:
+            self.unix_thread = threading.Thread(target=self.run_unix_server)
+            self.unix_thread.daemon = True
+            self.unix_thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.server_thread is not None:
+            self.server_thread.join()
+        if self.unix_thread is not None:
+            self.unix_thread.join()
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+        self.shm_views.close()
+
     def run_server(self):
+        self.running = True
         server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        server.bind(('127.0.0.1', self.peer.port))
-        server.listen(5)
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind((self.host, self.peer.port))
+        server.listen(128)
+        server.settimeout(1.0)
         print(f"Peer {self.peer.id} listening on port {self.peer.port}")
-        while True:
-            client_socket, addr = server.accept()
-            print(f"Connection accepted from {addr}")
-            threading.Thread(target=self.handle_client, args=(client_socket,)).start()
-    
+        self.serve(server)
+
+    def run_unix_server(self):
+        if os.path.exists(self.unix_path):
+            os.unlink(self.unix_path)  # 이전 실행이 남긴 소켓 파일
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.unix_path)
+        server.listen(128)
+        server.settimeout(1.0)
+        try:
+            self.serve(server)
+        finally:
+            if os.path.exists(self.unix_path):
+                os.unlink(self.unix_path)
+
+    def serve(self, server):
+        try:
+            while self.running:
+                if not self.handler_slots.acquire(timeout=1.0):
+                    continue
+                try:
+                    client_socket, addr = server.accept()
+                except socket.timeout:
+                    self.handler_slots.release()
+                    continue
+                with self.lock:
+                    self.active_handlers += 1
+                threading.Thread(target=self.handle_client, args=(client_socket,), daemon=True).start()
+        finally:
+            server.close()
+
     def handle_client(self, client_socket):
+        with self.lock:
+            reader = self.readers.pop() if self.readers else FrameReader()
         try:
-            data = client_socket.recv(4096)
-            if data:
-                message = pickle.loads(data)
+            data = reader.read(client_socket, self.shm_views)
+            if data is None:
+                return
+            received = self.now()
+            if self.admit is not None and not self.admit(data):
+                return
+            message = self.codec.decode(data[HEADER.size:])
+            if reader.shared:
+                self.ack_shared(reader, client_socket)  # 디코딩한 객체는 공유 메모리를 참조하지 않음
+            if self.on_received is not None:
+                self.on_received(message, received)
+            if self.profiler is not None:
+                with self.profiler.sampling():
+                    self.peer.handle_message(message, client_socket)
+            else:
                 self.peer.handle_message(message, client_socket)
         except EOFError as e:
             print(f"EOFError: {e}")
         except Exception as e:
             print(f"Exception: {e}")
         finally:
+            if reader.shared:
+                self.ack_shared(reader, client_socket)  # 디코딩하지 못했거나 버린 프레임
             client_socket.close()
-    
-    def send_message(self, peer_port, message):
+            with self.lock:
+                self.readers.append(reader)
+                self.active_handlers -= 1
+            self.handler_slots.release()
+
+    def ack_shared(self, reader, client_socket):
+        reader.shared = False
+        try:
+            client_socket.sendall(ACK)  # 보낸 쪽이 링의 그 자리를 다시 쓸 수 있음
+        except OSError:
+            pass
+
+    def connect(self, peer_port):
+        # 주소는 같은 호스트의 포트 번호, 다른 호스트면 (host, port), Unix 도메인 소켓이면 경로
+        if isinstance(peer_port, str):
+            address, family = peer_port, socket.AF_UNIX
+        else:
+            address = peer_port if isinstance(peer_port, tuple) else (self.host, peer_port)
+            family = socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        deadline = time.time() + self.timeout
         try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.connect(('127.0.0.1', peer_port))
-            sock.send(pickle.dumps(message))
+            while True:
+                try:
+                    sock.connect(address)
+                    break
+                except BlockingIOError:
+                    # Unix 소켓은 accept 대기열이 차면 TCP 처럼 기다리지 않고 바로 EAGAIN 을 돌려줌
+                    if time.time() >= deadline:
+                        raise
+                    time.sleep(0.001)
+        except Exception:
             sock.close()
+            raise
+        return sock
+
+    def send_message(self, peer_port, message):
+        data = pack_message(message, self.codec, self.accepts.get(peer_port))
+        if self.use_shm(peer_port, data):
+            return self.deliver_shared([peer_port], data)
+        return self.send_data(peer_port, data)
+
+    def use_shm(self, peer_port, data):
+        return (self.shm_threshold is not None and self.netem is None and isinstance(peer_port, str)
+                and len(data) >= self.shm_threshold)
+
+    def deliver_shared(self, peer_ports, data):
+        # 프레임을 링에 한 번만 쓰고 각 피어에는 위치만 보냄
+        # ACK 는 기다리지 않고 다른 스레드가 받으면서 자리를 돌려받음 (받는 쪽은 프레임을 디코딩하자마자 ACK 함)
+        if self.ring is None:
+            self.ring = ShmRing(self.shm_size)
+        frame = memoryview(data)[FRAME.size:]
+        slot = self.ring.put(frame, len(peer_ports))
+        if slot is None:
+            # 링이 가득 참: ACK 하지 않은 받는 쪽이 자리를 붙잡고 있어도 그 자리를 빼앗지 않고 소켓으로 보냄
+            return all([self.deliver_data(peer_port, data) for peer_port in peer_ports])
+        offset, seq = slot
+        descriptor = self.ring.descriptor(offset, len(frame), seq)
+        delivered = True
+        socks = []
+        for peer_port in peer_ports:
+            try:
+                sock = self.connect(peer_port)
+                try:
+                    sock.sendall(descriptor)
+                except Exception:
+                    sock.close()
+                    raise
+                socks.append(sock)
+            except Exception as e:
+                print(f"Failed to send message to {peer_port}: {e}")
+                delivered = False
+                self.ring.release(offset)
+        if socks:
+            threading.Thread(target=self.collect_acks, args=(socks, self.ring, offset), daemon=True).start()
+        return delivered
+
+    def collect_acks(self, socks, ring, offset):
+        # ACK 가 오거나 연결이 끊겼을 때만 그 피어 몫의 자리를 돌려줌
+        # 받는 쪽이 accept 대기열에 오래 묶여 있어도 아직 읽지 않은 자리이므로 timeout 으로 풀지 않음
+        for sock in socks:
+            try:
+                sock.settimeout(self.timeout)
+                while True:
+                    try:
+                        sock.recv(1)
+                        break
+                    except socket.timeout:
+                        if self.ring is not ring:
+                            break  # stop() 이 링을 닫음
+            except OSError:
+                pass
+            finally:
+                sock.close()
+                ring.release(offset)
+
+    def send_data(self, peer_port, data):
+        if self.netem is not None:
+            when = self.netem.plan(self.peer.port, peer_port, len(data), time.time())
+            if when is not None:
+                self.delayer.schedule(when, self.deliver_data, peer_port, data)
+            return True
+        return self.deliver_data(peer_port, data)
+
+    def deliver_data(self, peer_port, data):
+        try:
+            sock = self.connect(peer_port)
+            try:
+                sock.sendall(data)
+            finally:
+                sock.close()
+            return True
         except Exception as e:
             print(f"Failed to send message to port {peer_port}: {e}")
+            return False
 
     def broadcast_message(self, message):
-        for peer_id, peer_port in self.peer.peers.items():
-            self.send_message(peer_port, message)
+        self.multicast_message(list(self.peer.peers.values()), message)
+
+    def multicast_message(self, peer_ports, message):
+        # 같은 압축 방식을 쓰는 대상끼리는 한 번만 인코딩해서 같은 바이트를 보냄
+        # 공유 메모리로 보낼 대상은 모아 두었다가 링에 한 번만 씀
+        encoded = {}
+        shared = {}
+        for peer_port in peer_ports:
+            method = self.codec.choose(self.accepts.get(peer_port))
+            if method not in encoded:
+                encoded[method] = pack_message(message, self.codec, self.accepts.get(peer_port))
+            if self.use_shm(peer_port, encoded[method]):
+                shared.setdefault(method, []).append(peer_port)
+            else:
+                self.send_data(peer_port, encoded[method])
+        for method, ports in shared.items():
+            self.deliver_shared(ports, encoded[method])
+
+    def request(self, peer_port, message):
+        try:
+            sock = self.connect(peer_port)
+            try:
+                sock.sendall(pack_message(message, self.codec, self.accepts.get(peer_port)))
+                return read_message(sock, self.codec)
+            finally:
+                sock.close()
+        except Exception as e:
+            print(f"Request to port {peer_port} failed: {e}")
+            return None
+
+    def reply(self, client_socket, message):
+        client_socket.sendall(pack_message(message, self.codec))
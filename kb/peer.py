@@ -1,4 +1,3 @@
-import threading
 from kb.block import Block, BlockChain
 from kb.network import Network
 
@@ -20,8 +19,7 @@ class Peer:
             self.blockchain = BlockChain()  # 프라이머리노드만 제네시스블록을 생성
 
         self.network = Network(self)
-        self.server_thread = threading.Thread(target=self.network.run_server)
-        self.server_thread.start()
+        self.network.start()
     
     def update_primary(self):
         self.primary_id = self.view % self.total_peers
@@ -91,7 +89,7 @@ class Peer:
                 'prev_hash': genesis_block.prev_hash
             }
             message = {'type': 'send_genesis', 'genesis_block': genesis_block_data}
-            client_socket.send(pickle.dumps(message))
+            self.network.reply(client_socket, message)
             print("Sent genesis block to requesting peer")
 
     def receive_genesis_block(self, genesis_block_data):
@@ -0,0 +1,184 @@
+import collections
+import threading
+from kb.codec import Codec
+from kb.mempool import tx_digest
+
+class LRUCache:
+    def __init__(self, capacity=1024):
+        self.capacity = capacity
+        self.items = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, loader):
+        with self.lock:
+            if key in self.items:
+                self.items.move_to_end(key)
+                self.hits += 1
+                return self.items[key]
+            self.misses += 1
+        value = loader(key)
+        with self.lock:
+            self.items[key] = value
+            self.items.move_to_end(key)
+            while len(self.items) > self.capacity:
+                self.items.popitem(last=False)
+        return value
+
+    def invalidate(self, key):
+        with self.lock:
+            self.items.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+class RemoteSubscriber:
+    # 다른 프로세스의 헤더 구독자, 알림은 큐에 넣기만 하고 보내기는 별도 스레드가 함 (느린 구독자가 합의를 막지 않음)
+    # 큐가 차면 오래된 헤더부터 버리고(구독자는 scan_blocks 로 빈 곳을 메움), 연속으로 max_failures 번 못 보내면 끊음
+    def __init__(self, send, max_queue=1024, max_failures=3, threaded=True):
+        self.send = send
+        self.max_queue = max_queue
+        self.max_failures = max_failures
+        self.queue = collections.deque()
+        self.cond = threading.Condition()
+        self.failures = 0
+        self.dropped = 0
+        self.closed = False
+        self.threaded = threaded
+        if threaded:
+            threading.Thread(target=self.run, daemon=True).start()
+
+    def __call__(self, header):
+        if self.closed:
+            raise ConnectionError("subscriber is gone")  # BlockStore 가 구독 목록에서 뺌
+        if not self.threaded:
+            self.deliver(header)  # 시뮬레이션 전송 계층은 보내기가 막히지 않음
+            return
+        with self.cond:
+            if len(self.queue) >= self.max_queue:
+                self.queue.popleft()
+                self.dropped += 1
+            self.queue.append(header)
+            self.cond.notify()
+
+    def run(self):
+        while True:
+            with self.cond:
+                while not self.queue and not self.closed:
+                    self.cond.wait()
+                if self.closed:
+                    return
+                header = self.queue.popleft()
+            self.deliver(header)
+
+    def deliver(self, header):
+        if self.send(header):
+            self.failures = 0
+            return
+        self.failures += 1
+        if self.failures >= self.max_failures:
+            self.close()
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.queue.clear()
+            self.cond.notify()
+
+class BlockStore:
+    # 실행된 블록을 높이 순서로 인코딩해 보관하고 해시/트랜잭션 id 색인을 유지함
+    # 읽기는 디코딩된 블록의 LRU 캐시를 거침
+    def __init__(self, codec=None, cache_size=1024):
+        self.codec = codec or Codec()
+        self.accepts = self.codec.supported()
+        self.encoded = []
+        self.by_hash = {}
+        self.txs = {}
+        self.cache = LRUCache(cache_size)
+        self.subscribers = []
+        self.lock = threading.Lock()
+
+    def height(self):
+        return len(self.encoded)
+
+    def reset(self):
+        with self.lock:
+            self.encoded = []
+            self.by_hash = {}
+            self.txs = {}
+        self.cache.clear()
+
+    def append(self, block, txs=()):
+        with self.lock:
+            height = len(self.encoded)
+            self.encoded.append(self.codec.encode(block, self.accepts))
+            self.by_hash[block.hash] = height
+            for position, tx in enumerate(txs):
+                self.txs[tx_digest(tx)] = (height, position, tx)
+        header = {'index': block.index, 'height': height, 'timestamp': block.timestamp,
+                  'prev_hash': block.prev_hash, 'hash': block.hash}
+        for callback in list(self.subscribers):
+            try:
+                callback(header)
+            except Exception as e:
+                print(f"Exception: {e}")
+                self.subscribers.remove(callback)
+        return height
+
+    def replace(self, height, block):
+        # 가지치기로 본문이 지워진 블록을 헤더로 바꿔 저장
+        with self.lock:
+            self.encoded[height] = self.codec.encode(block, self.accepts)
+        self.cache.invalidate(height)
+
+    def decode(self, height):
+        with self.lock:
+            data = self.encoded[height]
+        return self.codec.decode(data)
+
+    def get_block(self, height):
+        if height < 0 or height >= len(self.encoded):
+            return None
+        return self.cache.get(height, self.decode)
+
+    def get_block_by_hash(self, block_hash):
+        height = self.by_hash.get(block_hash)
+        return self.get_block(height) if height is not None else None
+
+    def scan(self, start=0, limit=100):
+        # 높이 start 부터 최대 limit 개, 다음 페이지 커서(없으면 None)도 돌려줌
+        end = min(start + limit, len(self.encoded))
+        blocks = [self.get_block(height) for height in range(max(start, 0), end)]
+        return blocks, end if end < len(self.encoded) else None
+
+    def get_transaction(self, txid):
+        entry = self.txs.get(txid)
+        if entry is None:
+            return None
+        height, position, tx = entry
+        return {'height': height, 'position': position, 'tx': tx}
+
+    def latest_header(self):
+        block = self.get_block(len(self.encoded) - 1)
+        if block is None:
+            return None
+        return {'index': block.index, 'height': len(self.encoded) - 1, 'timestamp': block.timestamp,
+                'prev_hash': block.prev_hash, 'hash': block.hash}
+
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self.subscribers:
+            self.subscribers.remove(callback)
+
+    def stats(self):
+        return {'height': len(self.encoded), 'cache_size': len(self.cache.items),
+                'cache_hits': self.cache.hits, 'cache_misses': self.cache.misses,
+                'cache_hit_rate': self.cache.hit_rate()}
@@ -0,0 +1,18 @@
+class QuorumConfig:
+    # 멤버십이 정해질 때 한 번만 계산하는 정족수와 복제본 id -> 비트 위치
+    # 투표는 복제본마다 비트 하나인 정수 비트맵으로 모으고 bit_count 로 셈
+    # 비트 위치는 정렬된 id 순서라서 멤버십이 바뀌면 진행 중인 비트맵은 새로 모아야 함
+    def __init__(self, members):
+        self.members = sorted(members)
+        self.n = len(self.members)
+        self.f = (self.n - 1) // 3
+        self.prepare = 2 * self.f  # 주 노드의 preprepare 와 함께 prepared (자기 prepare 포함)
+        self.commit = 2 * self.f + 1  # 자기 commit 포함
+        self.available = self.f + 1  # 배치 가용성: 정직한 복제본 하나는 갖고 있음
+        self.bits = {member: 1 << i for i, member in enumerate(self.members)}
+
+    def bit(self, peer_id):
+        return self.bits.get(peer_id, 0)
+
+    def voters(self, bitmap):
+        return [member for member, bit in self.bits.items() if bitmap & bit]
@@ -0,0 +1,83 @@
+import collections
+import contextlib
+import os
+import sys
+import threading
+import time
+
+class SamplingProfiler:
+    # 켜져 있는 동안 interval 마다 메시지를 처리 중인 스레드의 스택을 찍어 자주 보이는 위치를 셈
+    # 계측 코드를 심지 않으므로 꺼져 있을 때 비용이 없고, 켜져 있어도 sampling() 진입/탈출 비용만 듦
+    def __init__(self, interval=0.005, depth=8):
+        self.interval = interval
+        self.depth = depth
+        self.active = collections.Counter()  # 스레드 id -> 처리 중인 호출 수
+        self.counts = collections.Counter()
+        self.samples = 0
+        self.lock = threading.Lock()
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    @contextlib.contextmanager
+    def sampling(self):
+        ident = threading.get_ident()
+        with self.lock:
+            self.active[ident] += 1
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.active[ident] -= 1
+                if not self.active[ident]:
+                    del self.active[ident]
+
+    def wrap(self, fn):
+        def wrapped(*args):
+            with self.sampling():
+                return fn(*args)
+        return wrapped
+
+    def run(self):
+        while self.running:
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self.lock:
+                idents = list(self.active)
+            for ident in idents:
+                frame = frames.get(ident)
+                stack = []
+                while frame is not None and len(stack) < self.depth:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{frame.f_lineno} {code.co_name}")
+                    frame = frame.f_back
+                if stack:
+                    with self.lock:
+                        self.counts[tuple(stack)] += 1
+                        self.samples += 1
+
+    def top(self, limit=20):
+        # 가장 자주 찍힌 스택 (맨 앞이 실행 중이던 위치)
+        with self.lock:
+            samples = self.samples
+            common = self.counts.most_common(limit)
+        return [{'count': count, 'share': count / samples, 'stack': list(stack)} for stack, count in common]
+
+    def hot_spots(self, limit=20):
+        # 스택 맨 앞 함수만 모아 본 자체 시간 비율
+        leaves = collections.Counter()
+        with self.lock:
+            samples = self.samples
+            for stack, count in self.counts.items():
+                leaves[stack[0]] += count
+        return [{'location': location, 'count': count, 'share': count / samples} for location, count in leaves.most_common(limit)]
@@ -0,0 +1,163 @@
+import heapq
+import pickle
+import random
+from kb.codec import Codec
+from kb.dedup import HEADER, pack_header
+
+class VirtualClock:
+    def __init__(self, start=0.0):
+        self.now = start
+
+    def time(self):
+        return self.now
+
+class SimNetwork:
+    # 한 프로세스 안에서 수백 개의 피어를 돌리는 이벤트 기반 가상 네트워크
+    # 같은 seed 면 같은 이벤트 순서가 나오므로 실행 결과를 재현할 수 있음
+    def __init__(self, seed=0, latency=0.001, jitter=0.0, netem=None):
+        self.clock = VirtualClock()
+        self.random = random.Random(seed)
+        self.latency = latency
+        self.jitter = jitter
+        # netem(kb.netem.NetEm) 이 있으면 latency/jitter 대신 링크 모델로 도착 시각을 정함
+        self.netem = netem
+        self.nodes = {}
+        self.events = []
+        self.seq = 0
+        self.sent = 0
+        self.delivered = 0
+        self.bytes_sent = 0
+        self.bytes_by_src = {}
+
+    def transport(self, peer):
+        return SimTransport(self, peer)
+
+    def schedule(self, delay, fn, *args):
+        self.seq += 1
+        heapq.heappush(self.events, (self.clock.now + delay, self.seq, fn, args))
+
+    def link_delay(self, src, dst, size):
+        if self.jitter:
+            return self.latency + self.random.uniform(0, self.jitter)
+        return self.latency
+
+    def send(self, src, dst, data, reply_to=None):
+        node = self.nodes.get(dst)
+        if node is None or not node.running:
+            return False
+        if src in self.nodes and not self.nodes[src].running:
+            return False  # 멈춘 노드에 남아 있던 타이머가 보내는 메시지
+        self.sent += 1
+        self.bytes_sent += len(data)
+        self.bytes_by_src[src] = self.bytes_by_src.get(src, 0) + len(data)
+        if self.netem is not None:
+            when = self.netem.plan(src, dst, len(data), self.clock.now)
+            if when is None:
+                return True  # 링크에서 손실됨, 보낸 쪽은 알 수 없음
+            delay = when - self.clock.now
+        else:
+            delay = self.link_delay(src, dst, len(data))
+        self.schedule(delay, self.deliver, dst, data, reply_to)
+        return True
+
+    def deliver(self, dst, data, reply_to):
+        node = self.nodes.get(dst)
+        if node is None or not node.running:
+            return
+        self.delivered += 1
+        if node.admit is not None and not node.admit(data):
+            return
+        # 수신 측마다 따로 역직렬화해서 피어끼리 객체를 공유하지 않게 함
+        message = node.codec.decode(memoryview(data)[HEADER.size:])
+        if node.on_received is not None:
+            node.on_received(message, self.clock.now)
+        node.peer.handle_message(message, reply_to)
+
+    def run(self, until=None, max_events=None):
+        count = 0
+        while self.events:
+            if until is not None and self.events[0][0] > until:
+                self.clock.now = until
+                break
+            if max_events is not None and count >= max_events:
+                break
+            when, _, fn, args = heapq.heappop(self.events)
+            self.clock.now = when
+            fn(*args)
+            count += 1
+        return count
+
+    def build_cluster(self, peer_cls, n, base_port=5000):
+        # connect_peer 핸드셰이크 없이 n 개의 피어를 서로 연결하고 제네시스 블록을 공유함
+        peers = [peer_cls(i, base_port + i, transport=self.transport) for i in range(n)]
+        genesis = pickle.dumps(peers[0].blockchain)
+        for peer in peers:
+            peer.peers = {other.id: other.port for other in peers if other is not peer}
+            peer.network.accepts = {other.port: other.network.codec.supported() for other in peers if other is not peer}
+            peer.total_peers = n
+            peer.update_primary()
+            peer.blockchain = pickle.loads(genesis)
+        return peers
+
+    def stats(self):
+        return {
+            'time': self.clock.now,
+            'sent': self.sent,
+            'delivered': self.delivered,
+            'bytes_sent': self.bytes_sent,
+            'pending': len(self.events),
+        }
+
+class SimTransport:
+    # Network 와 같은 인터페이스, 주소로는 피어의 포트 번호를 그대로 씀
+    threaded = False
+
+    def __init__(self, sim, peer, codec=None):
+        self.sim = sim
+        self.peer = peer
+        self.admit = getattr(peer, 'admit_frame', None)
+        self.on_received = getattr(peer, 'trace_received', None)
+        self.address = peer.port
+        self.running = False
+        self.codec = codec or Codec()
+        self.accepts = {}
+
+    def now(self):
+        return self.sim.clock.now
+
+    def call_later(self, delay, fn, *args):
+        self.sim.schedule(delay, fn, *args)
+
+    def start(self):
+        self.running = True
+        self.sim.nodes[self.address] = self
+
+    def stop(self):
+        self.running = False
+
+    def encode(self, peer_port, message):
+        return pack_header(message) + self.codec.encode(message, self.accepts.get(peer_port))
+
+    def send_message(self, peer_port, message):
+        return self.sim.send(self.address, peer_port, self.encode(peer_port, message))
+
+    def broadcast_message(self, message):
+        self.multicast_message(list(self.peer.peers.values()), message)
+
+    def multicast_message(self, peer_ports, message):
+        encoded = {}
+        for peer_port in peer_ports:
+            method = self.codec.choose(self.accepts.get(peer_port))
+            if method not in encoded:
+                encoded[method] = self.encode(peer_port, message)
+            if not self.sim.send(self.address, peer_port, encoded[method]):
+                self.peer.log(f"Failed to send message to port {peer_port}")
+
+    def request(self, peer_port, message):
+        # 응답은 reply() 를 통해 일반 메시지로 나중에 도착함
+        self.sim.send(self.address, peer_port, self.encode(peer_port, message), reply_to=self.address)
+        return None
+
+    def reply(self, client_socket, message):
+        if client_socket is not None:
+            self.sim.send(self.address, client_socket, self.encode(client_socket, message))
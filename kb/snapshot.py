@@ -0,0 +1,50 @@
+import hashlib
+
+class DataLogState:
+    # 가장 단순한 애플리케이션 상태: 적용한 블록 본문들의 누적 해시
+    # 다른 상태 기계도 apply / state_hash / dump / restore 만 있으면 Peer.state 로 쓸 수 있음
+    def __init__(self):
+        self.digest = '0'
+        self.applied = 0
+
+    def apply(self, block, ops=()):
+        self.digest = hashlib.sha256((self.digest + str(block.data)).encode()).hexdigest()
+        self.applied += 1
+
+    def state_hash(self):
+        return self.digest
+
+    def dump(self):
+        return {'digest': self.digest, 'applied': self.applied}
+
+    def restore(self, data):
+        self.digest = data['digest']
+        self.applied = data['applied']
+
+class Snapshot:
+    # 높이 height 까지 적용한 상태, 복제본들은 digest 에 대해 checkpoint 투표를 함
+    def __init__(self, height, block_hash, state, state_hash):
+        self.height = height
+        self.block_hash = block_hash
+        self.state = state
+        self.state_hash = state_hash
+        self.digest = hashlib.sha256(f"{height}:{block_hash}:{state_hash}".encode()).hexdigest()
+
+class CheckpointVotes:
+    # (높이, 스냅샷 해시) 마다 투표한 복제본을 모으고 정족수가 되면 안정 체크포인트로 봄
+    def __init__(self):
+        self.votes = {}
+        self.stable_height = 0
+
+    def add(self, height, digest, peer_id, quorum):
+        if height <= self.stable_height:
+            return None
+        voters = self.votes.setdefault((height, digest), set())
+        voters.add(peer_id)
+        if len(voters) >= quorum:
+            self.stable_height = height
+            for key in [key for key in self.votes if key[0] <= height]:
+                if key != (height, digest):
+                    del self.votes[key]
+            return sorted(self.votes.pop((height, digest)))
+        return None
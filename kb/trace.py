@@ -0,0 +1,55 @@
+import collections
+import os
+import threading
+
+def new_trace_id():
+    return os.urandom(8).hex()
+
+class Tracer:
+    # 노드 하나의 span 기록, 최근 capacity 개만 링 버퍼에 남김
+    # span: {'trace', 'node', 'event', 'time', ...} , event 는 proposed/received/decoded/prepare_quorum/commit_quorum/appended
+    def __init__(self, node, clock, capacity=4096):
+        self.node = node
+        self.clock = clock
+        self.spans = collections.deque(maxlen=capacity)
+        self.lock = threading.Lock()
+
+    def record(self, trace, event, at=None, **fields):
+        if trace is None:
+            return
+        span = {'trace': trace, 'node': self.node, 'event': event, 'time': self.clock() if at is None else at}
+        span.update(fields)
+        with self.lock:
+            self.spans.append(span)
+
+    def export(self):
+        with self.lock:
+            return list(self.spans)
+
+    def clear(self):
+        with self.lock:
+            self.spans.clear()
+
+def merge(*exports):
+    # 여러 노드의 export() 결과를 시간 순 하나의 타임라인으로 합침 (노드 시계가 맞춰져 있다고 가정)
+    return sorted((span for spans in exports for span in spans), key=lambda span: (span['time'], str(span['node'])))
+
+def timeline(spans, trace):
+    # 한 제안(trace)의 span 들을 첫 span 기준 경과 시간과 함께 돌려줌
+    rows = [span for span in spans if span['trace'] == trace]
+    if not rows:
+        return []
+    start = rows[0]['time']
+    return [dict(span, offset=span['time'] - start) for span in rows]
+
+def phase_times(spans, trace, event):
+    # 노드마다 event 에 처음 도달한 시각 (제안 시각 기준), 가장 늦은 노드가 그 단계를 붙잡은 복제본
+    rows = timeline(spans, trace)
+    if not rows:
+        return {}
+    start = next((span['time'] for span in rows if span['event'] == 'proposed'), rows[0]['time'])
+    times = {}
+    for span in rows:
+        if span['event'] == event and span['node'] not in times:
+            times[span['node']] = span['time'] - start
+    return times
@@ -0,0 +1,137 @@
+import hashlib
+import os
+import struct
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from kb.codec import Codec
+
+def calc_hash(index, data, timestamp, prev_hash):
+    # Block.calHash 와 같은 규칙
+    return hashlib.sha256(str(index).encode()
+                          + str(data).encode()
+                          + str(timestamp).encode()
+                          + str(prev_hash).encode()
+                          ).hexdigest()
+
+def block_row(block):
+    return (block.index, block.data, block.timestamp, block.prev_hash, block.hash, getattr(block, 'pruned', False))
+
+def verify_range(rows):
+    # 구간 안의 블록 해시와 구간 내부 연결만 검사, 경계 연결은 호출한 쪽에서 검사함
+    # 본문이 지워진 블록(pruned)은 해시를 다시 계산할 수 없으므로 연결만 검사함
+    prev = None
+    for index, data, timestamp, prev_hash, block_hash, pruned in rows:
+        if not pruned and calc_hash(index, data, timestamp, prev_hash) != block_hash:
+            return False
+        if prev is not None and prev_hash != prev:
+            return False
+        prev = block_hash
+    return True
+
+def frame_offsets(path):
+    # write_blocks 로 저장한 파일에서 본문은 건너뛰고 길이 필드만 따라가며 블록마다 시작 위치를 구함
+    offsets = []
+    with open(path, 'rb') as f:
+        position = 0
+        while True:
+            head = f.read(4)
+            if len(head) < 4:
+                break
+            offsets.append(position)
+            position += 4 + struct.unpack('!I', head)[0]
+            f.seek(position)
+    return offsets, position
+
+def read_range(path, start, end, codec):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    blocks = []
+    position = 0
+    while position < len(data):
+        (size,) = struct.unpack_from('!I', data, position)
+        blocks.append(codec.decode(data[position + 4:position + 4 + size]))
+        position += 4 + size
+    return blocks
+
+def verify_file_range(path, start, end, codec):
+    # worker 가 자기 구간의 바이트만 파일에서 읽어 검사함, 구간 경계 검사용으로 첫 prev_hash 와 마지막 hash 를 돌려줌
+    rows = [block_row(block) for block in read_range(path, start, end, codec)]
+    return verify_range(rows), rows[0][3], rows[-1][4]
+
+class ChainVerifier:
+    # 체인을 구간으로 나눠 여러 프로세스(또는 스레드)에서 해시를 다시 계산함
+    # 풀을 재사용하려면 객체를 한 번 만들어 두고 verify 를 여러 번 호출
+    def __init__(self, workers=None, mode='process', chunks_per_worker=4):
+        if mode not in ('process', 'thread'):
+            raise ValueError(f"unknown verifier mode: {mode}")
+        self.workers = workers or os.cpu_count() or 1
+        self.mode = mode
+        self.chunks_per_worker = chunks_per_worker
+        self.executor = None
+
+    def pool(self):
+        if self.executor is None:
+            if self.mode == 'process':
+                self.executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self.executor = ThreadPoolExecutor(max_workers=self.workers)
+        return self.executor
+
+    def split(self, count):
+        chunks = max(1, min(count, self.workers * self.chunks_per_worker))
+        size = -(-count // chunks)
+        return [(start, min(start + size, count)) for start in range(0, count, size)]
+
+    def verify(self, chain):
+        # BlockChain.isValid 와 마찬가지로 제네시스 블록(0번)은 해시를 검사하지 않음
+        if len(chain) <= 1:
+            return True
+        rows = [block_row(block) for block in chain[1:]]
+        ranges = self.split(len(rows))
+        if len(ranges) == 1 or self.workers == 1:
+            results = [verify_range(rows)]
+        else:
+            results = self.pool().map(verify_range, [rows[start:end] for start, end in ranges])
+        if not all(results):
+            return False
+        # 구간 경계: 각 구간의 첫 블록이 바로 앞 블록을 가리키는지 확인
+        for start, _ in ranges:
+            prev_hash = chain[start].hash
+            if rows[start][3] != prev_hash:
+                return False
+        return True
+
+    def verify_file(self, path, codec=None):
+        # 저장된 체인(BlockChain.save)을 검증함: 블록을 worker 로 피클링해 보내지 않고 파일 위치 구간만 넘김
+        codec = codec or Codec()
+        offsets, end = frame_offsets(path)
+        if len(offsets) <= 1:
+            return True
+        genesis = read_range(path, offsets[0], offsets[1], codec)[0]
+        bounds = offsets[1:] + [end]
+        ranges = self.split(len(bounds) - 1)
+        starts = [bounds[start] for start, _ in ranges]
+        ends = [bounds[stop] for _, stop in ranges]
+        if len(ranges) == 1 or self.workers == 1:
+            results = [verify_file_range(path, bounds[0], end, codec)]
+        else:
+            count = len(ranges)
+            results = self.pool().map(verify_file_range, [path] * count, starts, ends, [codec] * count)
+        prev = genesis.hash
+        for ok, first_prev, last in results:
+            if not ok or first_prev != prev:
+                return False
+            prev = last
+        return True
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+def verify_chain(chain, workers=None, mode='process'):
+    verifier = ChainVerifier(workers, mode)
+    try:
+        return verifier.verify(chain)
+    finally:
+        verifier.close()
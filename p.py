@@ -1,8 +1,28 @@
+import collections
+import functools
 import hashlib
+import math
+import sys
 import time
-import socket
-import threading
-import pickle
+from kb.actor import Actor
+from kb.admission import AdmissionControl
+from kb.availability import BatchStore, batch_digest
+from kb.batcher import AdaptiveBatcher
+from kb.codec import Codec, read_blocks, write_blocks
+from kb.dedup import CHECKPOINT, OTHER, SeenCache, frame_digest, unpack_header
+from kb.dissem import relay_order, relay_children
+from kb.failure import FailureDetector
+from kb.kvstore import KVStore
+from kb.membership import Membership
+from kb.mempool import Mempool, tx_digest, valid_tx
+from kb.metrics import Metrics
+from kb.network import Network
+from kb.query import BlockStore, RemoteSubscriber
+from kb.quorum import QuorumConfig
+from kb.sampler import SamplingProfiler
+from kb.snapshot import CheckpointVotes, Snapshot
+from kb.trace import Tracer, new_trace_id
+from kb.verify import block_row, verify_range
 
 class Block:
     def __init__(self, index, timestamp, data, prev_hash='0'):
@@ -22,9 +42,34 @@ class Block:
     def __str__(self):
         return f"Block(index: {self.index}, timestamp: {self.timestamp}, data: {self.data}, prev_hash: {self.prev_hash}, hash: {self.hash})"
 
+class BlockRef:
+    # prepare/commit 메시지에 싣는 블록 요약, 본문 없이 번호/타임스탬프/해시만 보냄
+    def __init__(self, block):
+        self.index = block.index
+        self.timestamp = block.timestamp
+        self.hash = block.hash
+
+class BlockHeader:
+    # 가지치기(prune)로 본문을 지운 블록, 해시와 연결 정보만 남음
+    pruned = True
+
+    def __init__(self, block):
+        self.index = block.index
+        self.timestamp = block.timestamp
+        self.data = None
+        self.prev_hash = block.prev_hash
+        self.hash = block.hash
+
+    def calHash(self):
+        return self.hash  # 본문이 없어 다시 계산할 수 없음, 연결(prev_hash)만 검증 대상
+
+    def __str__(self):
+        return f"BlockHeader(index: {self.index}, timestamp: {self.timestamp}, prev_hash: {self.prev_hash}, hash: {self.hash})"
+
 class BlockChain:
     def __init__(self, genesis_block=None):
         self.chain = []
+        self.pruned_height = 1  # 이 높이 아래(제네시스 제외)의 블록은 헤더만 남아 있음
         if genesis_block:
             self.chain.append(genesis_block)
         else:
@@ -39,7 +84,10 @@ class BlockChain:
         nBlock.hash = nBlock.calHash()
         self.chain.append(nBlock)
     
-    def isValid(self):
+    def isValid(self, verifier=None):
+        # verifier(kb.verify.ChainVerifier) 를 넘기면 여러 코어에서 나눠 검증함
+        if verifier is not None:
+            return verifier.verify(self.chain)
         for i in range(1, len(self.chain)):
             if self.chain[i].hash != self.chain[i].calHash():
                 return False
@@ -47,151 +95,1001 @@ class BlockChain:
                 return False
         return True
     
+    def prune(self, horizon):
+        # horizon 보다 낮은 블록의 본문을 지움, 제네시스 블록은 동기화에 쓰이므로 남김
+        for i in range(self.pruned_height, min(horizon, len(self.chain))):
+            self.chain[i] = BlockHeader(self.chain[i])
+        self.pruned_height = max(self.pruned_height, min(horizon, len(self.chain)))
+
+    def headers(self, end):
+        return [self.chain[0]] + [block if getattr(block, 'pruned', False) else BlockHeader(block)
+                                  for block in self.chain[1:end]]
+
+    def save(self, path, codec=None):
+        write_blocks(path, self.chain, codec or Codec())
+
+    @classmethod
+    def load(cls, path, codec=None):
+        blocks = read_blocks(path, codec or Codec())
+        blockchain = cls(blocks[0])
+        blockchain.chain.extend(blocks[1:])
+        return blockchain
+
     def __str__(self):
         return '\n'.join([str(block) for block in self.chain])
 
 class Peer:
-    def __init__(self, id, port):
+    def __init__(self, id, port, transport=Network, instance=0, inbox_size=1024, seen_size=65536, trace_capacity=4096):
         self.id = id
         self.port = port
+        self.instance = instance  # 병렬 PBFT 인스턴스 번호 (kb.multi), 주 노드를 인스턴스마다 돌려가며 맡음
         self.peers = {}
         self.blockchain = None
         self.preprepare_msgs = {}
-        self.prepare_msgs = {}
-        self.commit_msgs = {}
+        self.prepare_msgs = {}  # 블록 timestamp -> prepare 투표 비트맵 (kb.quorum)
+        self.commit_msgs = {}  # 블록 timestamp -> commit 투표 비트맵
         self.committed_blocks = set()  # 추가된 블록을 추적하기 위한 집합
         self.commitflag = False
         self.view = 0
         self.total_peers = 1 
-        self.primary_id = self.view % self.total_peers
-        self.server_running = True  # 서버 실행 플래그
+        self.primary_id = (self.view + self.instance) % self.total_peers
+        self.quorum = QuorumConfig([self.id])
+        self.membership = None  # 정적 멤버십으로 시작했으면 kb.membership.Membership
+        self.keys = {}  # 복제본 id -> 멤버십 파일의 공개 키
+        # 구성 변경은 합의된 블록으로 순서가 정해지고 다음 에포크 경계 높이에서 모든 복제본이 함께 적용함
+        self.epoch_length = 10  # 에포크 경계: 이 높이의 배수
+        self.pending_config = None  # (적용 높이, 다음 Membership)
+        self.retired = False  # 구성에서 빠진 복제본은 더 이상 합의에 참여하지 않음
+        self.catching_up = False  # 새로 들어온 복제본이 백그라운드로 스냅샷을 받아오는 중
+        self.catch_up_interval = 0.5
+        self.catch_up_round = 0
+        # 돌아가며 제안: None 이면 주 노드 하나가 계속 제안, 'block' 은 블록마다, 'epoch' 은 에포크마다 제안자가 바뀜
+        self.rotation = None
+        self.max_pipeline = 4  # 커밋을 기다리는 동안 앞서 제안할 수 있는 슬롯 수
+        self.slot_timeout = 0.2  # 기다리는 슬롯이 이 시간 안에 제안되거나 커밋되지 않으면 그 슬롯의 라운드를 바꿈
+        self.next_slot = 0  # 아직 제안을 보지 못한 가장 낮은 슬롯 (블록 높이)
+        self.slots = {}  # 슬롯 -> 이 복제본이 prepare 한 블록 timestamp, 슬롯마다 (라운드마다) 하나만 투표함
+        # 슬롯별 라운드: 제안자가 멈추면 슬롯 하나만 view change 하듯 다음 복제본에게 넘김
+        self.slot_rounds = {}  # 슬롯 -> 지금 라운드 (없으면 0)
+        self.slot_changing = {}  # 슬롯 -> 바꾸자고 알린 라운드
+        self.slot_round_votes = {}  # (슬롯, 라운드) -> slot_round 투표 비트맵
+        self.slot_round_reports = {}  # (슬롯, 라운드) -> {복제본 id: 그 슬롯에서 준비됐거나 투표한 블록}
+        self.round_proofs = {}  # 슬롯 -> (라운드, 증거), 새 라운드의 preprepare 에 실어 라운드 변경을 놓친 복제본도 따라오게 함
+        self.block_rounds = {}  # 블록 timestamp -> 그 블록에 투표한 라운드
+        self.commit_buffer = {}  # 앞 슬롯보다 먼저 커밋된 블록, 순서대로 체인에 붙임
+        self.passed_over = set()  # view change 를 이미 거친 의심받는 제안자, 이후 그 차례는 슬롯 라운드로 넘김
+        self.demand = 0  # 트랜잭션을 가진 복제본들의 차례 중 가장 늦은 슬롯, 그 전까지는 빈 슬롯도 채움
+        self.slot_timers = set()
+        self.queued_configs = []  # 자기 슬롯이 올 때 제안할 구성 변경
+        self.last_timestamp = 0.0  # 제안했거나 받은 블록 timestamp 중 가장 늦은 것
+        # 장애 감지: enable_failure_detection 으로 켬, 주 노드가 조용해지면 view change 를 시작함
+        self.detector = None
+        self.view_votes = {}  # 새 view -> view_change 투표 비트맵
+        self.prepared = {}  # 블록 timestamp -> (준비된 view, prepare 인증서: 제안자와 prepare 를 보낸 복제본 비트맵)
+        self.view_reports = {}  # 새 view -> {복제본 id: 보고한 준비된 블록 목록}, 2f+1 개 모이면 새 view 의 증거가 됨
+        self.view_proof = {}  # 지금 view 의 증거, 뒤처진 복제본에게 new_view 로 보내 따라오게 함
+        self.lagging = {}  # 복제본 id -> 옛 view 메시지를 받고 new_view 를 보낸 시각
+        self.view_changing = None  # view_change 를 보낸 목표 view, 설치되기 전까지 옛 view 의 제안에 투표하지 않음
+        self.view_change_timeout = 0.5  # 새 view 가 이 시간 안에 설치되지 않으면 그 다음 view 로 넘어감 (매번 두 배)
         self.is_byzantine = False  # 비잔틴 노드 플래그
+        self.verbose = True  # 합의 단계 로그 출력 여부 (대규모 시뮬레이션에서는 끔)
+        self.commit_listeners = []  # 블록이 체인에 추가될 때 listener(peer, block) 호출
+        self.pending_commits = set()  # commit 정족수는 모였지만 본문(preprepare)이 아직 안 온 블록
+        self.dissemination = 'broadcast'  # 'tree' 면 preprepare 를 릴레이 트리로 퍼뜨림
+        self.tree_fanout = 2
+        # 투표는 왔는데 본문이 이 시간 안에 오지 않으면 (릴레이하지 않는 위쪽 노드 등) 투표한 복제본이나 제안자에게서 받아옴
+        self.body_timeout = 0.1
+        self.body_sources = {}  # 블록 timestamp -> (BlockRef, 본문을 가진 것으로 보이는 복제본 id 목록)
+        self.proposal_prev = {}  # 블록 높이 -> 제안될 때의 prev_hash, 체인에 붙으며 바뀐 해시를 제안 해시로 되돌릴 때 씀
+        self.batches = BatchStore()  # 미리 퍼뜨려진 트랜잭션 배치, 합의는 배치 해시만 다룸
+        self.mempool = Mempool()  # 아직 블록에 들어가지 않은 트랜잭션
+        self.batcher = None  # enable_adaptive_batching 으로 켬
+        self.admission = None  # enable_admission_control 로 켬, 넘치는 트랜잭션은 합의에 들이지 않고 바로 돌려보냄
+        self.state = KVStore()  # 커밋된 블록을 실행한 애플리케이션 상태 (kb.snapshot.DataLogState 로 바꿀 수 있음)
+        self.unexecuted = collections.deque()  # 커밋됐지만 아직 실행하지 않은 블록
+        self.executed_height = 0
+        self.block_store = BlockStore()  # 조회 API 가 읽는 블록 저장소 (디코딩된 블록 LRU 캐시 포함)
+        self.snapshot_interval = 100  # 이 높이마다 스냅샷을 찍고 checkpoint 투표를 함
+        self.retain = 50  # 안정 스냅샷 아래로 본문을 남겨둘 블록 수
+        self.snapshots = {}
+        self.checkpoints = CheckpointVotes()
+        self.stable_snapshot = None
+        self.stable_certificate = []
 
         if self.id == self.primary_id:
             self.blockchain = BlockChain()
 
-        self.server_thread = threading.Thread(target=self.run_server)
-        self.server_thread.daemon = True
-        self.server_thread.start()
+        # transport(peer) 는 TCP(Network) 또는 시뮬레이션 전송 계층을 돌려줌
+        self.network = transport(self)
+        self.metrics = Metrics()
+        self.seen = SeenCache(seen_size)  # 최근 받은 합의 메시지 다이제스트
+        # 제안마다 trace id 를 붙여 preprepare/prepare/commit 에 싣고, 단계별 시각을 span 으로 남김
+        self.tracer = Tracer(self.id, self.network.now, trace_capacity)
+        self.trace_ids = {}  # 블록 timestamp -> trace id
+        self.profiler = None  # enable_profiling 으로 켬
+        # 합의 상태(prepare_msgs, commit_msgs, committed_blocks, blockchain)는 actor 스레드만 건드림
+        # 시뮬레이션 전송 계층은 이미 단일 스레드라서 actor 없이 바로 처리함
+        self.actor = None
+        if self.network.threaded:
+            # 합의 메시지는 inbox 가 가득 차도 버리지 않고 보낸 연결에 역압을 걺, 나머지는 종류별로 세고 버림
+            self.actor = Actor(self.dispatch, inbox_size, self.metrics, label=lambda message: message['type'],
+                               essential=('preprepare', 'prepare', 'commit', 'view_change', 'new_view'))
+            self.actor.start()
+        self.network.start()
     
+    def log(self, text):
+        if self.verbose:
+            print(text)
+
     def update_primary(self):
-        self.primary_id = self.view % self.total_peers
+        # 멤버십이 바뀔 때만 정족수를 다시 계산함
+        self.quorum = QuorumConfig([self.id] + list(self.peers))
+        # 구성에서 빠진 id 가 있어도 주 노드는 실제 복제본 중에서 고름 (id 가 0..n-1 이면 예전과 같음)
+        self.primary_id = self.primary_of(self.view)
+        if self.detector is not None:
+            self.detector.retain(list(self.peers), self.network.now())
     
+    def primary_of(self, view):
+        members = self.quorum.members
+        return members[(view + self.instance) % len(members)]
+
+    @classmethod
+    def from_membership(cls, membership, id, transport=None, joining=False, shm_threshold=None, **kwargs):
+        # 멤버십 파일(또는 Membership)로 복제본 id 를 띄움, 주소는 파일에 적힌 host:port (또는 Unix 소켓 경로)
+        # joining: 운영 중인 클러스터에 추가되는 복제본, 파일은 자신이 들어간 다음 에포크의 구성
+        # shm_threshold: 이 크기 이상의 프레임은 Unix 소켓 피어에게 공유 메모리로 보냄
+        if isinstance(membership, str):
+            membership = Membership.load(membership)
+        replica = membership.replicas[id]
+        if transport is None:
+            transport = functools.partial(Network, host=replica.get('host', '127.0.0.1'), unix_path=replica.get('unix'),
+                                          shm_threshold=shm_threshold)
+        peer = cls(id, replica['port'], transport=transport, **kwargs)
+        peer.join_membership(membership)
+        if joining:
+            peer.start_catch_up()
+        return peer
+
+    def join_membership(self, membership):
+        # connect_peer 를 n² 번 부르는 대신 파일에 적힌 구성을 그대로 씀, 핸드셰이크 메시지 없음
+        if self.id not in membership.replicas:
+            raise ValueError(f"replica {self.id} is not in the membership")
+        if not membership.check_genesis():
+            raise ValueError("genesis block does not match genesis_hash")
+        genesis = membership.genesis
+        self.blockchain = BlockChain(Block(genesis['index'], genesis['timestamp'], genesis['data'], genesis['prev_hash']))
+        self.apply_membership(membership)
+
+    def apply_membership(self, membership):
+        # 피어 주소, 키, 코덱, 정족수와 주 노드를 멤버십에 맞춤
+        if self.id not in membership.replicas:
+            self.membership = membership
+            self.retired = True
+            self.peers = {}
+            self.catching_up = False
+            print(f"노드 {self.id}이(가) 에포크 {membership.epoch} 구성에서 제외되었습니다.")
+            return
+        old = self.quorum
+        host = membership.replicas[self.id].get('host', '127.0.0.1')
+        self.peers = {id: membership.address(id, host) for id in membership.ids() if id != self.id}
+        self.keys = {id: replica.get('key') for id, replica in membership.replicas.items()}
+        for id, address in self.peers.items():
+            codecs = membership.replicas[id].get('codecs')
+            if codecs is not None:
+                self.network.accepts[address] = codecs
+        self.membership = membership
+        self.total_peers = len(membership.replicas)
+        self.update_primary()
+        # 비트 위치가 바뀌었을 수 있으니 진행 중인 투표를 새 위치로 옮김, 빠진 복제본의 표는 버림
+        for votes in (self.prepare_msgs, self.commit_msgs):
+            for timestamp, bitmap in votes.items():
+                moved = 0
+                for member in old.voters(bitmap):
+                    moved |= self.quorum.bit(member)
+                votes[timestamp] = moved
+        self.metrics.set('epoch', membership.epoch)
+
+    def current_membership(self):
+        # connect_peer 로 구성된 클러스터도 구성 변경을 할 수 있도록 지금 피어들로 멤버십을 만듦
+        if self.membership is None:
+            replicas = [{'id': self.id, 'port': self.port, 'codecs': self.network.codec.supported()}]
+            for id, address in self.peers.items():
+                replica = {'id': id, 'codecs': self.network.accepts.get(address)}
+                if isinstance(address, tuple):
+                    replica['host'], replica['port'] = address
+                elif isinstance(address, str):
+                    replica['unix'], replica['port'] = address, None
+                else:
+                    replica['port'] = address
+                replicas.append(replica)
+            genesis = self.genesis_block_data()
+            self.membership = Membership(replicas, genesis, self.blockchain.chain[0].hash)
+        return self.membership
+
+    def propose_config(self, add=(), remove=()):
+        # 복제본 추가/제거를 구성 블록으로 제안함, 주 노드가 아니면 주 노드에게 넘김
+        # 돌아가며 제안할 때는 넘기지 않고 자기 슬롯이 올 때 제안함
+        # add 는 멤버십 파일의 복제본 항목 (id, host, port, key, codecs)
+        slot = self.proposal_slot()
+        if slot is None and self.rotation is not None:
+            self.queued_configs.append({'add': list(add), 'remove': list(remove)})
+            self.request_turn()
+            return None
+        if slot is None:
+            self.network.send_message(self.peers[self.primary_id], {'type': 'config', 'add': list(add), 'remove': list(remove)})
+            return None
+        epoch = self.pending_config[1].epoch if self.pending_config else self.current_membership().epoch
+        change = {'epoch': epoch + 1, 'add': list(add), 'remove': list(remove)}
+        block = Block(slot, self.proposal_timestamp(), {'config': change})
+        self.propose_block(block)
+        return block
+
+    def track_config(self, block):
+        # 체인에 들어간 구성 블록은 다음 에포크 경계에서 적용하도록 예약함
+        # 그 사이 새 복제본은 스냅샷으로 따라잡고, 기존 구성은 그대로 커밋을 계속함
+        if not isinstance(block.data, dict) or 'config' not in block.data:
+            return
+        change = block.data['config']
+        current = self.pending_config[1] if self.pending_config else self.current_membership()
+        if change['epoch'] != current.epoch + 1:
+            return  # 이미 반영된 구성 (예: 다음 구성 파일로 시작한 새 복제본)
+        # 돌아가며 제안할 때는 이미 제안된 슬롯들이 옛 구성의 제안자로 검증되도록 파이프라인 너머에서 바꿈
+        lookahead = self.max_pipeline if self.rotation is not None else 0
+        effective = ((block.index + lookahead) // self.epoch_length + 1) * self.epoch_length
+        self.pending_config = (effective, current.changed(change['add'], change['remove']))
+        self.metrics.inc('config_changes')
+        self.log(f"에포크 {change['epoch']} 구성 변경이 높이 {effective}부터 적용됩니다.")
+
+    def maybe_switch_config(self):
+        if self.pending_config is None or len(self.blockchain.chain) < self.pending_config[0]:
+            return
+        effective, membership = self.pending_config
+        self.pending_config = None
+        self.apply_membership(membership)
+        self.log(f"높이 {effective}에서 에포크 {membership.epoch} 구성({self.total_peers}개 복제본)으로 바뀌었습니다.")
+
+    def enable_rotation(self, mode='block', max_pipeline=4, slot_timeout=0.2, **targets):
+        # 모든 복제본에서 같은 설정으로 켬: 제안, 배치, 본문 전파 부담이 복제본들에 고르게 나뉨
+        # 클라이언트는 아무 복제본에나 트랜잭션을 보내고, 받은 복제본이 자기 슬롯에서 제안함
+        self.rotation = mode
+        self.max_pipeline = max_pipeline
+        self.slot_timeout = slot_timeout
+        self.next_slot = max(self.next_slot, len(self.blockchain.chain))
+        if self.batcher is None:
+            self.enable_adaptive_batching(max_inflight=max_pipeline, **targets)
+        return self.batcher
+
+    def leader_of(self, slot, round=None, view=None):
+        # 슬롯의 제안자는 정렬된 복제본 id 를 차례로 돎, 모든 복제본이 같은 결과를 얻음
+        # 슬롯의 라운드가 바뀔 때마다 그 다음 복제본이 제안함
+        members = self.quorum.members
+        if self.pending_config is not None and slot >= self.pending_config[0]:
+            members = self.pending_config[1].ids()
+        span = self.epoch_length if self.rotation == 'epoch' else 1
+        if round is None:
+            round = self.slot_rounds.get(slot, 0)
+        view = self.view if view is None else view
+        return members[(slot // span + view + self.instance + round) % len(members)]
+
+    def upcoming_slot(self):
+        if self.blockchain is None:
+            return 0
+        slot = max(self.next_slot, len(self.blockchain.chain))
+        while slot in self.commit_buffer:
+            slot += 1  # 먼저 커밋되어 순서를 기다리는 슬롯
+        return slot
+
+    def proposal_slot(self):
+        # 지금 이 복제본이 제안할 수 있는 블록 높이, 없으면 None
+        if self.blockchain is None:
+            return None
+        if self.rotation is None:
+            return len(self.blockchain.chain) if self.id == self.primary_id else None
+        if self.catching_up:
+            return None  # 새 복제본은 자기 구성의 에포크가 시작되어 합의에 참여할 때부터 제안함
+        slot = self.upcoming_slot()
+        if slot >= len(self.blockchain.chain) + self.max_pipeline or self.leader_of(slot) != self.id:
+            return None
+        return slot
+
+    def proposal_timestamp(self):
+        # 투표를 블록 timestamp 로 구분하므로 같은 순간에 여러 슬롯을 제안해도 겹치지 않게 늘려 줌
+        now = self.network.now()
+        if now <= self.last_timestamp:
+            now = math.nextafter(self.last_timestamp, math.inf)
+        self.last_timestamp = now
+        return now
+
+    def claim_slot(self, block):
+        # 슬롯마다 처음 받은 블록 하나에만 투표함: 정족수가 겹치므로 한 슬롯에 두 블록이 커밋되지 않음
+        slot = block.index
+        if slot < len(self.blockchain.chain) or slot in self.commit_buffer or self.slots.get(slot, block.timestamp) != block.timestamp:
+            return False
+        self.slots[slot] = block.timestamp
+        self.next_slot = max(self.next_slot, slot + 1)
+        self.last_timestamp = max(self.last_timestamp, block.timestamp)
+        # 제안된 트랜잭션은 다음 제안자가 다시 넣지 않도록 바로 빼고 nonce 커서를 올림
+        self.mempool.remove_committed(self.block_transactions(block))
+        return True
+
+    def on_slot_open(self):
+        # 앞 슬롯의 제안을 보거나 커밋이 끝나 슬롯 창이 열렸을 때: 다음 제안자는 커밋을 기다리지 않고 바로 제안함
+        if self.queued_configs and self.proposal_slot() is not None:
+            self.propose_config(**self.queued_configs.pop(0))
+        if self.batcher is not None:
+            self.batcher.poll()
+        slot = self.proposal_slot()
+        if slot is not None and slot < self.demand and not self.mempool.has_ready() and not self.queued_configs:
+            # 제안할 것이 없어도 다른 복제본의 차례가 오도록 빈 블록으로 슬롯을 넘김
+            self.propose_block(Block(slot, self.proposal_timestamp(), []))
+            self.metrics.inc('empty_slots')
+        self.request_turn()
+        # 기다리는 슬롯: 아직 제안을 못 본 슬롯과, 투표했지만 커밋되지 않은 맨 앞 슬롯
+        head = len(self.blockchain.chain)
+        for slot in {head, self.upcoming_slot()}:
+            if slot in self.slot_timers or slot >= head + self.max_pipeline or not (slot < self.demand or slot in self.slots):
+                continue
+            self.slot_timers.add(slot)
+            self.network.call_later(self.slot_timeout, self.submit_local, {'type': 'slot_timeout', 'slot': slot})
+
+    def next_turn(self):
+        # 이 복제본이 제안할 다음 슬롯
+        slot = self.upcoming_slot()
+        span = self.epoch_length if self.rotation == 'epoch' else 1
+        for candidate in range(slot, slot + span * len(self.quorum.members) + 1):
+            if self.leader_of(candidate) == self.id:
+                return candidate
+        return None
+
+    def request_turn(self):
+        # 트랜잭션이 남아 있으면 자기 차례까지 슬롯을 넘겨 달라고 알림, 차례가 바뀔 때만 보냄
+        if not (self.mempool.has_ready() or self.queued_configs) or self.catching_up:
+            return
+        turn = self.next_turn()
+        if turn is not None and turn > self.demand:
+            self.demand = turn
+            self.broadcast_message({'type': 'demand', 'slot': turn, 'peer_id': self.id})
+
+    def handle_demand(self, slot):
+        if slot > self.demand:
+            self.demand = slot
+            self.on_slot_open()
+
+    def handle_slot_timeout(self, slot):
+        self.slot_timers.discard(slot)
+        if slot < len(self.blockchain.chain) or slot in self.commit_buffer:
+            return  # 커밋됨
+        if slot >= len(self.blockchain.chain) + self.max_pipeline:
+            self.on_slot_open()  # 슬롯 창이 아직 안 열림, 다시 기다림
+            return
+        if slot in self.slot_changing:
+            return  # 이미 라운드를 바꾸는 중, slot_round_timeout 이 이어받음
+        # 제안이 오지 않았거나, 투표가 갈리거나 제안자가 느려서 커밋되지 않음: 제안을 받았어도 기다리지 않음
+        self.metrics.inc('slot_timeouts')
+        self.log(f"슬롯 {slot}이(가) 제안자 {self.leader_of(slot)}의 차례에서 커밋되지 않았습니다.")
+        self.start_slot_round(slot, self.slot_rounds.get(slot, 0) + 1)
+
+    def start_slot_round(self, slot, round):
+        # 슬롯 하나만 다음 제안자에게 넘기자고 알림, 그 슬롯에서 준비된 블록과 투표한 블록을 함께 보냄
+        if slot < len(self.blockchain.chain) or round <= max(self.slot_rounds.get(slot, 0), self.slot_changing.get(slot, 0)):
+            return
+        self.slot_changing[slot] = round
+        self.metrics.inc('slot_rounds_started')
+        reports = {timestamp: (self.preprepare_msgs[timestamp], self.block_rounds.get(timestamp, 0), certificate)
+                   for timestamp, (_, certificate) in self.prepared.items()
+                   if timestamp in self.preprepare_msgs and self.preprepare_msgs[timestamp].index == slot}
+        locked = self.slots.get(slot)
+        if locked in self.preprepare_msgs and locked not in reports:
+            reports[locked] = (self.preprepare_msgs[locked], self.block_rounds.get(locked, 0), 0)
+        prepared = list(reports.values())
+        self.broadcast_message({'type': 'slot_round', 'slot': slot, 'round': round, 'peer_id': self.id, 'prepared': prepared})
+        self.handle_slot_round(slot, round, self.id, prepared)
+        delay = self.slot_timeout * 2 ** (round - self.slot_rounds.get(slot, 0))
+        self.network.call_later(delay, self.submit_local, {'type': 'slot_round_timeout', 'slot': slot, 'round': round})
+
+    def handle_slot_round(self, slot, round, peer_id, prepared=()):
+        if self.blockchain is None or slot < len(self.blockchain.chain) or round <= self.slot_rounds.get(slot, 0):
+            return
+        bit = self.quorum.bit(peer_id)
+        votes = self.slot_round_votes.get((slot, round), 0)
+        if not bit or votes & bit:
+            return
+        self.slot_round_votes[(slot, round)] = votes | bit
+        self.slot_round_reports.setdefault((slot, round), {})[peer_id] = list(prepared)
+        if (votes | bit).bit_count() >= self.quorum.f + 1:
+            self.start_slot_round(slot, round)  # 정직한 복제본이 하나 이상 기다리다 지침
+        if self.slot_round_votes.get((slot, round), 0).bit_count() >= self.quorum.commit:
+            self.install_slot_round(slot, round, self.slot_round_reports.get((slot, round), {}))
+
+    def handle_slot_round_timeout(self, slot, round):
+        if self.slot_changing.get(slot) == round and self.slot_rounds.get(slot, 0) < round:
+            self.metrics.inc('slot_round_timeouts')
+            self.start_slot_round(slot, round + 1)  # 새 제안자도 응답하지 않음
+
+    def install_slot_round(self, slot, round, proof):
+        if slot < len(self.blockchain.chain) or round <= self.slot_rounds.get(slot, 0):
+            return
+        self.slot_rounds[slot] = round
+        if self.slot_changing.get(slot, 0) <= round:
+            self.slot_changing.pop(slot, None)
+        self.round_proofs[slot] = (round, proof)
+        for key in [key for key in self.slot_round_votes if key[0] == slot and key[1] <= round]:
+            self.slot_round_votes.pop(key)
+            self.slot_round_reports.pop(key, None)
+        chosen = self.reproposal(proof, slot)
+        self.slots.pop(slot, None)  # 이전 라운드의 투표를 풀어 새 제안자의 블록에 투표할 수 있게 함
+        self.requeue_abandoned({chosen.timestamp: chosen} if chosen is not None else {}, slot)
+        self.metrics.inc('slot_round_changes')
+        self.log(f"슬롯 {slot}이(가) 라운드 {round}(으)로 바뀌었습니다. 새 제안자는 {self.leader_of(slot)}입니다.")
+        if self.leader_of(slot) == self.id:
+            self.refill_slot(slot, chosen)
+        self.on_slot_open()
+
+    def reproposal(self, proof, slot):
+        # 2f+1 인증서가 있는 블록 중 가장 높은 라운드(view)의 것은 커밋됐을 수 있으므로 그대로 다시 제안함
+        # 그런 블록이 없으면 어떤 블록이든 안전하므로 가장 최근에 제안된 블록을 다시 제안해 그 트랜잭션을 살림
+        reported = [entry for entry in self.reported_blocks(proof).values() if entry[0].index == slot]
+        if not reported:
+            reported = [(block, when) for prepared in proof.values() for block, when, _ in prepared if block.index == slot]
+        return max(reported, key=lambda entry: (entry[1], -entry[0].timestamp))[0] if reported else None
+
+    def refill_slot(self, slot, chosen):
+        if chosen is not None:
+            self.last_timestamp = max(self.last_timestamp, chosen.timestamp)
+            self.metrics.inc('reproposed_blocks')
+            block = chosen
+        else:
+            limit = self.batcher.max_batch if self.batcher is not None else 1000
+            block = Block(slot, self.proposal_timestamp(), self.mempool.build_batch(limit))
+        self.propose_block(block)
+
+    def migrate_slots(self):
+        # 돌아가며 제안할 때의 view change: 커밋되지 않은 슬롯들의 투표와 라운드를 모두 풀고
+        # 새 view 의 제안자 순서로 각 슬롯을 다시 채움 (증거에 준비된 블록이 있으면 그 블록을 다시 제안)
+        head = len(self.blockchain.chain)
+        # 이 복제본이 못 본 슬롯이라도 증거에 준비된 블록이 있으면 새 블록 대신 그 블록을 다시 제안해야 함
+        seen = max([self.next_slot, head] + [block.index + 1 for prepared in self.view_proof.values() for block, _, _ in prepared])
+        self.slots = {slot: timestamp for slot, timestamp in self.slots.items() if slot < head}
+        self.slot_rounds.clear()
+        self.slot_changing.clear()
+        self.slot_round_votes.clear()
+        self.slot_round_reports.clear()
+        self.round_proofs.clear()
+        self.block_rounds.clear()
+        self.next_slot = head
+        chosen = {slot: self.reproposal(self.view_proof, slot) for slot in range(head, seen) if slot not in self.commit_buffer}
+        self.requeue_abandoned({block.timestamp: block for block in chosen.values() if block is not None})
+        if self.leader_of(head) == self.id:
+            # view_change 를 못 받은 복제본도 증거를 보고 새 view 로 넘어오게 알림
+            self.broadcast_message({'type': 'new_view', 'new_view': self.view, 'peer_id': self.id, 'proof': self.view_proof})
+        for slot, block in sorted(chosen.items()):
+            if self.leader_of(slot) == self.id:
+                self.refill_slot(slot, block)
+        self.on_slot_open()
+
+    def start_catch_up(self, interval=None):
+        # 새 복제본: 자기 표가 세어지는 에포크 전까지 기존 복제본들에게 돌아가며 스냅샷을 받아옴
+        if interval is not None:
+            self.catch_up_interval = interval
+        self.catching_up = True
+        self.catch_up()
+
+    def catch_up(self):
+        if not self.catching_up or not self.peers:
+            return
+        ids = sorted(self.peers)
+        self.request_snapshot(self.peers[ids[self.catch_up_round % len(ids)]])
+        self.catch_up_round += 1
+        self.network.call_later(self.catch_up_interval, self.submit_local, {'type': 'catch_up'})
+
+    def enable_failure_detection(self, interval=0.1, threshold=8.0, view_change_timeout=0.5, **kwargs):
+        # 복제본끼리 heartbeat 를 주고받으며 phi accrual 로 의심함 (kb.failure)
+        # 주 노드를 의심하면 view change, 돌아가며 제안할 때는 기다리는 슬롯의 제안자를 의심하면 view change
+        self.detector = FailureDetector(self.network.now(), interval, threshold, **kwargs)
+        self.detector.retain(list(self.peers), self.network.now())
+        self.view_change_timeout = view_change_timeout
+        self.heartbeat()
+        return self.detector
+
+    def heartbeat(self):
+        # 타이머에서 바로 보냄: actor 가 밀려 있어도 heartbeat 는 늦어지지 않고, 판정만 actor 에서 함
+        if not self.network.running or self.retired:
+            return
+        hb = self.detector.stamp(self.network.now())
+        if hb is not None:
+            self.metrics.inc('heartbeats_sent')
+            self.network.broadcast_message({'type': 'heartbeat', 'peer_id': self.id, 'hb': hb})
+        self.submit_local({'type': 'suspicion_check'})
+        self.network.call_later(self.detector.interval / 4, self.heartbeat)
+
+    def check_suspicion(self):
+        now = self.network.now()
+        new, cleared = self.detector.check(now)
+        for peer_id in new:
+            self.metrics.inc('suspicions')
+            self.log(f"피어 {peer_id}에게서 {self.detector.stats(now)[peer_id]['silent_for']:.3f}초 동안 소식이 없어 의심합니다.")
+        # 의심했던 피어에게서 다시 소식이 옴 (오탐이었거나 회복함)
+        self.metrics.inc('suspicions_cleared', len(cleared))
+        self.passed_over.difference_update(cleared)
+        self.metrics.set('suspected_peers', len(self.detector.suspected))
+        if self.blockchain is None:
+            return
+        if self.rotation is None:
+            if self.primary_id != self.id and self.detector.is_suspected(self.primary_id):
+                self.start_view_change(self.view + 1)
+            return
+        # 돌아가며 제안할 때도 기다리는 슬롯의 제안자를 의심하면 view change: 제안자 순서가 한 칸 밀리고
+        # 커밋되지 않은 슬롯들은 투표를 풀고 새 view 의 제안자가 준비된 블록을 다시 제안함
+        # view change 뒤에도 계속 의심받는 제안자의 다음 차례들은 view 를 또 바꾸지 않고 그 슬롯만 넘김
+        for slot in sorted({len(self.blockchain.chain), self.upcoming_slot()}):
+            if (slot < self.demand or slot in self.slots) and slot not in self.commit_buffer:
+                leader = self.leader_of(slot)
+                if leader == self.id or not self.detector.is_suspected(leader):
+                    continue
+                if leader in self.passed_over:
+                    self.handle_slot_timeout(slot)  # 슬롯 타임아웃까지 기다리지 않음
+                else:
+                    self.start_view_change(self.view + 1)
+                    return
+
+    def failure_metrics(self):
+        # 피어마다 RTT, phi, 마지막으로 소식을 들은 뒤 지난 시간, 의심 여부
+        if self.detector is None:
+            return {}
+        return self.detector.stats(self.network.now())
+
+    def start_view_change(self, new_view):
+        # 주 노드를 바꾸자고 알림, 준비(prepared)됐지만 아직 커밋하지 않은 블록을 함께 보내 새 주 노드가 이어서 제안하게 함
+        if new_view <= self.view or (self.view_changing is not None and new_view <= self.view_changing):
+            return
+        self.view_changing = new_view
+        self.metrics.inc('view_changes_started')
+        self.log(f"주 노드 {self.primary_id}을(를) 바꾸기 위해 view {new_view}(으)로 view change 를 시작합니다.")
+        # 준비된 블록마다 준비된 view 와 2f+1 인증서를 함께 보냄
+        # 돌아가며 제안할 때는 한 view 안에서도 슬롯의 라운드마다 다른 블록이 준비될 수 있으므로 (view, 라운드) 로 보냄
+        prepared = [(self.preprepare_msgs[timestamp], self.report_round(timestamp, view), certificate)
+                    for timestamp, (view, certificate) in self.prepared.items()
+                    if timestamp in self.preprepare_msgs and timestamp not in self.committed_blocks]
+        if self.rotation is not None:
+            # 인증서가 없어도 투표한 블록을 보내 새 view 의 제안자가 그 트랜잭션을 살릴 수 있게 함
+            reported = {block.timestamp for block, _, _ in prepared}
+            prepared += [(self.preprepare_msgs[timestamp], self.report_round(timestamp, self.view), 0)
+                         for timestamp in self.slots.values()
+                         if timestamp in self.preprepare_msgs and timestamp not in reported
+                         and timestamp not in self.committed_blocks]
+        self.broadcast_message({'type': 'view_change', 'new_view': new_view, 'peer_id': self.id, 'prepared': prepared})
+        self.handle_view_change(new_view, self.id, prepared)
+        delay = self.view_change_timeout * 2 ** (new_view - self.view - 1)
+        self.network.call_later(delay, self.submit_local, {'type': 'view_change_timeout', 'new_view': new_view})
+
+    def report_round(self, timestamp, view):
+        return view if self.rotation is None else (view, self.block_rounds.get(timestamp, 0))
+
+    def handle_view_change(self, new_view, peer_id, prepared=()):
+        if new_view <= self.view:
+            return
+        bit = self.quorum.bit(peer_id)
+        votes = self.view_votes.get(new_view, 0)
+        if not bit or votes & bit:
+            return
+        votes |= bit
+        self.view_votes[new_view] = votes
+        self.view_reports.setdefault(new_view, {})[peer_id] = list(prepared)
+        if votes.bit_count() >= self.quorum.f + 1:
+            # 정직한 복제본이 하나 이상 의심함: 함께 넘어가야 새 view 가 정족수를 채움
+            self.start_view_change(new_view)
+        if self.view_votes.get(new_view, 0).bit_count() >= self.quorum.commit:
+            self.install_view(new_view)
+
+    def handle_view_change_timeout(self, new_view):
+        if self.view < new_view and self.view_changing == new_view:
+            self.metrics.inc('view_change_timeouts')
+            self.start_view_change(new_view + 1)  # 새 주 노드도 응답하지 않음
+
+    def install_view(self, new_view):
+        if new_view <= self.view:
+            return
+        self.view = new_view
+        self.view_changing = None
+        self.update_primary()
+        self.view_proof = self.view_reports.pop(new_view, {})
+        for view in [view for view in self.view_votes if view <= new_view]:
+            del self.view_votes[view]
+        for view in [view for view in self.view_reports if view <= new_view]:
+            del self.view_reports[view]
+        reported = self.reported_blocks(self.view_proof)
+        self.metrics.inc('view_changes')
+        self.metrics.set('view', new_view)
+        self.log(f"view {new_view}(으)로 바뀌었습니다. 새 주 노드는 {self.primary_id}입니다.")
+        if self.detector is not None and self.rotation is None and self.primary_id != self.id:
+            self.detector.forgive(self.primary_id, self.network.now())
+        if self.batcher is not None:
+            self.batcher.clear_inflight()
+        if self.rotation is not None:
+            if self.detector is not None:
+                self.passed_over.update(self.detector.suspected)
+            self.migrate_slots()
+        else:
+            # 준비됐다고 보고된 블록은 새 주 노드가 다시 제안하므로 그 트랜잭션은 되돌리지 않음
+            self.requeue_abandoned(reported)
+            if self.id == self.primary_id:
+                # view_change 를 못 받은 복제본도 증거를 보고 새 view 로 넘어오게 알린 뒤 다시 제안함
+                self.broadcast_message({'type': 'new_view', 'new_view': new_view, 'peer_id': self.id,
+                                        'proof': self.view_proof})
+                self.repropose(reported)
+
+    def handle_new_view(self, new_view, peer_id, proof):
+        # view_change 를 놓쳤어도 2f+1 개의 view_change 가 실린 증거를 보면 그 view 로 넘어감 (보낸 복제본이 누구든)
+        if new_view <= self.view:
+            return
+        votes = 0
+        for voter in proof:
+            votes |= self.quorum.bit(voter)
+        if votes.bit_count() < self.quorum.commit:
+            return
+        self.metrics.inc('new_views_adopted')
+        self.log(f"view change 를 놓쳐 피어 {peer_id}의 new_view 증거로 view {new_view}(으)로 넘어갑니다.")
+        self.view_reports[new_view] = proof
+        self.install_view(new_view)
+
+    def handle_lagging(self, peer_id):
+        # 옛 view 로 보내는 복제본에게 지금 view 의 증거를 보냄, 같은 복제본에는 view_change_timeout 에 한 번만
+        now = self.network.now()
+        if (not self.view_proof or peer_id not in self.peers
+                or now - self.lagging.get(peer_id, -math.inf) < self.view_change_timeout):
+            return
+        self.lagging[peer_id] = now
+        self.metrics.inc('new_views_sent')
+        self.network.send_message(self.peers[peer_id], {'type': 'new_view', 'new_view': self.view,
+                                                        'peer_id': self.id, 'proof': self.view_proof})
+
+    def reported_blocks(self, proof):
+        # 증거에 실린 준비된 블록 중 2f+1 prepare 인증서가 있는 것: 블록 timestamp -> (블록, 준비된 가장 높은 view)
+        reported = {}
+        for prepared in proof.values():
+            for block, view, certificate in prepared:
+                if certificate.bit_count() < self.quorum.commit:
+                    continue
+                entry = reported.get(block.timestamp)
+                if entry is None or view > entry[1]:
+                    reported[block.timestamp] = (block, view)
+        return reported
+
+    def requeue_abandoned(self, reported, slot=None):
+        # 옛 view 에서 자기가 제안했지만 커밋되지 못했고 준비됐다고 보고되지도 않은 블록의 트랜잭션을 mempool 로 되돌림
+        # 그대로 두면 mempool.inflight 에 남아 다시 제안되지 않고, 클라이언트가 다시 보내도 중복으로 거절됨
+        # slot 을 주면 그 슬롯의 라운드가 바뀔 때 버려진 블록만 봄
+        abandoned = []
+        for timestamp, block in list(self.preprepare_msgs.items()):
+            if timestamp in reported or timestamp in self.committed_blocks or not isinstance(block.data, list):
+                continue
+            if slot is not None and block.index != slot:
+                continue
+            txs = [tx for tx in self.block_transactions(block) if tx_digest(tx) in self.mempool.inflight]
+            if txs:
+                del self.preprepare_msgs[timestamp]  # 다음 view change 에서 다시 되돌리지 않게
+                self.prepared.pop(timestamp, None)
+                self.block_rounds.pop(timestamp, None)
+                abandoned.extend(txs)
+        if abandoned:
+            self.mempool.requeue(abandoned)
+            self.metrics.inc('requeued_txs', len(abandoned))
+            self.log(f"커밋되지 못한 제안의 트랜잭션 {len(abandoned)}개를 mempool 로 되돌렸습니다.")
+
+    def repropose(self, reported):
+        # 새 주 노드: 옛 view 에서 준비된 블록을 같은 timestamp 로 다시 제안해 이미 모인 투표를 이어 씀
+        # 높이마다 가장 높은 view 에서 준비된 블록 하나만 고름 (그 view 에서 커밋됐을 수 있는 유일한 블록)
+        chosen = {}
+        for block, view in reported.values():
+            if block.timestamp in self.committed_blocks or block.index < len(self.blockchain.chain):
+                continue
+            if block.index not in chosen or view > chosen[block.index][1]:
+                chosen[block.index] = (block, view)
+        now = self.network.now()
+        for index in sorted(chosen):
+            block = chosen[index][0]
+            self.last_timestamp = max(self.last_timestamp, block.timestamp)
+            self.metrics.inc('reproposed_blocks')
+            self.propose_block(block)
+            if self.batcher is not None:
+                # 다시 제안한 블록이 커밋될 때까지 같은 높이에 새 블록을 제안하지 않음
+                self.batcher.inflight[block.timestamp] = (now, len(self.block_transactions(block)))
+        if self.batcher is not None:
+            self.batcher.poll()
+
     def connect_peer(self, peer_id, peer_port):
-        try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.connect(('127.0.0.1', peer_port))
-            self.peers[peer_id] = peer_port
-            self.total_peers += 1
-            self.update_primary()
-            self.synchronize_genesis_block(peer_id, peer_port)
-            print(f"피어 {peer_id}에 포트 {peer_port}로 연결되었습니다.")
+        # Send a message to the peer to connect back
+        message = {'type': 'connect_back', 'peer_id': self.id, 'peer_port': self.port,
+                   'codecs': self.network.codec.supported()}
+        if not self.network.send_message(peer_port, message):
+            print(f"피어 {peer_id}에 포트 {peer_port}로 연결하는 데 실패했습니다.")
+            return
+        self.peers[peer_id] = peer_port
+        self.total_peers += 1
+        self.update_primary()
+        self.synchronize_genesis_block(peer_id, peer_port)
+        print(f"피어 {peer_id}에 포트 {peer_port}로 연결되었습니다.")
+        if self.blockchain is None or len(self.blockchain.chain) == 1:
+            self.request_snapshot(peer_port)
 
-            # Send a message to the peer to connect back
-            message = {'type': 'connect_back', 'peer_id': self.id, 'peer_port': self.port}
-            sock.send(pickle.dumps(message))
-            sock.close()
-        except Exception as e:
-            print(f"피어 {peer_id}에 포트 {peer_port}로 연결하는 데 실패했습니다: {e}")
+    def genesis_block_data(self):
+        genesis_block = self.blockchain.chain[0]
+        return {
+            'index': genesis_block.index,
+            'timestamp': genesis_block.timestamp,
+            'data': genesis_block.data,
+            'prev_hash': genesis_block.prev_hash
+        }
 
     def synchronize_genesis_block(self, peer_id, peer_port):
-        try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.connect(('127.0.0.1', peer_port))
-            if self.blockchain is None:
-                message = {'type': 'request_genesis'}
-                sock.send(pickle.dumps(message))
-                data = sock.recv(4096)
-                if data:
-                    genesis_block_data = pickle.loads(data)
-                    genesis_block = Block(genesis_block_data['index'],
-                                          genesis_block_data['timestamp'],
-                                          genesis_block_data['data'],
-                                          genesis_block_data['prev_hash'])
-                    self.blockchain = BlockChain(genesis_block)
-                    print(f"피어 {peer_id}로부터 제네시스 블록이 동기화되었습니다.")
-            else:
-                genesis_block = self.blockchain.chain[0]
-                genesis_block_data = {
-                    'index': genesis_block.index,
-                    'timestamp': genesis_block.timestamp,
-                    'data': genesis_block.data,
-                    'prev_hash': genesis_block.prev_hash
-                }
-                message = {'type': 'send_genesis', 'genesis_block': genesis_block_data}
-                sock.send(pickle.dumps(message))
-            sock.close()
-        except Exception as e:
-            print(f"피어 {peer_id}에 포트 {peer_port}로 제네시스 블록을 동기화하는 데 실패했습니다: {e}")
+        if self.blockchain is None:
+            # 시뮬레이션 전송 계층은 응답을 send_genesis 메시지로 나중에 전달하고 None 을 돌려줌
+            reply = self.network.request(peer_port, {'type': 'request_genesis'})
+            if reply:
+                self.receive_genesis_block(reply['genesis_block'])
+                print(f"피어 {peer_id}로부터 제네시스 블록이 동기화되었습니다.")
+        else:
+            message = {'type': 'send_genesis', 'genesis_block': self.genesis_block_data()}
+            self.network.send_message(peer_port, message)
 
-    def run_server(self):
-        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        server.bind(('127.0.0.1', self.port))
-        server.listen(5)
-        print(f"피어 {self.id}이(가) 포트 {self.port}에서 대기 중입니다.")
-        try:
-            while self.server_running:
-                server.settimeout(1.0)
-                try:
-                    client_socket, addr = server.accept()
-                    print(f"{addr}에서 연결이 수락되었습니다.")
-                    threading.Thread(target=self.handle_client, args=(client_socket,)).start()
-                except socket.timeout:
-                    continue
-        except KeyboardInterrupt:
-            print(f"피어 {self.id} 서버가 종료됩니다.")
-        finally:
-            server.close()
-    
     def stop_server(self):
-        self.server_running = False
-        self.server_thread.join()
+        self.network.stop()
+        if self.actor is not None:
+            self.actor.stop()
     
-    def handle_client(self, client_socket):
-        try:
-            data = client_socket.recv(4096)
-            if data:
-                message = pickle.loads(data)
-                if message['type'] == 'request_genesis':
-                    self.send_genesis_block(client_socket)
-                elif message['type'] == 'send_genesis':
-                    self.receive_genesis_block(message['genesis_block'])
-                elif message['type'] == 'preprepare':
-                    self.handle_preprepare(message['block'], message['view'])
-                elif message['type'] == 'prepare':
-                    self.handle_prepare(message['block'], message['view'], message['peer_id'])
-                elif message['type'] == 'commit':
-                    self.handle_commit(message['block'], message['view'], message['peer_id'])
-                elif message['type'] == 'view_change':
-                    self.handle_view_change(message['new_view'], message['peer_id'])
-                elif message['type'] == 'connect_back':
-                    self.handle_connect_back(message['peer_id'], message['peer_port'])
-        except EOFError as e:
-            print(f"EOFError: {e}")
-        except Exception as e:
-            print(f"Exception: {e}")
-        finally:
-            client_socket.close()
+    def verify_message(self, message):
+        block = message.get('block')
+        if block is not None and block.hash != block.calHash():
+            return False
+        if message['type'] == 'batch' and batch_digest(message['txs']) != message['digest']:
+            return False
+        return True
+
+    def admit_frame(self, data):
+        # 본문을 역직렬화하기 전에 헤더만 보고 중복 메시지와 이미 끝난 블록에 대한 늦은 메시지를 버림
+        kind, relayed, heartbeat, view, seq, sender = unpack_header(data)
+        if kind == OTHER:
+            return True
+        if self.seen.check(frame_digest(data)):
+            self.metrics.inc('dropped_duplicate')
+            return False
+        if kind == CHECKPOINT:
+            stale = seq <= self.checkpoints.stable_height
+        else:
+            stale = view < self.view or (seq in self.committed_blocks and not relayed)
+        if stale and self.detector is not None and sender in self.peers:
+            self.detector.heard(sender, self.network.now())  # 늦은 투표도 보낸 복제본이 살아 있다는 증거
+        if kind != CHECKPOINT and view < self.view and sender in self.peers:
+            self.submit_local({'type': 'lagging', 'peer_id': sender})  # view change 를 놓친 복제본
+        if stale and not heartbeat:
+            self.metrics.inc('dropped_stale')
+            return False
+        return True
+
+    def trace_received(self, message, received):
+        # 전송 계층이 프레임을 다 받은 시각(received)과 디코딩을 마친 지금 시각을 남김
+        trace = message.get('trace')
+        if trace is None:
+            return
+        sender = message.get('peer_id')
+        self.tracer.record(trace, 'received', at=received, type=message['type'], sender=sender)
+        self.tracer.record(trace, 'decoded', type=message['type'], sender=sender)
+
+    def trace_of(self, block):
+        return self.trace_ids.get(block.timestamp)
+
+    def export_spans(self):
+        return self.tracer.export()
+
+    def enable_profiling(self, interval=0.005, depth=8):
+        # 연결 처리 스레드와 actor 가 메시지를 처리하는 동안만 스택을 샘플링함
+        self.profiler = SamplingProfiler(interval, depth)
+        self.network.profiler = self.profiler
+        if self.actor is not None:
+            self.actor.handler = self.profiler.wrap(self.dispatch)
+        self.profiler.start()
+        return self.profiler
+
+    def handle_message(self, message, client_socket=None):
+        # 연결 처리 스레드에서 불림: 디코딩과 검증은 여기서 병렬로 하고 상태 변경은 actor 에게 넘김
+        if message['type'] == 'request_genesis':
+            self.send_genesis_block(client_socket)
+            return
+        if message['type'] == 'query':
+            # 읽기 전용이라 actor 를 거치지 않고 연결 처리 스레드에서 바로 응답함
+            self.network.reply(client_socket, {'type': 'query_result',
+                                               'result': self.handle_query(message['method'], message.get('args', ()))})
+            return
+        if message['type'] == 'subscribe_headers':
+            self.subscribe_remote(message['peer_port'])
+            return
+        if self.retired:
+            return
+        if not self.verify_message(message):
+            self.metrics.inc('rejected_invalid')
+            self.log(f"잘못된 {message['type']} 메시지를 버렸습니다.")
+            return
+        if self.detector is not None and message.get('peer_id') in self.peers:
+            # 합의 메시지도 살아 있다는 증거로 셈, heartbeat 가 실려 있으면 도착 간격과 RTT 도 잼
+            self.detector.heard(message['peer_id'], self.network.now(), message.get('hb'), self.id)
+        if message['type'] == 'heartbeat' or message.get('view', self.view) < self.view:
+            return  # heartbeat 만 읽으려고 들인 지난 view 의 메시지도 여기서 끝
+        if message['type'] == 'transaction' and not valid_tx(message.get('tx')):
+            self.metrics.inc('rejected_malformed')
+            return
+        if message['type'] == 'transaction' and self.admission is not None:
+            # actor inbox 에 넣기 전에 판정함: 넘치는 요청은 큐에서 기다리지 않고 바로 거절 응답을 받음
+            if not self.admit_transaction(message, client_socket):
+                return
+            message['admitted'] = True
+        if not self.submit_local(message) and message.get('admitted'):
+            # actor inbox 가 넘쳐 받은 트랜잭션이 버려짐: 입장 수를 되돌리고 클라이언트가 다시 보내게 함
+            tx = message['tx']
+            self.metrics.inc('dropped_admitted')
+            self.send_reject(message, client_socket, *self.admission.dropped(tx.get('client'), tx.get('nonce', 0)))
+
+    def submit_local(self, message):
+        # 타이머 등 다른 스레드에서 생긴 일도 actor 를 거쳐 합의 상태를 건드리게 함
+        # actor 가 inbox 가 넘쳐 버렸으면 False
+        if self.actor is not None:
+            return self.actor.submit(message)
+        self.dispatch(message)
+        return True
+
+    def dispatch(self, message):
+        trace = message.get('trace')
+        if trace is not None:
+            timestamp = message['block'].timestamp if 'block' in message else message['ref'].timestamp
+            if timestamp not in self.committed_blocks:
+                self.trace_ids.setdefault(timestamp, trace)
+        if message['type'] == 'send_genesis':
+            self.receive_genesis_block(message['genesis_block'])
+        elif message['type'] == 'preprepare':
+            self.handle_preprepare(message['block'], message['view'], message.get('relay'),
+                                   message.get('round', 0), message.get('round_proof'))
+        elif message['type'] == 'prepare':
+            self.handle_prepare(message['ref'], message['view'], message['peer_id'])
+        elif message['type'] == 'commit':
+            self.handle_commit(message['ref'], message['view'], message['peer_id'])
+        elif message['type'] == 'body_timeout':
+            self.handle_body_timeout(message['ref'], message['attempt'])
+        elif message['type'] == 'body_request':
+            self.handle_body_request(message['ref'], message['peer_id'])
+        elif message['type'] == 'block_body':
+            self.handle_block_body(message['block'], message['view'])
+        elif message['type'] == 'transaction':
+            if message.get('admitted'):
+                self.admission.arrived()
+            self.submit_transaction(message['tx'])
+        elif message['type'] == 'batch_timeout':
+            if self.batcher is not None:
+                self.batcher.on_timer()
+        elif message['type'] == 'batch':
+            self.handle_batch(message['digest'], message['txs'], message['origin'])
+        elif message['type'] == 'batch_ack':
+            self.handle_batch_ack(message['digest'], message['peer_id'])
+        elif message['type'] == 'batch_available':
+            self.handle_batch_available(message['digest'], message['origin'], message['acks'])
+        elif message['type'] == 'batch_request':
+            self.handle_batch_request(message['digest'], message['peer_id'])
+        elif message['type'] == 'checkpoint':
+            self.handle_checkpoint(message['height'], message['digest'], message['peer_id'])
+        elif message['type'] == 'snapshot_request':
+            self.handle_snapshot_request(message['peer_id'], message['peer_port'], message['height'])
+        elif message['type'] == 'snapshot':
+            self.install_snapshot(message['snapshot'], message['certificate'], message['headers'], message['tail'],
+                                  message.get('config'))
+        elif message['type'] == 'config':
+            self.propose_config(message['add'], message['remove'])
+        elif message['type'] == 'catch_up':
+            self.catch_up()
+        elif message['type'] == 'demand':
+            self.handle_demand(message['slot'])
+        elif message['type'] == 'slot_timeout':
+            self.handle_slot_timeout(message['slot'])
+        elif message['type'] == 'slot_round':
+            self.handle_slot_round(message['slot'], message['round'], message['peer_id'], message.get('prepared', ()))
+        elif message['type'] == 'slot_round_timeout':
+            self.handle_slot_round_timeout(message['slot'], message['round'])
+        elif message['type'] == 'suspicion_check':
+            self.check_suspicion()
+        elif message['type'] == 'view_change':
+            self.handle_view_change(message['new_view'], message['peer_id'], message.get('prepared', ()))
+        elif message['type'] == 'new_view':
+            self.handle_new_view(message['new_view'], message['peer_id'], message['proof'])
+        elif message['type'] == 'lagging':
+            self.handle_lagging(message['peer_id'])
+        elif message['type'] == 'view_change_timeout':
+            self.handle_view_change_timeout(message['new_view'])
+        elif message['type'] == 'connect_back':
+            self.handle_connect_back(message['peer_id'], message['peer_port'], message.get('codecs'))
+        elif message['type'] == 'codecs':
+            self.handle_codecs(message['peer_id'], message['codecs'])
+        elif message['type'] == 'codec_dictionary':
+            self.handle_codec_dictionary(message['peer_id'], message['zdict'])
     
-    def handle_connect_back(self, peer_id, peer_port):
+    def handle_query(self, method, args):
+        queries = {
+            'get_block': self.get_block,
+            'get_block_by_hash': self.get_block_by_hash,
+            'scan_blocks': self.scan_blocks,
+            'get_transaction': self.get_transaction,
+            'latest_header': self.latest_header,
+            'failure_metrics': self.failure_metrics,
+        }
+        if method not in queries:
+            return None
+        return queries[method](*args)
+
+    def get_block(self, height):
+        return self.block_store.get_block(height)
+
+    def get_block_by_hash(self, block_hash):
+        return self.block_store.get_block_by_hash(block_hash)
+
+    def scan_blocks(self, start=0, limit=100):
+        return self.block_store.scan(start, limit)
+
+    def get_transaction(self, txid):
+        return self.block_store.get_transaction(txid)
+
+    def latest_header(self):
+        return self.block_store.latest_header()
+
+    def subscribe_headers(self, callback):
+        self.block_store.subscribe(callback)
+
+    def subscribe_remote(self, peer_port):
+        # 보내기는 구독자마다 따로 도는 스레드가 함, actor 스레드는 큐에 넣기만 함
+        def send_header(header):
+            return self.network.send_message(peer_port, {'type': 'header', 'header': header})
+        subscriber = RemoteSubscriber(send_header, threaded=self.network.threaded)
+        self.block_store.subscribe(subscriber)
+        return subscriber
+
+    def query_metrics(self):
+        return self.block_store.stats()
+
+    def queue_metrics(self):
+        metrics = self.metrics.snapshot()
+        metrics['inbox_depth'] = self.actor.depth() if self.actor is not None else 0
+        metrics['active_handlers'] = getattr(self.network, 'active_handlers', 0)
+        return metrics
+
+    def handle_connect_back(self, peer_id, peer_port, codecs=None):
         if peer_id not in self.peers:
             self.peers[peer_id] = peer_port
             self.total_peers += 1
             self.update_primary()
             print(f"양방향 연결 성공 아이디:{peer_id}의 포트:{peer_port} ")
+        if codecs is not None:
+            # 상대가 지원하는 압축 방식을 기록하고 내 쪽 목록도 알려줌
+            self.handle_codecs(peer_id, codecs)
+            self.network.send_message(peer_port, {'type': 'codecs', 'peer_id': self.id,
+                                                  'codecs': self.network.codec.supported()})
+
+    def handle_codecs(self, peer_id, codecs):
+        if peer_id in self.peers:
+            self.network.accepts[self.peers[peer_id]] = codecs
+
+    def train_codec_dictionary(self, samples, size=32768):
+        # 비슷한 블록 본문으로 zlib 사전을 만들고 피어들에게 나눠줌, 피어가 받았다고 알려온 뒤부터 사용됨
+        key = self.network.codec.train(samples, size)
+        zdict = self.network.codec.dictionaries[key]
+        self.broadcast_message({'type': 'codec_dictionary', 'peer_id': self.id, 'zdict': zdict})
+        return key
+
+    def handle_codec_dictionary(self, peer_id, zdict):
+        self.network.codec.add_dictionary(zdict)
+        if peer_id in self.peers:
+            self.network.send_message(self.peers[peer_id], {'type': 'codecs', 'peer_id': self.id,
+                                                            'codecs': self.network.codec.supported()})
 
     def send_genesis_block(self, client_socket):
         try:
             if self.blockchain:
-                genesis_block = self.blockchain.chain[0]
-                genesis_block_data = {
-                    'index': genesis_block.index,
-                    'timestamp': genesis_block.timestamp,
-                    'data': genesis_block.data,
-                    'prev_hash': genesis_block.prev_hash
-                }
-                message = {'type': 'send_genesis', 'genesis_block': genesis_block_data}
-                client_socket.send(pickle.dumps(message))
+                message = {'type': 'send_genesis', 'genesis_block': self.genesis_block_data()}
+                self.network.reply(client_socket, message)
                 print("제네시스 블록이 요청한 피어로 전송되었습니다.")
         except Exception as e:
             print(f"제네시스 블록을 전송하는 데 실패했습니다: {e}")
@@ -205,87 +1103,608 @@ class Peer:
             self.blockchain = BlockChain(genesis_block)
             print("제네시스 블록을 수신하여 블록체인이 초기화되었습니다.")
     
-    def handle_preprepare(self, block, view):
-        if block.timestamp in self.committed_blocks:
-            return  # 이미 처리된 블록이면 무시
+    def handle_preprepare(self, block, view, relay=None, round=0, round_proof=None):
         if self.is_byzantine:
-            print(f"비잔틴 노드 {self.id}이(가) preprepare MSG를 받고 아무 일도 하지 않습니다.")
+            self.log(f"비잔틴 노드 {self.id}이(가) preprepare MSG를 받고 아무 일도 하지 않습니다.")
             return  # 비잔틴 노드는 아무 일도 하지 않음
-        print(f"preprepare 단계: view {view}에서 블록 {block.index}을(를) 받았습니다.")
+        if view < max(self.view, self.view_changing or 0):
+            # 옛 view 의 제안이거나 주 노드를 바꾸는 중: 투표하지 않고, commit 정족수가 이미 모인 블록이면 본문만 씀
+            if block.timestamp in self.pending_commits:
+                self.pending_commits.discard(block.timestamp)
+                self.commit_block(block)
+            return
+        if self.rotation is not None and round > self.slot_rounds.get(block.index, 0) and round_proof is not None:
+            # 슬롯의 라운드 변경을 놓침: 실려 온 2f+1 개의 slot_round 증거를 보고 따라감
+            votes = 0
+            for voter in round_proof:
+                votes |= self.quorum.bit(voter)
+            if votes.bit_count() >= self.quorum.commit:
+                self.install_slot_round(block.index, round, round_proof)
+        if relay is not None:
+            # 이미 커밋한 블록이라도 하위 트리에는 본문을 넘겨줘야 함
+            self.relay_preprepare(block, view, relay, round)
+        if block.timestamp in self.committed_blocks:
+            return  # 이미 처리된 블록이면 무시
+        if self.rotation is not None and round < self.slot_rounds.get(block.index, 0):
+            # 슬롯의 라운드가 바뀐 뒤 늦게 온 이전 제안자의 블록이거나 라운드를 모르는 채 받아 온 본문: 투표하지 않음
+            if block.timestamp in self.pending_commits:
+                self.pending_commits.discard(block.timestamp)
+                self.commit_block(block)
+            return
+        # 이미 다른 블록에 투표한 슬롯이면 투표하지 않지만, 다른 복제본들이 이 블록을 커밋할 수 있으니 본문은 둠
+        voting = self.rotation is None or (round == self.slot_rounds.get(block.index, 0) and self.claim_slot(block))
+        self.log(f"preprepare 단계: view {view}에서 블록 {block.index}을(를) 받았습니다.")
         self.preprepare_msgs[block.timestamp] = block
-        self.broadcast_prepare(block, view)
+        if voting:
+            if self.rotation is not None:
+                self.block_rounds[block.timestamp] = round
+            self.broadcast_prepare(block, view)
+            self.add_prepare(block, view, self.quorum.bit(self.id))
+        else:
+            self.metrics.inc('slot_conflicts')
         self.commitflag = False
+        if block.timestamp in self.pending_commits:
+            self.pending_commits.discard(block.timestamp)
+            self.commit_block(block)
+        if self.rotation is not None:
+            self.on_slot_open()
         
 
     def handle_prepare(self, block, view, peer_id):
         if block.timestamp in self.committed_blocks:
             return  # 이미 처리된 블록이면 무시
         if self.is_byzantine:
-            print(f"비잔틴 노드 {self.id}이(가) prepare MSG를 받고 아무 일도 하지 않습니다.")
+            self.log(f"비잔틴 노드 {self.id}이(가) prepare MSG를 받고 아무 일도 하지 않습니다.")
             return  # 비잔틴 노드는 아무 일도 하지 않음
-        print(f"prepare 단계: view {view}에서 피어 {peer_id}로부터 블록 {block.index}에 대한 prepare MSG를 받았습니다.")
-        if block.timestamp not in self.prepare_msgs:
-            self.prepare_msgs[block.timestamp] = set()
-        self.prepare_msgs[block.timestamp].add(peer_id)
-        if len(self.prepare_msgs[block.timestamp]) >= (self.total_peers // 3) * 2 - 1:
-            self.broadcast_commit(block, view)
-            
+        self.log(f"prepare 단계: view {view}에서 피어 {peer_id}로부터 블록 {block.index}에 대한 prepare MSG를 받았습니다.")
+        self.await_body(block, peer_id)
+        self.add_prepare(block, view, self.quorum.bit(peer_id))
+
+    def add_prepare(self, block, view, bit):
+        votes = self.prepare_msgs.get(block.timestamp, 0)
+        if not bit or votes & bit:
+            return  # 모르는 복제본이거나 이미 센 투표
+        votes |= bit
+        self.prepare_msgs[block.timestamp] = votes
+        if votes.bit_count() >= self.quorum.prepare:
+            if self.view_changing is not None:
+                # view_change 로 준비된 블록을 이미 보고함: 그 뒤에 commit 을 보내면 새 view 가 모르는 블록이 커밋될 수 있음
+                return
+            if self.rotation is not None and self.slots.get(block.index) != block.timestamp:
+                # 돌아가며 제안할 때는 지금 라운드에서 자기가 투표한 블록만 준비됨
+                # 라운드가 바뀐 뒤 이전 라운드의 블록에 commit 을 보내면 새 라운드의 블록과 함께 커밋될 수 있음
+                return
+            # 제안자의 preprepare 와 2f 개의 prepare 가 준비 인증서, view change 때 보고함
+            proposer = self.primary_of(view) if self.rotation is None else self.leader_of(block.index, self.block_rounds.get(block.timestamp, 0), view)
+            self.prepared[block.timestamp] = (view, votes | self.quorum.bit(proposer))
+            self.send_commit(block, view)
+
+    def send_commit(self, block, view):
+        # commit 은 블록마다 한 번만 보내고 자기 투표로도 셈, 보냈는지는 commit 비트맵의 자기 비트로 앎
+        own = self.quorum.bit(self.id)
+        if self.commit_msgs.get(block.timestamp, 0) & own:
+            return
+        self.tracer.record(self.trace_of(block), 'prepare_quorum')
+        self.broadcast_commit(block, view)
+        self.add_commit(block, own)
 
     def handle_commit(self, block, view, peer_id):
         if block.timestamp in self.committed_blocks:
             return  # 이미 처리된 블록이면 무시
         if self.is_byzantine:
-            print(f"비잔틴 노드 {self.id}이(가) commit MSG를 받고 아무 일도 하지 않습니다.")
+            self.log(f"비잔틴 노드 {self.id}이(가) commit MSG를 받고 아무 일도 하지 않습니다.")
             return  # 비잔틴 노드는 아무 일도 하지 않음
-        print(f"commit 단계: view {view}에서 피어 {peer_id}로부터 블록 {block.index}에 대한 commit MSG를 받았습니다.")
-        if block.timestamp not in self.commit_msgs:
-            self.commit_msgs[block.timestamp] = set()
-        self.commit_msgs[block.timestamp].add(peer_id)
-        if len(self.commit_msgs[block.timestamp]) >= (self.total_peers // 3) * 2 + 1:
-            print(self.commit_msgs[block.timestamp])
-            if not any(b.timestamp == block.timestamp for b in self.blockchain.chain):
-                self.blockchain.addBlock(block)
-                print(f"블록 {block.index}이(가) 블록체인에 추가되었습니다.")
-            self.committed_blocks.add(block.timestamp)  # 블록을 추가 후 committed 상태로 표시
-            # 추가된 후에는 commit 메시지를 더 이상 처리하지 않음
-            self.commit_msgs[block.timestamp].add(self.id)
+        self.log(f"commit 단계: view {view}에서 피어 {peer_id}로부터 블록 {block.index}에 대한 commit MSG를 받았습니다.")
+        self.await_body(block, peer_id)
+        self.add_commit(block, self.quorum.bit(peer_id))
 
-            
-            
+    def await_body(self, ref, peer_id):
+        # 투표한 복제본은 본문을 받았으므로 본문이 오지 않으면 그들에게서 받아올 수 있음
+        if ref.timestamp in self.preprepare_msgs or peer_id not in self.peers:
+            return
+        entry = self.body_sources.get(ref.timestamp)
+        if entry is None:
+            entry = self.body_sources[ref.timestamp] = (ref, [])
+            self.network.call_later(self.body_timeout, self.submit_local, {'type': 'body_timeout', 'ref': ref, 'attempt': 0})
+        if peer_id not in entry[1]:
+            entry[1].append(peer_id)
+
+    def handle_body_timeout(self, ref, attempt, max_attempts=5):
+        entry = self.body_sources.get(ref.timestamp)
+        if entry is None:
+            return
+        if ref.timestamp in self.preprepare_msgs or ref.timestamp in self.committed_blocks or attempt >= max_attempts:
+            del self.body_sources[ref.timestamp]
+            return
+        # 투표한 복제본들을 차례로, 마지막에는 제안자에게 물음
+        proposer = self.primary_id if self.rotation is None else self.leader_of(ref.index)
+        sources = entry[1] + [proposer] if proposer not in entry[1] else entry[1]
+        source = sources[attempt % len(sources)]
+        if source in self.peers:
+            self.metrics.inc('body_requests')
+            self.log(f"블록 {ref.index}의 본문이 오지 않아 피어 {source}에게 요청합니다.")
+            self.network.send_message(self.peers[source], {'type': 'body_request', 'ref': ref, 'peer_id': self.id})
+        self.network.call_later(self.body_timeout, self.submit_local, {'type': 'body_timeout', 'ref': ref, 'attempt': attempt + 1})
+
+    def handle_body_request(self, ref, peer_id):
+        if self.is_byzantine or peer_id not in self.peers:
+            return
+        body = self.preprepare_msgs.get(ref.timestamp)
+        if body is None and self.blockchain is not None and ref.index in self.proposal_prev and ref.index < len(self.blockchain.chain):
+            # 이미 커밋해서 preprepare_msgs 에서 지운 블록: 체인의 블록은 addBlock 이 해시를 다시 계산했으므로
+            # 제안될 때의 prev_hash 로 되돌려 투표된 해시와 맞춤
+            block = self.blockchain.chain[ref.index]
+            if not getattr(block, 'pruned', False) and block.timestamp == ref.timestamp:
+                body = Block(block.index, block.timestamp, block.data, self.proposal_prev[ref.index])
+        if body is None or body.hash != ref.hash:
+            return
+        self.network.send_message(self.peers[peer_id], {'type': 'block_body', 'block': body, 'view': self.view, 'peer_id': self.id})
+
+    def handle_block_body(self, block, view):
+        entry = self.body_sources.get(block.timestamp)
+        if entry is None or entry[0].hash != block.hash:
+            return  # 요청하지 않았거나 투표된 블록과 다른 본문
+        del self.body_sources[block.timestamp]
+        self.metrics.inc('bodies_fetched')
+        self.handle_preprepare(block, view)
+
+    def add_commit(self, block, bit):
+        votes = self.commit_msgs.get(block.timestamp, 0)
+        if not bit or votes & bit:
+            return
+        votes |= bit
+        self.commit_msgs[block.timestamp] = votes
+        if votes.bit_count() < self.quorum.commit or block.timestamp in self.pending_commits:
+            return
+        self.log(self.quorum.voters(votes))
+        self.tracer.record(self.trace_of(block), 'commit_quorum')
+        body = self.preprepare_msgs.get(block.timestamp)
+        if body is None or body.hash != block.hash:
+            self.pending_commits.add(block.timestamp)  # 본문이 도착하면 handle_preprepare 에서 커밋
+            return
+        self.commit_block(body)
+
+    def commit_block(self, block):
+        if block.timestamp in self.committed_blocks:
+            return
+        self.committed_blocks.add(block.timestamp)  # 먼저 표시해서 아래에서 다시 들어오지 않게 함
+        if not self.is_byzantine:
+            # prepare 정족수보다 commit 정족수를 먼저 본 경우에도 자기 commit 을 보냄
+            # 다른 복제본은 이 투표가 있어야 정족수를 채울 수 있음
+            # 체인에 붙이면 addBlock 이 prev_hash 로 해시를 다시 계산하므로 그 전에 제안된 해시로 보냄
+            self.send_commit(block, self.view)
+        if self.rotation is not None and block.index != len(self.blockchain.chain):
+            # 파이프라인에서 앞 슬롯보다 먼저 커밋됨: 앞 슬롯이 커밋될 때 순서대로 붙임
+            if block.index > len(self.blockchain.chain):
+                self.commit_buffer[block.index] = block
+            if len(self.commit_buffer) > 2 * self.max_pipeline and not self.catching_up:
+                self.start_catch_up()  # 앞 슬롯 본문을 끝내 못 받음
+        elif block.index > len(self.blockchain.chain):
+            # 앞선 블록을 못 받은 채 뒤처짐: 이 블록은 스냅샷 꼬리로 받아옴
+            self.log(f"블록 {block.index}보다 앞선 블록이 없어 스냅샷으로 따라잡습니다.")
+            self.prepare_msgs.pop(block.timestamp, None)
+            self.commit_msgs.pop(block.timestamp, None)
+            self.preprepare_msgs.pop(block.timestamp, None)
+            if not self.catching_up:
+                self.start_catch_up()
+            return
+        else:
+            self.catching_up = False
+            self.append_block(block)
+            self.flush_commit_buffer()
+        # 추가된 후에는 prepare/commit 메시지를 더 이상 처리하지 않으므로 투표도 버림
+        self.prepare_msgs.pop(block.timestamp, None)
+        self.commit_msgs.pop(block.timestamp, None)
+        self.preprepare_msgs.pop(block.timestamp, None)
+        self.prepared.pop(block.timestamp, None)
+        self.block_rounds.pop(block.timestamp, None)
+        self.trace_ids.pop(block.timestamp, None)
+        if self.rotation is not None:
+            self.on_slot_open()
+
+    def append_block(self, block):
+        self.proposal_prev[block.index] = block.prev_hash
+        self.blockchain.addBlock(block)
+        self.slots.pop(block.index, None)
+        if self.slot_rounds or self.slot_changing or self.slot_round_votes:
+            self.forget_slot_rounds(block.index)
+        self.log(f"블록 {block.index}이(가) 블록체인에 추가되었습니다.")
+        self.tracer.record(self.trace_of(block), 'appended', index=block.index)
+        if isinstance(block.data, dict) and 'batches' in block.data:
+            self.resolve_batches(block.data['batches'])
+        self.track_config(block)
+        self.unexecuted.append(block)
+        self.execute_ready()
+        for listener in self.commit_listeners:
+            listener(self, block)
+        self.maybe_switch_config()
+
+    def forget_slot_rounds(self, slot):
+        # 커밋된 슬롯의 라운드 상태는 더 필요 없음
+        self.slot_rounds.pop(slot, None)
+        self.slot_changing.pop(slot, None)
+        self.round_proofs.pop(slot, None)
+        for key in [key for key in self.slot_round_votes if key[0] <= slot]:
+            del self.slot_round_votes[key]
+        for key in [key for key in self.slot_round_reports if key[0] <= slot]:
+            del self.slot_round_reports[key]
+
+    def flush_commit_buffer(self):
+        for index in [index for index in self.commit_buffer if index < len(self.blockchain.chain)]:
+            del self.commit_buffer[index]  # 스냅샷으로 이미 받은 슬롯
+        while len(self.blockchain.chain) in self.commit_buffer:
+            self.append_block(self.commit_buffer.pop(len(self.blockchain.chain)))
 
     def broadcast_preprepare(self, block):
-        message = {'type': 'preprepare', 'block': block, 'view': self.view}
-        self.broadcast_message(message)
+        if self.dissemination == 'tree':
+            # 주 노드는 자식 tree_fanout 개에게만 본문을 올리고 나머지는 자식들이 릴레이함
+            relay = (relay_order(self.id, self.peers), self.tree_fanout)
+            self.relay_preprepare(block, self.view, relay)
+            return
+        message = {'type': 'preprepare', 'block': block, 'view': self.view, 'peer_id': self.id, 'trace': self.trace_of(block)}
+        self.broadcast_message(self.tag_round(message, self.block_rounds.get(block.timestamp, 0)))
+
+    def relay_preprepare(self, block, view, relay, round=None):
+        order, fanout = relay
+        ports = [self.peers[child] for child in relay_children(order, self.id, fanout) if child in self.peers]
+        if ports:
+            message = {'type': 'preprepare', 'block': block, 'view': view, 'relay': relay, 'peer_id': self.id,
+                       'trace': self.trace_of(block)}
+            if round is None:
+                round = self.block_rounds.get(block.timestamp, 0)
+            self.network.multicast_message(ports, self.tag_round(message, round))
+
+    def tag_round(self, message, round):
+        # 슬롯의 라운드가 바뀐 뒤의 제안에만 라운드와 그 증거를 실음
+        if round:
+            message['round'] = round
+            proof = self.round_proofs.get(message['block'].index)
+            if proof is not None and proof[0] == round:
+                message['round_proof'] = proof[1]
+        return message
     
     def broadcast_prepare(self, block, view):
-        message = {'type': 'prepare', 'block': block, 'view': view, 'peer_id': self.id}
+        message = {'type': 'prepare', 'ref': BlockRef(block), 'view': view, 'peer_id': self.id, 'trace': self.trace_of(block)}
         self.broadcast_message(message)
     
     def broadcast_commit(self, block, view):
-        message = {'type': 'commit', 'block': block, 'view': view, 'peer_id': self.id}
+        message = {'type': 'commit', 'ref': BlockRef(block), 'view': view, 'peer_id': self.id, 'trace': self.trace_of(block)}
         self.broadcast_message(message)
 
     def broadcast_message(self, message):
-        for peer_id, peer_port in self.peers.items():
-            try:
-                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                sock.connect(('127.0.0.1', peer_port))
-                sock.send(pickle.dumps(message))
-                sock.close()
-            except Exception as e:
-                print(f"피어 {peer_id}에 메시지를 보내는 데 실패했습니다: {e}")
+        if self.detector is not None and message.get('peer_id') == self.id:
+            # heartbeat 주기가 됐으면 나가는 메시지에 실어 보내고 따로 보내지 않음
+            hb = self.detector.stamp(self.network.now(), piggyback=True)
+            if hb is not None:
+                message['hb'] = hb
+                self.metrics.inc('heartbeats_piggybacked')
+        self.network.broadcast_message(message)
 
-    def propose_block(self, block):
-        if self.id == self.primary_id:
-            print(f"블록 {block.index}을(를) 제안 중입니다.")
-            self.broadcast_preprepare(block)
+    def execute_ready(self):
+        # 커밋 순서대로 실행함, 본문(배치)이 아직 없는 블록에서 멈췄다가 배치가 도착하면 이어서 실행
+        while self.unexecuted:
+            block = self.unexecuted[0]
+            if isinstance(block.data, dict) and self.batches.missing(block.data.get('batches', ())):
+                return
+            txs = self.block_transactions(block)
+            self.state.apply(block, self.block_operations(block))
+            # 적용한 뒤에야 꺼냄: 적용 중에 멈추면 다음에 같은 블록부터 다시 실행하고 높이/색인/체크포인트를 건너뛰지 않음
+            self.unexecuted.popleft()
+            if isinstance(block.data, dict) and 'batches' in block.data:
+                self.batches.mark_executed(block.data['batches'], block.index)
+            self.mempool.remove_committed(txs)
+            self.executed_height += 1
+            self.index_block(block, txs)
+            self.maybe_checkpoint()
+
+    def index_block(self, block, txs):
+        store = self.block_store
+        # 스냅샷으로 건너뛴 높이는 체인에 남은 블록(헤더)으로 채움
+        while store.height() < self.executed_height:
+            store.append(self.blockchain.chain[store.height()])
+        store.append(block, txs)
+
+    def block_operations(self, block):
+        # 트랜잭션의 'op' 필드, 또는 블록 본문에 바로 들어 있는 연산 튜플들
+        items = block.data if isinstance(block.data, list) else self.block_transactions(block)
+        ops = []
+        for item in items:
+            op = item.get('op') if isinstance(item, dict) else item
+            if isinstance(op, (list, tuple)) and op:
+                ops.append(tuple(op))
+        return ops
+
+    def checkpoint_quorum(self):
+        return self.quorum.commit
+
+    def maybe_checkpoint(self):
+        height = self.executed_height
+        if not self.snapshot_interval or height % self.snapshot_interval:
+            return
+        snapshot = Snapshot(height, self.blockchain.chain[height].hash, self.state.dump(), self.state.state_hash())
+        self.snapshots[height] = snapshot
+        self.broadcast_message({'type': 'checkpoint', 'height': height, 'digest': snapshot.digest, 'peer_id': self.id})
+        self.handle_checkpoint(height, snapshot.digest, self.id)
+
+    def handle_checkpoint(self, height, digest, peer_id):
+        voters = self.checkpoints.add(height, digest, peer_id, self.checkpoint_quorum())
+        if voters is None:
+            return
+        snapshot = self.snapshots.get(height)
+        if snapshot is None or snapshot.digest != digest:
+            # 내 상태가 정족수와 다름, 다음 부트스트랩 때 다른 노드의 스냅샷으로 바뀜
+            self.log(f"높이 {height}의 스냅샷이 다른 복제본들과 다릅니다.")
+            return
+        self.stable_snapshot = snapshot
+        self.stable_certificate = voters
+        for old in [h for h in self.snapshots if h < height]:
+            del self.snapshots[old]
+        pruned_from = self.blockchain.pruned_height
+        self.blockchain.prune(height - self.retain)
+        for index in [index for index in self.proposal_prev if index < self.blockchain.pruned_height]:
+            del self.proposal_prev[index]
+        self.metrics.inc('batches_pruned', self.batches.prune(height - self.retain))
+        self.metrics.set('batches_stored', len(self.batches))
+        for h in range(pruned_from, min(self.blockchain.pruned_height, self.block_store.height())):
+            self.block_store.replace(h, self.blockchain.chain[h])
+        self.log(f"높이 {height}에서 안정 체크포인트가 만들어졌습니다.")
+
+    def request_snapshot(self, peer_port):
+        # 새로 들어오거나 뒤처진 복제본은 전체 재실행 대신 스냅샷과 짧은 꼬리 블록들을 받음
+        height = len(self.blockchain.chain) if self.blockchain else 0
+        self.network.send_message(peer_port, {'type': 'snapshot_request', 'peer_id': self.id,
+                                              'peer_port': self.port, 'height': height})
+
+    def handle_snapshot_request(self, peer_id, peer_port, height):
+        if self.blockchain is None or len(self.blockchain.chain) <= height:
+            return
+        snapshot = self.stable_snapshot
+        end = snapshot.height + 1 if snapshot is not None else 1
+        message = {'type': 'snapshot', 'snapshot': snapshot, 'certificate': self.stable_certificate,
+                   'headers': self.blockchain.headers(end), 'tail': self.blockchain.chain[end:], 'config': self.config_state()}
+        # 멤버십으로 아는 복제본이면 그 주소로 (다른 호스트일 수 있음)
+        self.network.send_message(self.peers.get(peer_id, peer_port), message)
+
+    def config_state(self):
+        # 스냅샷과 함께 보내는 구성: 잘린 헤더 안의 구성 블록은 다시 볼 수 없기 때문
+        if self.membership is None and self.pending_config is None:
+            return None
+        pending = self.pending_config
+        return {'membership': self.current_membership().to_dict(),
+                'pending': (pending[0], pending[1].to_dict()) if pending else None}
+
+    def install_config(self, config):
+        # 보낸 쪽이 더 최근 에포크를 알고 있을 때만 따름
+        if config is None:
+            return
+        membership = Membership.from_dict(config['membership'])
+        if membership.epoch > self.current_membership().epoch:
+            self.apply_membership(membership)
+            if self.pending_config is not None and self.pending_config[1].epoch <= membership.epoch:
+                self.pending_config = None
+        if config['pending'] is not None:
+            effective, pending = config['pending'][0], Membership.from_dict(config['pending'][1])
+            known = self.pending_config[1].epoch if self.pending_config else self.current_membership().epoch
+            if pending.epoch > known:
+                self.pending_config = (effective, pending)
+        self.maybe_switch_config()
+
+    def install_snapshot(self, snapshot, certificate, headers, tail, config=None):
+        chain = headers + tail
+        if self.blockchain is not None and len(chain) <= len(self.blockchain.chain):
+            return
+        if self.blockchain is not None and chain[0].hash != self.blockchain.chain[0].hash:
+            print("다른 제네시스 블록을 가진 스냅샷이라 무시합니다.")
+            return
+        rows = [block_row(block) for block in chain[1:]]
+        if rows and (rows[0][3] != chain[0].hash or not verify_range(rows)):
+            print("스냅샷과 함께 받은 블록 연결이 올바르지 않습니다.")
+            return
+        state = type(self.state)()
+        if snapshot is not None:
+            if len(set(certificate)) < self.checkpoint_quorum() or headers[snapshot.height].hash != snapshot.block_hash:
+                print("스냅샷 인증서가 올바르지 않습니다.")
+                return
+            state.restore(snapshot.state)
+            if state.state_hash() != snapshot.state_hash:
+                print("스냅샷 상태 해시가 맞지 않습니다.")
+                return
+        self.blockchain = BlockChain(chain[0])
+        self.blockchain.chain.extend(chain[1:])
+        self.blockchain.pruned_height = len(headers)
+        self.state = state
+        self.committed_blocks.update(block.timestamp for block in chain)
+        if snapshot is not None:
+            self.stable_snapshot = snapshot
+            self.stable_certificate = certificate
+            self.checkpoints.stable_height = snapshot.height
+        # 스냅샷 이후의 꼬리 블록만 실행함 (스냅샷이 없으면 전체 재실행)
+        self.executed_height = snapshot.height if snapshot is not None else 0
+        self.unexecuted = collections.deque(tail if snapshot is not None else chain[1:])
+        for block in self.unexecuted:
+            if isinstance(block.data, dict) and 'batches' in block.data:
+                self.resolve_batches(block.data['batches'])
+        self.execute_ready()
+        self.install_config(config)
+        self.next_slot = max(self.next_slot, len(self.blockchain.chain))
+        self.flush_commit_buffer()
+        print(f"스냅샷으로 높이 {len(chain) - 1}까지 동기화되었습니다.")
+
+    def block_transactions(self, block):
+        # 블록 본문이 트랜잭션 목록이거나 배치 해시 목록일 때 트랜잭션들을 꺼냄
+        if isinstance(block.data, dict) and 'batches' in block.data:
+            txs = self.batches.transactions(block.data['batches'])
+        elif isinstance(block.data, list):
+            txs = block.data
         else:
+            return []
+        # mempool 형식(client/nonce)이 아닌 항목은 그대로 실행만 되고 트랜잭션으로 세지 않음
+        return [tx for tx in txs if isinstance(tx, dict) and 'client' in tx]
+
+    def submit_transaction(self, tx):
+        # 돌아가며 제안할 때는 받은 복제본이 자기 슬롯에서 제안함 (클라이언트는 한 복제본에 nonce 순서대로 보냄)
+        added = self.mempool.add(tx)
+        if added and self.batcher is not None:
+            self.batcher.on_arrival()
+        if added and self.rotation is not None:
+            self.request_turn()
+        return added
+
+    def enable_adaptive_batching(self, **targets):
+        # 이후 주 노드는 mempool 에 쌓인 트랜잭션을 AdaptiveBatcher 가 정한 크기/대기 시간으로 제안함
+        self.batcher = AdaptiveBatcher(self, **targets)
+        return self.batcher
+
+    def enable_admission_control(self, client_rate=None, client_burst=None, max_inflight=None, block_txs=None, **kwargs):
+        # 요청 입구의 입장 제어 (kb.admission)
+        # 전체 상한 기본값은 파이프라인 창 + 2 블록 분량: 커밋 중인 블록들, 다음에 제안할 블록, 거절된 클라이언트가
+        # retry_after 뒤에 다시 보내는 동안 파이프라인이 비지 않게 하는 한 블록, 받은 트랜잭션은 길어야 두 바퀴 더 기다림
+        if max_inflight is None:
+            if self.rotation is not None:
+                window = self.max_pipeline
+            else:
+                window = self.batcher.max_inflight if self.batcher is not None else 1
+            if block_txs is None:
+                block_txs = self.batcher.max_batch if self.batcher is not None else 1000
+            max_inflight = (window + 2) * block_txs
+        self.admission = AdmissionControl(max_inflight, client_rate, client_burst, **kwargs)
+        self.commit_listeners.append(self.count_admitted_commit)
+        return self.admission
+
+    def count_admitted_commit(self, peer, block):
+        self.admission.on_commit(len(self.block_transactions(block)), self.network.now())
+
+    def admit_transaction(self, message, client_socket=None):
+        # 연결 처리 스레드에서 불림, 거절하면 reply_to 포트(없으면 같은 연결)로 이유와 retry_after 를 알려줌
+        tx = message['tx']
+        client = tx.get('client')
+        nonce = tx.get('nonce', 0)
+        cursor = self.mempool.cursor.get(client, 0)
+        outstanding = len(self.mempool) + len(self.mempool.inflight)
+        blocking = nonce + 1 in self.mempool.pending.get(client, ())  # 다음 nonce 가 이것을 기다리고 있음
+        rejected = self.admission.check(client, nonce, self.network.now(), outstanding, cursor, blocking)
+        if rejected is None:
+            self.metrics.inc('admitted')
+            return True
+        self.metrics.inc(f'rejected_{rejected[0]}')
+        self.send_reject(message, client_socket, *rejected)
+        return False
+
+    def send_reject(self, message, client_socket, reason, retry_after, resend_from):
+        # 클라이언트는 retry_after 뒤에 resend_from 부터 커밋되지 않은 트랜잭션을 nonce 순서대로 다시 보냄
+        tx = message['tx']
+        reply = {'type': 'reject', 'client': tx.get('client'), 'nonce': tx.get('nonce', 0), 'resend_from': resend_from,
+                 'reason': reason, 'retry_after': retry_after}
+        if message.get('reply_to') is not None:
+            self.network.send_message(message['reply_to'], reply)
+        elif client_socket is not None:
+            self.network.reply(client_socket, reply)
+
+    def propose_from_mempool(self, max_txs=1000):
+        # 주 노드(돌아가며 제안할 때는 이번 슬롯의 제안자)가 mempool 에서 수수료 순으로 트랜잭션을 꺼내 블록을 만듦
+        slot = self.proposal_slot()
+        if slot is None:
+            return None
+        txs = self.mempool.build_batch(max_txs)
+        if not txs:
+            return None
+        block = Block(slot, self.proposal_timestamp(), txs)
+        self.propose_block(block)
+        return block
+
+    def batch_from_mempool(self, max_txs=1000):
+        # 가용성 계층을 쓸 때는 주 노드가 아니어도 자기 mempool 로 배치를 만들어 퍼뜨림
+        txs = self.mempool.build_batch(max_txs)
+        if not txs:
+            return None
+        return self.submit_batch(txs)
+
+    def availability_quorum(self):
+        return self.quorum.available
+
+    def submit_batch(self, txs):
+        # 어느 복제본이든 자기 클라이언트의 배치를 직접 퍼뜨림, 주 노드는 데이터 경로에서 빠짐
+        digest = batch_digest(txs)
+        if self.batches.add(digest, txs, self.id):
+            self.handle_batch_ack(digest, self.id)
+            self.broadcast_message({'type': 'batch', 'digest': digest, 'txs': txs, 'origin': self.id})
+        return digest
+
+    def handle_batch(self, digest, txs, origin):
+        if self.batches.add(digest, txs, origin) and self.unexecuted:
+            self.execute_ready()
+        if origin == self.id:
+            return
+        if origin in self.peers:
+            self.network.send_message(self.peers[origin], {'type': 'batch_ack', 'digest': digest, 'peer_id': self.id})
+
+    def handle_batch_ack(self, digest, peer_id):
+        acks = self.batches.ack(digest, peer_id, self.availability_quorum())
+        if acks is not None:
+            self.log(f"배치 {digest[:8]}이(가) 가용 상태가 되었습니다.")
+            self.broadcast_message({'type': 'batch_available', 'digest': digest, 'origin': self.id, 'acks': acks})
+
+    def handle_batch_available(self, digest, origin, acks):
+        if len(set(acks)) >= self.availability_quorum():
+            self.batches.certify(digest, origin)
+
+    def handle_batch_request(self, digest, peer_id):
+        txs = self.batches.get(digest)
+        if txs is not None and peer_id in self.peers:
+            message = {'type': 'batch', 'digest': digest, 'txs': txs, 'origin': self.batches.origins[digest]}
+            self.network.send_message(self.peers[peer_id], message)
+
+    def resolve_batches(self, digests):
+        # 순서가 정해진 배치 중 본문이 없는 것은 만든 노드에게 요청함
+        self.batches.mark_ordered(digests)
+        for digest in self.batches.missing(digests):
+            origin = self.batches.origins.get(digest)
+            targets = [self.peers[origin]] if origin in self.peers else list(self.peers.values())
+            self.network.multicast_message(targets, {'type': 'batch_request', 'digest': digest, 'peer_id': self.id})
+
+    def propose_batches(self, max_batches=64):
+        # 주 노드는 가용 인증된 배치의 해시만 블록에 담아 제안함
+        slot = self.proposal_slot()
+        if slot is None:
+            return None
+        digests = self.batches.take_available(max_batches)
+        if not digests:
+            return None
+        block = Block(slot, self.proposal_timestamp(), {'batches': digests})
+        self.propose_block(block)
+        return block
+
+    def propose_block(self, block):
+        if self.rotation is None and self.id != self.primary_id:
             print(f"노드 {self.id}은(는) 주 노드가 아닙니다.")
+            return
+        # 돌아가며 제안할 때는 자기 슬롯(라운드가 바뀌어 넘겨받은 슬롯 포함)에만 제안함
+        if self.rotation is not None and (self.leader_of(block.index) != self.id or not self.claim_slot(block)):
+            print(f"노드 {self.id}은(는) 슬롯 {block.index}의 제안자가 아닙니다.")
+            return
+        if self.rotation is not None:
+            self.block_rounds[block.timestamp] = self.slot_rounds.get(block.index, 0)
+        self.log(f"블록 {block.index}을(를) 제안 중입니다.")
+        self.metrics.inc('proposed_blocks')
+        self.preprepare_msgs[block.timestamp] = block
+        trace = self.trace_ids.setdefault(block.timestamp, new_trace_id())
+        self.tracer.record(trace, 'proposed', index=block.index)
+        self.broadcast_preprepare(block)
 
 def main():
-    id = int(input("피어 ID를 입력하세요: "))
-    port = int(input("포트 번호를 입력하세요: "))
-    peer = Peer(id, port)
+    # --detect-failures 를 주면 heartbeat 로 주 노드 장애를 감지해 view change 를 함 (메뉴 9 로도 켤 수 있음)
+    args = [arg for arg in sys.argv[1:] if arg != '--detect-failures']
+    detect_failures = len(args) < len(sys.argv) - 1
+    if len(args) in (2, 3):
+        # python p.py <멤버십 파일> <피어 ID> [공유 메모리 임계 크기]: 피어 추가 없이 바로 클러스터에 참여
+        shm_threshold = int(args[2]) if len(args) == 3 else None
+        peer = Peer.from_membership(args[0], int(args[1]), shm_threshold=shm_threshold)
+    else:
+        id = int(input("피어 ID를 입력하세요: "))
+        port = int(input("포트 번호를 입력하세요: "))
+        peer = Peer(id, port)
+    if detect_failures:
+        peer.enable_failure_detection()
 
     while True:
         print("1. 피어 추가")
@@ -293,6 +1712,9 @@ def main():
         print("3. 블록체인 출력")
         print("4. 종료")
         print("5. 비잔틴 노드 설정")
+        print("7. 메트릭 출력")
+        print("8. 피어 상태 출력")
+        print("9. 장애 감지 켜기")
         choice = input("옵션을 선택하세요: ")
 
         if choice == "1":
@@ -324,6 +1746,18 @@ def main():
             for i in peer.peers:
                 print(i)
                 print("\n")
+        elif choice == "7":
+            for name, value in sorted(peer.queue_metrics().items()):
+                print(f"{name}: {value}")
+        elif choice == "8":
+            for peer_id, stats in sorted(peer.failure_metrics().items()):
+                rtt = f"{stats['rtt'] * 1000:.2f}ms" if stats['rtt'] is not None else "-"
+                state = "의심" if stats['suspected'] else "정상"
+                print(f"피어 {peer_id}: RTT {rtt}, phi {stats['phi']:.2f}, {stats['silent_for']:.3f}초 전 수신, {state}")
+        elif choice == "9":
+            if peer.detector is None:
+                peer.enable_failure_detection()
+            print("장애 감지가 켜져 있습니다.")
             
         else:
             print("잘못된 옵션입니다. 다시 시도하세요.")